@@ -1,8 +1,32 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, render_template, request, jsonify, stream_with_context
 from flask_cors import CORS
 import os
+import hmac
+import json
 import logging
-from logic import AnnuityCalculator
+from datetime import date
+from logic import AnnuityCalculator, parse_ranking_options
+from quote_request import parse_goal_seek_request, parse_quote_request
+from simulation import SimulationTimeout, parse_simulation_options
+from excel_export import XLSX_MIMETYPE, export_quote, iter_file_and_delete
+from formula_engine import GuaranteedIncomeCalculator
+from search_index import SEARCH_FIELDS, parse_search_options
+from rate_history import RateHistory, live_effective_date
+from quote_store import QuoteStore
+from memory_report import (
+    AllocationTracer,
+    ReloadLog,
+    calculator_breakdown,
+    history_breakdown,
+    process_memory,
+    quote_sizes,
+)
+from snapshot_artifact import (
+    SNAPSHOT_SIGNING_KEY,
+    SNAPSHOT_STORE,
+    SnapshotSubscriber,
+    iter_published,
+)
 
 app = Flask(__name__)
 CORS(app, origins="*")
@@ -13,12 +37,33 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 calculator = None
+income_calculator = None
+rate_history = None
+snapshot_subscriber = None
+# Effective date of the rates the live calculator serves
+live_rates_date = None
+# Writer thread and SQLite connections start on first use, in each worker process
+quote_store = QuoteStore()
+reload_log = ReloadLog()
+allocation_tracer = AllocationTracer()
 
-EXCEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "excel files")
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+EXCEL_DIR = os.path.join(BASE_DIR, "excel files")
+# Dated archive directories ("YYYY-MM-DD rates/", "20260210 feedback/") for as_of quotes;
+# nodes following a snapshot store take their history from its artifacts instead
+RATE_HISTORY_DIR = os.environ.get("RATE_HISTORY_DIR", "" if SNAPSHOT_STORE else BASE_DIR)
+# Bearer token for the /admin routes; they answer 404 while it is unset
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN", "")
 
 
 def init_calculator():
-    global calculator
+    global calculator, live_rates_date
+    # Nodes following a snapshot store never parse the Excel files unless nothing is published yet
+    if SNAPSHOT_STORE:
+        if init_snapshot_subscriber():
+            return True
+        logger.warning("No rate snapshot could be loaded, falling back to the Excel files")
+
     try:
         fixed_path = os.path.join(EXCEL_DIR, "Fixed Annuity Rates.xlsx")
         variable_path = os.path.join(EXCEL_DIR, "Variable Annuity Rates.xlsx")
@@ -31,6 +76,8 @@ def init_calculator():
             return False
 
         calculator = AnnuityCalculator(fixed_path, variable_path)
+        live_rates_date = live_effective_date(fixed_path, variable_path)
+        reload_log.record(calculator.snapshot_version)
         logger.info("AnnuityCalculator initialized successfully")
         return True
     except Exception as e:
@@ -38,6 +85,251 @@ def init_calculator():
         return False
 
 
+def apply_snapshot(fixed_data, variable_data, manifest):
+    """
+    Serve a published rate snapshot. The new calculator is built and warmed
+    first, then swapped in with one assignment, so each request sees either
+    the old rates or the new ones. It is patched from the live calculator,
+    so only the products that changed are indexed again.
+    """
+    global calculator, live_rates_date
+    if calculator is not None:
+        updated = calculator.updated(fixed_data, variable_data)
+    else:
+        updated = AnnuityCalculator.from_frames(fixed_data, variable_data).warm()
+    live_rates_date = date.fromisoformat(manifest["effective_date"])
+    calculator = updated
+    if rate_history is not None:
+        rate_history.add_live(
+            live_rates_date, updated, source=f"snapshot {manifest['version']}"
+        )
+    reload_log.record(updated.snapshot_version)
+
+
+def init_snapshot_subscriber():
+    global snapshot_subscriber
+    # Kept even if the first poll fails, so the node picks up the first snapshot published
+    snapshot_subscriber = SnapshotSubscriber(SNAPSHOT_STORE, SNAPSHOT_SIGNING_KEY, apply_snapshot)
+    try:
+        return snapshot_subscriber.poll()
+    except Exception as e:
+        logger.error(f"Failed to load rate snapshot from {SNAPSHOT_STORE}: {str(e)}")
+        return False
+
+
+def init_rate_history():
+    global rate_history
+    if calculator is None:
+        return False
+    try:
+        history = RateHistory()
+        if RATE_HISTORY_DIR and os.path.isdir(RATE_HISTORY_DIR):
+            history.load_archives(RATE_HISTORY_DIR)
+        for fixed_data, variable_data, manifest in iter_published(
+            SNAPSHOT_STORE, SNAPSHOT_SIGNING_KEY
+        ):
+            history.add(
+                date.fromisoformat(manifest["effective_date"]),
+                fixed_data,
+                variable_data,
+                source=f"snapshot {manifest['version']}",
+            )
+        # Added last so it replaces an archive with the same effective date
+        history.add_live(
+            live_rates_date,
+            calculator,
+            source=f"snapshot {snapshot_subscriber.version}"
+            if snapshot_subscriber and snapshot_subscriber.version
+            else EXCEL_DIR,
+        )
+        rate_history = history
+        logger.info(f"Rate history initialized with {len(history.versions)} versions")
+        return True
+    except Exception as e:
+        logger.error(f"Failed to initialize rate history: {str(e)}")
+        return False
+
+
+def calculator_for(quote_request):
+    """
+    The calculator whose rates were in force on the request's as_of date, or
+    the live one without as_of. Returns (calculator, None) or
+    (None, (error payload, status)), which a view can return as is.
+    """
+    if quote_request.as_of is None:
+        return calculator, None
+    if rate_history is None:
+        return None, (
+            {"error": "Rate history not initialized", "details": "as_of is unavailable"},
+            500,
+        )
+    rates, _ = rate_history.calculator_at(quote_request.as_of)
+    if rates is None:
+        return None, (
+            {
+                "error": "No rates in effect",
+                "details": f"No rate version is effective on or before {quote_request.as_of.isoformat()}",
+            },
+            404,
+        )
+    return rates, None
+
+
+def resolve_quote(data):
+    """
+    Validate a /api/calculate body and pick the calculator that serves it.
+    Returns (quote_request, calculator, None) or (None, None, (error payload, status)).
+    Shared by the Flask route and the ASGI server (asgi.py).
+    """
+    if not data:
+        return None, None, ({"error": "No data provided"}, 400)
+
+    quote_request, validation_errors = parse_quote_request(data)
+    if validation_errors:
+        return None, None, ({"error": "Validation failed", "details": validation_errors}, 400)
+
+    if quote_request.product_line is None:
+        return None, None, (
+            {
+                "error": "Invalid annuity type",
+                "details": f"Type '{quote_request.annuity_type}' not recognized",
+            },
+            400,
+        )
+
+    rates, error = calculator_for(quote_request)
+    if error:
+        return None, None, error
+    return quote_request, rates, None
+
+
+def saved_quote(rates, quote_request):
+    """
+    The JSON /api/calculate payload: the quote plus the id it is saved under,
+    the rate snapshot that priced it and the version of its product line's
+    rates, which clients key their caches on.
+    """
+    result = rates.quote(quote_request)
+    quote_id = quote_store.record(
+        "calculate", quote_request.to_json(), result, rates.snapshot_version
+    )
+    return dict(
+        result,
+        quote_id=quote_id,
+        snapshot_version=rates.snapshot_version,
+        sheet_version=rates.sheet_versions()[quote_request.product_line],
+    )
+
+
+def _record_fixed_json(rates, quote_request):
+    """
+    Save a fixed quote built from the pre-encoded products.
+    Returns (quote_id, products JSON, count, state_filtered JSON).
+    """
+    products, count = rates.fixed_quote_json(quote_request.amount, quote_request.state)
+    state_filtered = json.dumps(rates.filters_by_state(quote_request.state))
+    quote_id = quote_store.record(
+        "calculate",
+        quote_request.to_json(),
+        f'{{"count":{count},"results":{products},"state_filtered":{state_filtered},"type":"fixed"}}',
+        rates.snapshot_version,
+        encoded=True,
+    )
+    return quote_id, products, count, state_filtered
+
+
+def saved_quote_json(rates, quote_request):
+    """
+    saved_quote() for a fixed quote as the bytes jsonify sends outside debug
+    mode, built from the calculator's pre-encoded products so no product
+    dict is built or encoded per request.
+    """
+    quote_id, products, count, state_filtered = _record_fixed_json(rates, quote_request)
+    # Keys in the sorted order jsonify writes them
+    return (
+        f'{{"count":{count},"quote_id":{json.dumps(quote_id)},"results":{products},'
+        f'"sheet_version":{json.dumps(rates.sheet_versions()["fixed"])},'
+        f'"snapshot_version":{json.dumps(rates.snapshot_version)},'
+        f'"state_filtered":{state_filtered},"type":"fixed"}}\n'
+    ).encode()
+
+
+def saved_stream(rates, quote_request):
+    """
+    The NDJSON /api/calculate records: iter_quote() with the quote_id and
+    sheet_version of saved_quote() added to the header. The quote is saved
+    before the header is sent, so its id is valid even if the client stops
+    reading part way through.
+    """
+    if quote_request.product_line == "fixed":
+        quote_id = _record_fixed_json(rates, quote_request)[0]
+    else:
+        quote_id = quote_store.record(
+            "calculate", quote_request.to_json(), rates.quote(quote_request), rates.snapshot_version
+        )
+    records = rates.iter_quote(quote_request)
+    yield dict(
+        next(records),
+        quote_id=quote_id,
+        sheet_version=rates.sheet_versions()[quote_request.product_line],
+    )
+    yield from records
+
+
+def health_payload():
+    return {
+        "status": "healthy",
+        "calculator_loaded": calculator is not None,
+        "snapshot_version": calculator.snapshot_version if calculator else None,
+        "sheet_versions": calculator.sheet_versions() if calculator else None,
+    }
+
+
+def init_income_calculator():
+    global income_calculator
+    try:
+        master_path = os.path.join(EXCEL_DIR, "Guaranteed Income Calculator 1 26 26.xlsx")
+
+        if not os.path.exists(master_path):
+            logger.error(f"Guaranteed Income Calculator file not found: {master_path}")
+            return False
+
+        income_calculator = GuaranteedIncomeCalculator(master_path)
+        logger.info("GuaranteedIncomeCalculator compiled successfully")
+        return True
+    except Exception as e:
+        logger.error(f"Failed to compile guaranteed income workbook: {str(e)}")
+        return False
+
+
+def ndjson_lines(records):
+    """Encode an iterable of dicts as newline-delimited JSON, one record per line."""
+    for record in records:
+        yield json.dumps(record, separators=(",", ":")) + "\n"
+
+
+def ndjson_response(records):
+    """Stream an iterable of dicts as newline-delimited JSON, one record per line."""
+    return Response(stream_with_context(ndjson_lines(records)), mimetype="application/x-ndjson")
+
+
+def wants_stream():
+    """Streaming is opt-in: ?stream=1 or an Accept header preferring NDJSON."""
+    if request.args.get("stream", "").lower() in ("1", "true", "ndjson"):
+        return True
+    return (
+        request.accept_mimetypes.best_match(["application/json", "application/x-ndjson"])
+        == "application/x-ndjson"
+    )
+
+
+@app.before_request
+def start_background_workers():
+    # Per process, so every gunicorn worker forked after --preload polls for itself
+    if snapshot_subscriber is not None:
+        snapshot_subscriber.start()
+
+
 @app.route("/")
 def index():
     return render_template("index.html")
@@ -45,7 +337,7 @@ def index():
 
 @app.route("/health")
 def health():
-    return jsonify({"status": "healthy", "calculator_loaded": calculator is not None})
+    return jsonify(health_payload())
 
 
 @app.route("/api/calculate", methods=["POST"])
@@ -58,50 +350,554 @@ def calculate():
             }
         ), 500
 
+    try:
+        quote_request, rates, error = resolve_quote(request.get_json())
+        if error:
+            return error
+
+        if wants_stream():
+            return ndjson_response(saved_stream(rates, quote_request))
+
+        # Debug mode indents jsonify's output, so it gets the plain encoding
+        if quote_request.product_line == "fixed" and not app.debug:
+            return Response(saved_quote_json(rates, quote_request), mimetype="application/json")
+        return jsonify(saved_quote(rates, quote_request))
+
+    except Exception as e:
+        logger.error(f"Calculation error: {str(e)}")
+        return jsonify({"error": "Calculation failed", "details": str(e)}), 500
+
+
+@app.route("/api/quotes/<quote_id>")
+def get_quote(quote_id):
+    try:
+        quote = quote_store.get(quote_id)
+        if quote is None:
+            return jsonify(
+                {"error": "Quote not found", "details": f"No quote with id '{quote_id}'"}
+            ), 404
+        return jsonify(quote)
+
+    except Exception as e:
+        logger.error(f"Quote lookup error: {str(e)}")
+        return jsonify({"error": "Quote lookup failed", "details": str(e)}), 500
+
+
+@app.route("/api/simulate", methods=["POST"])
+def simulate():
+    if calculator is None:
+        return jsonify(
+            {
+                "error": "Calculator not initialized",
+                "details": "Excel files could not be loaded",
+            }
+        ), 500
+
     try:
         data = request.get_json()
 
         if not data:
             return jsonify({"error": "No data provided"}), 400
 
-        validation_errors = calculator.validate_input(data)
+        # Simulations only exist for variable annuities
+        quote_request, validation_errors = parse_quote_request(
+            dict(data, annuity_type="variable")
+        )
+        options, option_errors = parse_simulation_options(data)
+        if validation_errors or option_errors:
+            return jsonify(
+                {
+                    "error": "Validation failed",
+                    "details": (validation_errors or []) + (option_errors or []),
+                }
+            ), 400
+
+        rates, error = calculator_for(quote_request)
+        if error:
+            return error
+
+        result = rates.simulate_variable_income(
+            current_age=quote_request.current_age,
+            withdrawal_age=quote_request.withdrawal_age,
+            amount=quote_request.amount,
+            **options,
+        )
+        return jsonify({"type": "variable_simulation", "result": result})
+
+    except SimulationTimeout as e:
+        logger.warning(f"Simulation timed out: {str(e)}")
+        return jsonify({"error": "Simulation timed out", "details": str(e)}), 503
+
+    except Exception as e:
+        logger.error(f"Simulation error: {str(e)}")
+        return jsonify({"error": "Simulation failed", "details": str(e)}), 500
+
+
+@app.route("/api/schedule", methods=["POST"])
+def schedule():
+    if calculator is None:
+        return jsonify(
+            {
+                "error": "Calculator not initialized",
+                "details": "Excel files could not be loaded",
+            }
+        ), 500
+
+    try:
+        data = request.get_json()
+
+        if not data:
+            return jsonify({"error": "No data provided"}), 400
+
+        # Schedules only exist for fixed annuities
+        quote_request, validation_errors = parse_quote_request(
+            dict(data, annuity_type="fixed")
+        )
         if validation_errors:
             return jsonify(
                 {"error": "Validation failed", "details": validation_errors}
             ), 400
 
-        annuity_type = data.get("annuity_type", "").lower()
-        amount = float(data.get("amount", 0))
+        rates, error = calculator_for(quote_request)
+        if error:
+            return error
 
-        if annuity_type in ["fixed", "fixed indexed", "immediate"]:
-            results = calculator.get_fixed_rates(amount)
-            return jsonify({"type": "fixed", "results": results, "count": len(results)})
+        return ndjson_response(
+            rates.get_fixed_schedules(quote_request.amount, state=quote_request.state)
+        )
 
-        elif annuity_type == "variable":
-            current_age = int(data.get("current_age", 0))
-            withdrawal_age = int(data.get("withdrawal_age", 0))
+    except Exception as e:
+        logger.error(f"Schedule error: {str(e)}")
+        return jsonify({"error": "Schedule failed", "details": str(e)}), 500
 
-            result = calculator.get_variable_income(
-                current_age=current_age, withdrawal_age=withdrawal_age, amount=amount
-            )
-            return jsonify({"type": "variable", "result": result})
 
-        else:
+@app.route("/api/export", methods=["POST"])
+def export():
+    if calculator is None:
+        return jsonify(
+            {
+                "error": "Calculator not initialized",
+                "details": "Excel files could not be loaded",
+            }
+        ), 500
+
+    try:
+        data = request.get_json()
+
+        if not data:
+            return jsonify({"error": "No data provided"}), 400
+
+        quote_request, validation_errors = parse_quote_request(data)
+        if validation_errors:
+            return jsonify(
+                {"error": "Validation failed", "details": validation_errors}
+            ), 400
+
+        if quote_request.product_line is None:
             return jsonify(
                 {
                     "error": "Invalid annuity type",
-                    "details": f"Type '{annuity_type}' not recognized",
+                    "details": f"Type '{quote_request.annuity_type}' not recognized",
                 }
             ), 400
 
+        rates, error = calculator_for(quote_request)
+        if error:
+            return error
+
+        path = export_quote(rates, quote_request)
+        filename = f"annuity-quote-{quote_request.product_line}.xlsx"
+        return Response(
+            iter_file_and_delete(path),
+            mimetype=XLSX_MIMETYPE,
+            headers={
+                "Content-Disposition": f'attachment; filename="{filename}"',
+                "Content-Length": str(os.path.getsize(path)),
+            },
+        )
+
     except Exception as e:
-        logger.error(f"Calculation error: {str(e)}")
-        return jsonify({"error": "Calculation failed", "details": str(e)}), 500
+        logger.error(f"Export error: {str(e)}")
+        return jsonify({"error": "Export failed", "details": str(e)}), 500
 
 
+# Fields /api/top returns unless full=1; the ranked objective is always added
+TOP_COMPACT_FIELDS = {
+    "fixed": ("sort", "company", "product", "years", "yield_to_surrender", "future_value"),
+    "variable": (
+        "sort",
+        "carrier",
+        "rider_name",
+        "withdrawal_rate",
+        "annual_lifetime_income",
+        "monthly_income",
+    ),
+}
+
+
+@app.route("/api/top", methods=["GET", "POST"])
+def top():
+    if calculator is None:
+        return jsonify(
+            {
+                "error": "Calculator not initialized",
+                "details": "Excel files could not be loaded",
+            }
+        ), 500
+
+    try:
+        # GET with query parameters keeps the embed's requests cacheable
+        data = request.get_json(silent=True) if request.method == "POST" else request.args
+
+        if not data:
+            return jsonify({"error": "No data provided"}), 400
+
+        quote_request, validation_errors = parse_quote_request(data)
+        if validation_errors:
+            return jsonify(
+                {"error": "Validation failed", "details": validation_errors}
+            ), 400
+
+        if quote_request.product_line is None:
+            return jsonify(
+                {
+                    "error": "Invalid annuity type",
+                    "details": f"Type '{quote_request.annuity_type}' not recognized",
+                }
+            ), 400
+
+        rates, error = calculator_for(quote_request)
+        if error:
+            return error
+
+        options, option_errors = parse_ranking_options(data, quote_request.product_line)
+        if option_errors:
+            return jsonify({"error": "Validation failed", "details": option_errors}), 400
+
+        products = rates.top_products(quote_request, **options)
+        if str(data.get("full", "")).lower() not in ("1", "true"):
+            fields = TOP_COMPACT_FIELDS[quote_request.product_line]
+            products = [
+                {
+                    field: product[field]
+                    for field in fields + (options["objective"],)
+                    if field in product
+                }
+                for product in products
+            ]
+
+        return jsonify(
+            {
+                "type": quote_request.product_line,
+                "objective": options["objective"],
+                "results": products,
+                "count": len(products),
+                "snapshot_version": rates.snapshot_version,
+            }
+        )
+
+    except Exception as e:
+        logger.error(f"Top products error: {str(e)}")
+        return jsonify({"error": "Ranking failed", "details": str(e)}), 500
+
+
+@app.route("/api/search", methods=["GET", "POST"])
+def search():
+    if calculator is None:
+        return jsonify(
+            {
+                "error": "Calculator not initialized",
+                "details": "Excel files could not be loaded",
+            }
+        ), 500
+
+    try:
+        # GET for the typeahead, same quote inputs as /api/top plus q and limit
+        data = request.get_json(silent=True) if request.method == "POST" else request.args
+
+        if not data:
+            return jsonify({"error": "No data provided"}), 400
+
+        quote_request, validation_errors = parse_quote_request(data)
+        options, option_errors = parse_search_options(data)
+        errors = (validation_errors or []) + (option_errors or [])
+        if errors:
+            return jsonify({"error": "Validation failed", "details": errors}), 400
+
+        if quote_request.product_line is None:
+            return jsonify(
+                {
+                    "error": "Invalid annuity type",
+                    "details": f"Type '{quote_request.annuity_type}' not recognized",
+                }
+            ), 400
+
+        if quote_request.product_line not in SEARCH_FIELDS:
+            return jsonify(
+                {
+                    "error": "Validation failed",
+                    "details": [
+                        f"Search is not available for {quote_request.product_line.title()} annuities"
+                    ],
+                }
+            ), 400
+
+        rates, error = calculator_for(quote_request)
+        if error:
+            return error
+
+        products = rates.search_products(quote_request, **options)
+        return jsonify(
+            {
+                "type": quote_request.product_line,
+                "query": options["query"],
+                "results": products,
+                "count": len(products),
+                "snapshot_version": rates.snapshot_version,
+            }
+        )
+
+    except Exception as e:
+        logger.error(f"Search error: {str(e)}")
+        return jsonify({"error": "Search failed", "details": str(e)}), 500
+
+
+@app.route("/api/goal-seek", methods=["POST"])
+def goal_seek():
+    if calculator is None:
+        return jsonify(
+            {
+                "error": "Calculator not initialized",
+                "details": "Excel files could not be loaded",
+            }
+        ), 500
+
+    try:
+        data = request.get_json()
+
+        if not data:
+            return jsonify({"error": "No data provided"}), 400
+
+        goal_request, validation_errors = parse_goal_seek_request(data)
+        if validation_errors:
+            return jsonify(
+                {"error": "Validation failed", "details": validation_errors}
+            ), 400
+
+        if goal_request.product_line is None:
+            return jsonify(
+                {
+                    "error": "Invalid annuity type",
+                    "details": f"Type '{goal_request.annuity_type}' not recognized",
+                }
+            ), 400
+
+        rates, error = calculator_for(goal_request)
+        if error:
+            return error
+
+        return jsonify(rates.goal_seek(goal_request))
+
+    except Exception as e:
+        logger.error(f"Goal seek error: {str(e)}")
+        return jsonify({"error": "Goal seek failed", "details": str(e)}), 500
+
+
+@app.route("/api/guaranteed-income", methods=["POST"])
+def guaranteed_income():
+    if income_calculator is None:
+        return jsonify(
+            {
+                "error": "Guaranteed income calculator not initialized",
+                "details": "Master workbook could not be compiled",
+            }
+        ), 500
+
+    try:
+        data = request.get_json()
+
+        if not data:
+            return jsonify({"error": "No data provided"}), 400
+
+        # Same inputs as a variable quote: issue age, first withdrawal age, amount
+        quote_request, validation_errors = parse_quote_request(
+            dict(data, annuity_type="variable")
+        )
+        if validation_errors:
+            return jsonify(
+                {"error": "Validation failed", "details": validation_errors}
+            ), 400
+
+        result = income_calculator.quote(
+            quote_request.current_age,
+            quote_request.withdrawal_age,
+            quote_request.amount,
+        )
+        return jsonify({"type": "guaranteed_income", "result": result})
+
+    except Exception as e:
+        logger.error(f"Guaranteed income error: {str(e)}")
+        return jsonify({"error": "Guaranteed income calculation failed", "details": str(e)}), 500
+
+
+def admin_error():
+    """None if the request carries ADMIN_TOKEN, otherwise the error response to return."""
+    if not ADMIN_TOKEN:
+        return jsonify({"error": "Not found"}), 404
+    supplied = request.headers.get("Authorization", "")
+    if supplied.startswith("Bearer "):
+        supplied = supplied[len("Bearer "):]
+    if not hmac.compare_digest(supplied.strip().encode(), ADMIN_TOKEN.encode()):
+        return jsonify({"error": "Unauthorized", "details": "A valid admin token is required"}), 401
+    return None
+
+
+# Sample quotes whose payload sizes /admin/memory?quotes=1 reports
+MEMORY_SAMPLE_QUOTES = (
+    ("fixed", {"amount": 100000, "annuity_type": "fixed"}),
+    (
+        "variable",
+        {"amount": 100000, "annuity_type": "variable", "current_age": 55, "withdrawal_age": 65},
+    ),
+    (
+        "immediate",
+        {"amount": 100000, "annuity_type": "immediate", "current_age": 65, "sex": "male"},
+    ),
+)
+TRACEMALLOC_GROUPS = ("lineno", "filename", "traceback")
+MAX_TRACEMALLOC_LIMIT = 200
+
+
+@app.route("/admin/memory")
+def admin_memory():
+    error = admin_error()
+    if error:
+        return error
+
+    try:
+        # Every figure is for the worker that served this request
+        report = {
+            "process": process_memory(),
+            "snapshot": calculator_breakdown(calculator) if calculator else None,
+            "history": history_breakdown(rate_history) if rate_history else None,
+            "quote_store": {"pending": quote_store.pending_count()},
+            "reloads": reload_log.entries,
+            "tracemalloc": allocation_tracer.status(),
+        }
+        if calculator and request.args.get("quotes", "").lower() in ("1", "true"):
+            report["quote_payload_bytes"] = quote_sizes(
+                calculator,
+                [(name, parse_quote_request(body)[0]) for name, body in MEMORY_SAMPLE_QUOTES],
+            )
+        return jsonify(report)
+
+    except Exception as e:
+        logger.error(f"Memory report error: {str(e)}")
+        return jsonify({"error": "Memory report failed", "details": str(e)}), 500
+
+
+def parse_tracemalloc_options(data):
+    """limit and group_by for tracemalloc statistics. Returns (options, None) or (None, errors)."""
+    errors = []
+    limit = 20
+    if data.get("limit") not in (None, ""):
+        try:
+            limit = int(data["limit"])
+            if not 1 <= limit <= MAX_TRACEMALLOC_LIMIT:
+                raise ValueError
+        except (TypeError, ValueError, OverflowError):
+            errors.append(f"Limit must be a whole number between 1 and {MAX_TRACEMALLOC_LIMIT}")
+    group_by = data.get("group_by") or "lineno"
+    if group_by not in TRACEMALLOC_GROUPS:
+        errors.append(f"Group By must be one of: {', '.join(TRACEMALLOC_GROUPS)}")
+    return (None, errors) if errors else ({"limit": limit, "group_by": group_by}, None)
+
+
+@app.route("/admin/memory/tracemalloc", methods=["GET", "POST"])
+def admin_tracemalloc():
+    """
+    POST {"action": "start" | "stop" | "snapshot"} controls tracing in this
+    worker; GET ?snapshot=<label> lists its top allocation sites and
+    GET ?from=<label>&to=<label> what grew between two snapshots.
+    """
+    error = admin_error()
+    if error:
+        return error
+
+    try:
+        data = (request.get_json(silent=True) or {}) if request.method == "POST" else request.args
+        options, errors = parse_tracemalloc_options(data)
+        if errors:
+            return jsonify({"error": "Validation failed", "details": errors}), 400
+
+        if request.method == "POST":
+            action = data.get("action")
+            if action == "start":
+                try:
+                    frames = int(data.get("frames", 1))
+                    if not 1 <= frames <= 100:
+                        raise ValueError
+                except (TypeError, ValueError, OverflowError):
+                    return jsonify(
+                        {
+                            "error": "Validation failed",
+                            "details": ["Frames must be between 1 and 100"],
+                        }
+                    ), 400
+                return jsonify(allocation_tracer.start(frames))
+            if action == "stop":
+                return jsonify(allocation_tracer.stop())
+            if action == "snapshot":
+                try:
+                    label = allocation_tracer.take(data.get("label"))
+                except ValueError as e:
+                    return jsonify({"error": "Validation failed", "details": [str(e)]}), 400
+                return jsonify(
+                    dict(
+                        allocation_tracer.status(),
+                        label=label,
+                        top=allocation_tracer.top(label, **options),
+                    )
+                )
+            return jsonify(
+                {
+                    "error": "Validation failed",
+                    "details": ["Action must be one of: start, stop, snapshot"],
+                }
+            ), 400
+
+        try:
+            if data.get("from") and data.get("to"):
+                result = {
+                    "from": data["from"],
+                    "to": data["to"],
+                    "diff": allocation_tracer.diff(data["from"], data["to"], **options),
+                }
+            elif data.get("snapshot"):
+                result = {
+                    "snapshot": data["snapshot"],
+                    "top": allocation_tracer.top(data["snapshot"], **options),
+                }
+            else:
+                return jsonify(allocation_tracer.status())
+        except KeyError as e:
+            return jsonify(
+                {
+                    "error": "Snapshot not found",
+                    "details": f"No tracemalloc snapshot {e.args[0]!r} in worker {os.getpid()}",
+                }
+            ), 404
+        return jsonify(dict(result, pid=os.getpid()))
+
+    except Exception as e:
+        logger.error(f"tracemalloc error: {str(e)}")
+        return jsonify({"error": "tracemalloc request failed", "details": str(e)}), 500
+
 
-# Initialize calculator on module load for production servers (Gunicorn)
+# Initialize calculators on module load for production servers (Gunicorn)
 init_calculator()
+init_rate_history()
+init_income_calculator()
 
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5001))
@@ -0,0 +1,317 @@
+"""
+ASGI serving mode for the calculator.
+
+Serves the index page, /static, /health and /api/calculate from one event
+loop, so slow clients cost a coroutine rather than a worker. Engine calls
+run on a bounded thread pool. Everything else about a quote is shared with
+the Flask app: calculators, rate history, snapshot polling, the quote store
+and the JSON bytes of every response.
+
+    uvicorn asgi:application --host 0.0.0.0 --port 5000 --workers 2
+"""
+
+import os
+import json
+import asyncio
+import logging
+import mimetypes
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from urllib.parse import parse_qs
+
+from flask import render_template
+from werkzeug.security import safe_join
+
+import app as web
+
+logger = logging.getLogger(__name__)
+
+# Threads running engine calls, and how many more requests may queue for one
+# before new ones are turned away with a 503
+ASGI_ENGINE_WORKERS = int(os.environ.get("ASGI_ENGINE_WORKERS", 2))
+ASGI_MAX_PENDING = int(os.environ.get("ASGI_MAX_PENDING", 64))
+ASGI_MAX_BODY = int(os.environ.get("ASGI_MAX_BODY", 64 * 1024))
+# Streamed products encoded per trip to the engine pool
+STREAM_BATCH = 256
+
+_CORS = [(b"access-control-allow-origin", b"*")]
+
+
+class EngineBusy(Exception):
+    pass
+
+
+class ClientDisconnected(Exception):
+    pass
+
+
+class BoundedExecutor:
+    """
+    A thread pool for engine calls that admits at most workers + max_pending
+    requests at a time. admit() is only used from the event loop thread, so
+    the count needs no lock. The pool is created per process.
+    """
+
+    def __init__(self, workers, max_pending):
+        self.workers = workers
+        self.limit = workers + max_pending
+        self.active = 0
+        self._pool = None
+        self._pid = None
+
+    @property
+    def pool(self):
+        if self._pid != os.getpid():
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="engine")
+            self._pid = os.getpid()
+        return self._pool
+
+    @asynccontextmanager
+    async def admit(self):
+        """Hold one of the limit slots for a request, or raise EngineBusy."""
+        if self.active >= self.limit:
+            raise EngineBusy
+        self.active += 1
+        try:
+            yield self
+        finally:
+            self.active -= 1
+
+    async def call(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.pool, fn, *args)
+
+    def shutdown(self):
+        if self._pool is not None and self._pid == os.getpid():
+            self._pool.shutdown(wait=False)
+
+
+engine = BoundedExecutor(ASGI_ENGINE_WORKERS, ASGI_MAX_PENDING)
+_index_html = None
+_static_files = {}
+
+
+def _json_bytes(payload):
+    # Flask's provider with jsonify's compact separators: the same bytes the Flask routes send
+    return (web.app.json.dumps(payload, separators=(",", ":")) + "\n").encode()
+
+
+async def _respond(send, status, body, content_type=b"application/json"):
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", content_type),
+                (b"content-length", str(len(body)).encode()),
+            ]
+            + _CORS,
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _respond_json(send, payload, status=200):
+    await _respond(send, status, _json_bytes(payload))
+
+
+async def _read_body(receive):
+    """The request body, or None if it is larger than ASGI_MAX_BODY."""
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            raise ClientDisconnected
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > ASGI_MAX_BODY:
+            return None
+        chunks.append(chunk)
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+
+def _headers(scope):
+    return {name.decode("latin-1"): value.decode("latin-1") for name, value in scope["headers"]}
+
+
+def _wants_stream(scope, headers):
+    """Same opt-in as app.wants_stream(): ?stream=1 or an Accept header asking for NDJSON only."""
+    query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    if query.get("stream", [""])[0].lower() in ("1", "true", "ndjson"):
+        return True
+    accept = headers.get("accept", "")
+    return "application/x-ndjson" in accept and "application/json" not in accept
+
+
+def _quote(data, stream):
+    """
+    Engine side of /api/calculate, run on the pool: (encoded body, status)
+    for a JSON reply, or (line iterator, None) for a stream.
+    """
+    try:
+        quote_request, rates, error = web.resolve_quote(data)
+        if error:
+            payload, status = error
+            return _json_bytes(payload), status
+        if stream:
+            return web.ndjson_lines(web.saved_stream(rates, quote_request)), None
+        if quote_request.product_line == "fixed":
+            return web.saved_quote_json(rates, quote_request), 200
+        return _json_bytes(web.saved_quote(rates, quote_request)), 200
+    except Exception as e:
+        logger.error(f"Calculation error: {str(e)}")
+        return _json_bytes({"error": "Calculation failed", "details": str(e)}), 500
+
+
+def _next_lines(lines):
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) == STREAM_BATCH:
+            break
+    return "".join(batch).encode()
+
+
+async def calculate(scope, receive, send):
+    if web.calculator is None:
+        await _respond_json(
+            send,
+            {"error": "Calculator not initialized", "details": "Excel files could not be loaded"},
+            500,
+        )
+        return
+
+    body = await _read_body(receive)
+    if body is None:
+        await _respond_json(
+            send, {"error": "Request too large", "details": f"Limit is {ASGI_MAX_BODY} bytes"}, 413
+        )
+        return
+    try:
+        data = json.loads(body) if body else None
+    except ValueError as e:
+        await _respond_json(send, {"error": "Calculation failed", "details": str(e)}, 500)
+        return
+
+    stream = _wants_stream(scope, _headers(scope))
+    try:
+        async with engine.admit():
+            result, status = await engine.call(_quote, data, stream)
+            if status is not None:
+                await _respond(send, status, result)
+                return
+
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": 200,
+                    "headers": [(b"content-type", b"application/x-ndjson")] + _CORS,
+                }
+            )
+            while True:
+                chunk = await engine.call(_next_lines, result)
+                if not chunk:
+                    break
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            await send({"type": "http.response.body", "body": b""})
+    except EngineBusy:
+        await _respond_json(
+            send,
+            {"error": "Server busy", "details": "Too many quotes in progress, please retry"},
+            503,
+        )
+
+
+async def index(scope, receive, send):
+    global _index_html
+    if _index_html is None:
+        with web.app.test_request_context("/"):
+            _index_html = render_template("index.html").encode()
+    await _respond(send, 200, _index_html, b"text/html; charset=utf-8")
+
+
+async def static(scope, receive, send):
+    name = scope["path"][len("/static/"):]
+    if name not in _static_files:
+        path = safe_join(web.app.static_folder, name)
+        if path is None or not os.path.isfile(path):
+            await _respond_json(send, {"error": "Not found"}, 404)
+            return
+        with open(path, "rb") as f:
+            content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+            _static_files[name] = (f.read(), content_type.encode())
+    body, content_type = _static_files[name]
+    await _respond(send, 200, body, content_type)
+
+
+async def health(scope, receive, send):
+    await _respond_json(send, web.health_payload())
+
+
+ROUTES = {
+    ("GET", "/"): index,
+    ("GET", "/health"): health,
+    ("POST", "/api/calculate"): calculate,
+}
+
+
+async def _preflight(scope, send):
+    requested = _headers(scope).get("access-control-request-headers", "")
+    await send(
+        {
+            "type": "http.response.start",
+            "status": 200,
+            "headers": _CORS
+            + [
+                (b"access-control-allow-methods", b"GET, POST, OPTIONS"),
+                (b"access-control-allow-headers", requested.encode("latin-1")),
+                (b"content-length", b"0"),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            if web.snapshot_subscriber is not None:
+                web.snapshot_subscriber.start()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            engine.shutdown()
+            web.quote_store.flush()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await _lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+
+    method, path = scope["method"], scope["path"]
+    if method == "OPTIONS":
+        await _preflight(scope, send)
+        return
+    if method == "GET" and path.startswith("/static/"):
+        await static(scope, receive, send)
+        return
+
+    handler = ROUTES.get((method, path))
+    if handler is None:
+        allowed = any(route_path == path for _, route_path in ROUTES)
+        await _respond_json(
+            send,
+            {"error": "Method not allowed" if allowed else "Not found"},
+            405 if allowed else 404,
+        )
+        return
+    try:
+        await handler(scope, receive, send)
+    except ClientDisconnected:
+        pass
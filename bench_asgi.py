@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Benchmark the ASGI server against the gunicorn setup from the Dockerfile.
+
+Starts each server on a free port and runs the same load against both.
+Fast clients post /api/calculate quotes back to back. Slow clients each
+trickle a quote body over --slow-seconds, like a phone on a poor
+connection. Reports throughput and latency for the fast clients.
+
+    python bench_asgi.py --requests 400 --concurrency 16 --slow 8
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import tempfile
+import subprocess
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+BODY = json.dumps({"amount": 100000, "annuity_type": "fixed", "state": "TX"}).encode()
+
+SERVERS = {
+    "gunicorn": lambda port, workers: [
+        sys.executable, "-m", "gunicorn", "--workers", str(workers), "--preload",
+        "--timeout", "120", "--bind", f"127.0.0.1:{port}", "app:app",
+    ],
+    "uvicorn": lambda port, workers: [
+        sys.executable, "-m", "uvicorn", "asgi:application", "--host", "127.0.0.1",
+        "--port", str(port), "--workers", str(workers), "--no-access-log",
+    ],
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def post(port, body_delay=0.0):
+    """One POST /api/calculate on a new connection; returns (status, seconds)."""
+    started = time.perf_counter()
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(
+        b"POST /api/calculate HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+        b"Connection: close\r\nContent-Length: %d\r\n\r\n" % len(BODY)
+    )
+    if body_delay:
+        for i in range(len(BODY)):
+            writer.write(BODY[i:i + 1])
+            await writer.drain()
+            await asyncio.sleep(body_delay / len(BODY))
+    else:
+        writer.write(BODY)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    status = int(response.split(b" ", 2)[1]) if response else 0
+    return status, time.perf_counter() - started
+
+
+async def run_load(port, requests, concurrency, slow, slow_seconds):
+    latencies = []
+    statuses = {}
+    remaining = requests
+    stop = asyncio.Event()
+
+    async def fast_client():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            status, seconds = await post(port)
+            statuses[status] = statuses.get(status, 0) + 1
+            latencies.append(seconds)
+
+    async def slow_client():
+        while not stop.is_set():
+            await post(port, body_delay=slow_seconds)
+
+    slow_tasks = [asyncio.create_task(slow_client()) for _ in range(slow)]
+    await asyncio.sleep(0.2 if slow else 0)  # let the slow clients take their connections
+    started = time.perf_counter()
+    await asyncio.gather(*(fast_client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    for task in slow_tasks:
+        task.cancel()
+    await asyncio.gather(*slow_tasks, return_exceptions=True)
+    return elapsed, np.array(latencies), statuses
+
+
+def wait_healthy(port, process, timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"Server exited with {process.returncode}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1) as s:
+                s.sendall(b"GET /health HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n")
+                if b"200" in s.recv(64):
+                    return
+        except OSError:
+            pass
+        time.sleep(0.25)
+    raise SystemExit(f"Server on port {port} did not become healthy")
+
+
+def bench(name, args, env):
+    port = free_port()
+    process = subprocess.Popen(
+        SERVERS[name](port, args.workers),
+        cwd=BASE_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_healthy(port, process)
+        asyncio.run(run_load(port, args.concurrency, args.concurrency, 0, 0))  # warm up
+        return asyncio.run(
+            run_load(port, args.requests, args.concurrency, args.slow, args.slow_seconds)
+        )
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=400, help="fast quotes to time")
+    parser.add_argument("--concurrency", type=int, default=16, help="fast clients in parallel")
+    parser.add_argument("--slow", type=int, default=8, help="slow clients trickling bodies")
+    parser.add_argument("--slow-seconds", type=float, default=5.0, help="time to send one slow body")
+    parser.add_argument("--workers", type=int, default=2, help="server processes for both servers")
+    parser.add_argument("--servers", nargs="+", default=list(SERVERS), choices=list(SERVERS))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(os.environ, QUOTE_STORE_PATH=os.path.join(directory, "quotes.db"))
+        print(
+            f"{args.requests} quotes from {args.concurrency} clients, "
+            f"{args.slow} slow clients sending each body over {args.slow_seconds:g}s, "
+            f"{args.workers} workers"
+        )
+        print(f"{'server':<10} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>9} {'max ms':>9}  statuses")
+        for name in args.servers:
+            elapsed, latencies, statuses = bench(name, args, env)
+            p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+            print(
+                f"{name:<10} {len(latencies) / elapsed:8.1f} {p50:8.1f} {p99:9.1f} "
+                f"{latencies.max() * 1000:9.1f}  {statuses}"
+            )
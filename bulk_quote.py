@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Re-quote a book of clients offline.
+
+Reads a CSV or Parquet file of clients (amount, annuity_type, current_age,
+withdrawal_age, sex and payout_option for immediate annuities, and any extra
+columns such as client_id) in chunks, quotes
+every row across a process pool and streams one output row per
+client x product (x payout option, for immediate annuities) to CSV or Parquet.
+
+    python bulk_quote.py clients.csv quotes.csv --workers 4
+    python bulk_quote.py clients.parquet quotes.parquet --annuity-type variable
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from logic import AnnuityCalculator
+from quote_request import parse_quote_request
+
+logger = logging.getLogger(__name__)
+
+EXCEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "excel files")
+
+# Columns appended after the client's own columns. Product fields carry a
+# product_ prefix so they never overwrite an input column (a variable product's
+# annuity_type, an immediate option's payout_option); fixed, variable and
+# immediate quotes fill different subsets. Dtypes are fixed so every chunk has the same schema.
+PRODUCT_PREFIX = "product_"
+PRODUCT_FIELDS = {
+    "sort": "Int64",
+    "company": "string",
+    "product": "string",
+    "years": "Int64",
+    "min_contribution": "float64",
+    "min_rate": "float64",
+    "base_rate": "float64",
+    "bonus_rate": "float64",
+    "yield_to_surrender": "float64",
+    "surrender_period": "Int64",
+    "future_value": "float64",
+    "annuity_type": "string",
+    "carrier": "string",
+    "rider_name": "string",
+    "withdrawal_rate": "float64",
+    "benefit_base": "float64",
+    "annual_lifetime_income": "float64",
+    "monthly_income": "float64",
+    "payout_option": "string",
+    "label": "string",
+    "years_certain": "Int64",
+    "annuity_factor": "float64",
+    "annual_income": "float64",
+}
+PRODUCT_COLUMNS = {
+    "snapshot_version": "string",
+    "product_line": "string",
+    "error": "string",
+    **{PRODUCT_PREFIX + field: dtype for field, dtype in PRODUCT_FIELDS.items()},
+}
+
+_calculator = None
+
+
+def _init_worker(fixed_path, variable_path):
+    # With fork the parent's calculator is inherited and nothing is reloaded
+    global _calculator
+    if _calculator is None:
+        logging.basicConfig(level=logging.WARNING)
+        _calculator = AnnuityCalculator(fixed_path, variable_path)
+
+
+def quote_records(records, default_annuity_type):
+    """Quote a list of client dicts; returns a list of flat output rows."""
+    rows = []
+    for record in records:
+        data = dict(record)
+        if not data.get("annuity_type"):
+            data["annuity_type"] = default_annuity_type
+
+        quote_request, errors = parse_quote_request(data)
+        if errors or quote_request.product_line is None:
+            rows.append(
+                dict(
+                    record,
+                    snapshot_version=_calculator.snapshot_version,
+                    error="; ".join(errors or ["Invalid annuity type"]),
+                )
+            )
+            continue
+
+        quote = _calculator.quote(quote_request)
+        if quote["type"] == "fixed":
+            products = quote["results"]
+        elif quote["type"] == "immediate":
+            products = quote["result"]["options"] if quote["result"] else []
+        else:
+            products = quote["result"]["products"] if quote["result"] else []
+
+        for product in products:
+            row = dict(
+                record, snapshot_version=_calculator.snapshot_version, product_line=quote["type"]
+            )
+            row.update((PRODUCT_PREFIX + field, value) for field, value in product.items())
+            rows.append(row)
+    return rows
+
+
+def read_chunks(path, chunk_size):
+    if path.lower().endswith(".parquet"):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("Reading Parquet requires pyarrow (pip install pyarrow)")
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_size)
+
+
+class ChunkWriter:
+    """Append quote rows to a CSV or Parquet file chunk by chunk."""
+
+    def __init__(self, path):
+        self.path = path
+        self.parquet = path.lower().endswith(".parquet")
+        self.columns = None
+        self._writer = None
+        self._file = None
+
+    def write(self, rows, input_columns):
+        if self.columns is None:
+            self.columns = list(input_columns) + list(PRODUCT_COLUMNS)
+        frame = pd.DataFrame(rows, columns=self.columns).astype(PRODUCT_COLUMNS)
+
+        if self.parquet:
+            try:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+            except ImportError:
+                raise SystemExit("Writing Parquet requires pyarrow (pip install pyarrow)")
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if self._writer is None:
+                # A client column empty throughout the first chunk (sex, payout_option
+                # on fixed-only clients) is typed null; widen it so later values fit
+                schema = pa.schema(
+                    [
+                        field.with_type(pa.string()) if pa.types.is_null(field.type) else field
+                        for field in table.schema
+                    ],
+                    metadata=table.schema.metadata,
+                )
+                self._writer = pq.ParquetWriter(self.path, schema)
+            self._writer.write_table(table.cast(self._writer.schema))
+        else:
+            if self._file is None:
+                self._file = open(self.path, "w", newline="")
+                frame.to_csv(self._file, index=False)
+            else:
+                frame.to_csv(self._file, index=False, header=False)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        if self._file is not None:
+            self._file.close()
+
+
+def run(
+    input_path,
+    output_path,
+    fixed_path,
+    variable_path,
+    workers=None,
+    chunk_size=2000,
+    annuity_type="fixed",
+    progress=sys.stderr,
+):
+    _init_worker(fixed_path, variable_path)
+    if _calculator.fixed_data is None and _calculator.variable_data is None:
+        raise SystemExit("No rate sheets could be loaded")
+
+    workers = workers or os.cpu_count() or 1
+    # Keep a bounded number of chunks in flight so memory stays flat
+    max_pending = workers * 2
+    context = (
+        multiprocessing.get_context("fork")
+        if "fork" in multiprocessing.get_all_start_methods()
+        else None
+    )
+
+    writer = ChunkWriter(output_path)
+    started = time.monotonic()
+    clients = 0
+    rows_written = 0
+    pending = deque()
+
+    def drain_one():
+        nonlocal clients, rows_written
+        future, n_clients, input_columns = pending.popleft()
+        rows = future.result()
+        writer.write(rows, input_columns)
+        clients += n_clients
+        rows_written += len(rows)
+        elapsed = time.monotonic() - started
+        print(
+            f"{clients:,} clients, {rows_written:,} quote rows, "
+            f"{clients / elapsed if elapsed else 0:,.0f} clients/s",
+            file=progress,
+        )
+
+    try:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(fixed_path, variable_path),
+        ) as executor:
+            for chunk in read_chunks(input_path, chunk_size):
+                clashes = [c for c in chunk.columns if c in PRODUCT_COLUMNS]
+                if clashes:
+                    raise SystemExit(
+                        f"Input columns clash with quote output columns: {', '.join(clashes)}"
+                    )
+                # NaN cells become None so they fail validation like a missing field
+                records = chunk.astype(object).where(chunk.notna(), None).to_dict("records")
+                future = executor.submit(quote_records, records, annuity_type)
+                pending.append((future, len(records), list(chunk.columns)))
+                if len(pending) >= max_pending:
+                    drain_one()
+            while pending:
+                drain_one()
+    finally:
+        writer.close()
+
+    elapsed = time.monotonic() - started
+    print(
+        f"Done: {clients:,} clients -> {rows_written:,} rows in {elapsed:.1f}s "
+        f"(snapshot {_calculator.snapshot_version})",
+        file=progress,
+    )
+    return clients, rows_written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("input", help="Client file (.csv or .parquet)")
+    parser.add_argument("output", help="Quote output file (.csv or .parquet)")
+    parser.add_argument(
+        "--fixed-file", default=os.path.join(EXCEL_DIR, "Fixed Annuity Rates.xlsx")
+    )
+    parser.add_argument(
+        "--variable-file",
+        default=os.path.join(EXCEL_DIR, "Variable Annuity Rates.xlsx"),
+    )
+    parser.add_argument("--workers", type=int, default=None, help="Default: CPU count")
+    parser.add_argument("--chunk-size", type=int, default=2000, help="Clients per task")
+    parser.add_argument(
+        "--annuity-type",
+        default="fixed",
+        help="Used for rows without an annuity_type column value",
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    run(
+        args.input,
+        args.output,
+        args.fixed_file,
+        args.variable_file,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        annuity_type=args.annuity_type,
+    )
+
+
+if __name__ == "__main__":
+    main()
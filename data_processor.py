@@ -1,3 +1,4 @@
+import re
 import pandas as pd
 import numpy as np
 import logging
@@ -59,6 +60,15 @@ def clean_fixed_annuity_data(file_path):
         logger.info(
             f"Loaded {len(cleaned_df)} fixed annuity products from FORMATTED 1 sheet"
         )
+
+        availability = load_state_availability(file_path)
+        if availability is not None:
+            cleaned_df["States"] = [
+                availability.get(
+                    (str(company).strip(), str(product).strip())
+                )
+                for company, product in zip(cleaned_df["Company"], cleaned_df["Product"])
+            ]
         return cleaned_df
 
     except Exception as e:
@@ -66,6 +76,74 @@ def clean_fixed_annuity_data(file_path):
         raise
 
 
+STATE_AVAILABILITY_SHEET = "STATE AVAILABILITY"
+
+# USPS codes of the 50 states and DC, the states the form offers
+US_STATE_CODES = frozenset(
+    "AK AL AR AZ CA CO CT DC DE FL GA HI IA ID IL IN KS KY LA MA MD ME MI MN MO MS MT NC ND NE "
+    "NH NJ NM NV NY OH OK OR PA RI SC SD TN TX UT VA VT WA WI WV WY".split()
+)
+# Cell values meaning the product carries no state restriction
+UNRESTRICTED_STATES = frozenset({"", "ALL", "N/A", "NA", "NONE"})
+
+
+def load_state_availability(file_path):
+    """
+    Load product/state availability from the optional STATE AVAILABILITY sheet
+    of the fixed rates workbook: a "Company | Product | States" header row,
+    then one row per product with comma-separated state codes, or "All"/blank
+    for products sold everywhere.
+    Returns {(company, product): "AK,AL,..."} for restricted products only,
+    or None when the workbook has no such sheet (every product is available).
+    """
+    try:
+        df = pd.read_excel(file_path, sheet_name=STATE_AVAILABILITY_SHEET, header=None)
+    except ValueError:
+        return None
+
+    availability = {}
+    header_seen = False
+    for idx in range(len(df)):
+        row = df.iloc[idx]
+        company = str(row[0]).strip() if pd.notna(row[0]) else ""
+        if not header_seen:
+            header_seen = company == "Company"
+            continue
+        if not company:
+            continue
+
+        product = str(row[1]).strip() if len(row) > 1 and pd.notna(row[1]) else ""
+        states = parse_states(row[2]) if len(row) > 2 else None
+        if states is not None:
+            availability[(company, product)] = states
+
+    logger.info(
+        f"Loaded state availability for {len(availability)} restricted fixed annuity products"
+    )
+    return availability
+
+
+def parse_states(value):
+    """
+    "AL, ak;TX" -> "AK,AL,TX"; "All", "N/A", "None" or blank -> None (no
+    restriction). Only whole words that are state codes count, so a cell with
+    none ("Texas") is logged and treated as unrestricted.
+    """
+    if pd.isna(value):
+        return None
+
+    text = str(value).strip().upper()
+    words = re.findall(r"[A-Z]+", text)
+    if text in UNRESTRICTED_STATES or "ALL" in words:
+        return None
+
+    codes = sorted({word for word in words if word in US_STATE_CODES})
+    unknown = sorted({word for word in words if word not in US_STATE_CODES})
+    if unknown:
+        logger.warning(f"Ignoring unknown state codes {unknown} in {value!r}")
+    return ",".join(codes) or None
+
+
 def load_variable_annuity_data(file_path):
     """
     Load variable annuity data from the Formatted sheet.
@@ -124,6 +202,9 @@ def load_variable_annuity_data(file_path):
                 # Column F (index 5): Deferral Credit Rate (for formula calculation)
                 deferral_credit = parse_percentage(row[5]) if pd.notna(row[5]) else 0
 
+                # Column H (index 7): Rider Cost (annual charge against account value)
+                rider_cost = parse_percentage(row[7]) if pd.notna(row[7]) else 0
+
                 # Column Q (index 16): Withdrawal Rate
                 withdrawal_rate = parse_percentage(row[16]) if pd.notna(row[16]) else 0
 
@@ -134,6 +215,7 @@ def load_variable_annuity_data(file_path):
                         "Carrier": carrier,
                         "Rider Name": rider_name,
                         "Deferral Credit": deferral_credit,
+                        "Rider Cost": rider_cost,
                         "Withdrawal Rate": withdrawal_rate,
                     }
                 )
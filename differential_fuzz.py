@@ -0,0 +1,488 @@
+#!/usr/bin/env python3
+"""
+Differential fuzzing of the quote engines against the reference calculator.
+
+Generates random valid requests across the validate_input domain and random
+rate sheets (NaNs, ties, zero/negative rates, unsorted Sort columns), runs
+every request through the original row-wise implementation and every
+registered fast path, and reports any product whose fields differ after
+rounding to cents.
+
+    python differential_fuzz.py --requests 5000 --sheets 20 --seed 1
+    python differential_fuzz.py --engines fixed:quote variable:simulation
+
+A new engine is registered by adding a function to FIXED_ENGINES or
+VARIABLE_ENGINES that takes (calculator, quote_request) and returns the
+products in reference order as dicts. An engine must return every reference
+field unless it is listed in PARTIAL_ENGINES; fields set to SKIP are not compared.
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from logic import AnnuityCalculator
+from quote_request import parse_quote_request
+from simulation import MIN_PATHS, run_simulation
+
+logger = logging.getLogger(__name__)
+
+EXCEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "excel files")
+
+# Marks a field an engine does not produce for a product
+SKIP = object()
+
+Mismatch = namedtuple(
+    "Mismatch", ["engine", "sheet", "request", "position", "field", "expected", "actual"]
+)
+
+
+# ---------------------------------------------------------------------------
+# Reference implementation: the row-wise calculator as it was before any of
+# the fast paths, kept verbatim apart from taking the frames as arguments.
+# ---------------------------------------------------------------------------
+
+
+def reference_future_value(amount, yield_to_surrender):
+    if yield_to_surrender is None or yield_to_surrender <= 0:
+        return amount
+    rate_decimal = yield_to_surrender / 100.0
+    future_value = amount * ((1 + rate_decimal) ** 10)  # Excel uses 10 years
+    return round(future_value, 2)
+
+
+def reference_fixed_rates(fixed_data, amount, state=None):
+    filtered = fixed_data.copy()
+    filtered = filtered.sort_values("Base Rate", ascending=False)
+    if state is not None and "States" in filtered.columns:
+        # A product without a States entry is sold everywhere
+        filtered = filtered[
+            [
+                not isinstance(states, str) or state in states.split(",")
+                for states in filtered["States"]
+            ]
+        ]
+
+    results = []
+    for _, row in filtered.iterrows():
+        years = int(row["Years"]) if pd.notna(row["Years"]) else None
+        base_rate = float(row["Base Rate"]) if pd.notna(row["Base Rate"]) else 0
+        yield_to_surrender = (
+            float(row["Yield to Surrender"]) if pd.notna(row["Yield to Surrender"]) else 0
+        )
+        future_value = reference_future_value(amount, yield_to_surrender)
+
+        results.append(
+            {
+                "sort": int(row["Sort"]) if pd.notna(row["Sort"]) else None,
+                "company": str(row["Company"]) if pd.notna(row["Company"]) else "",
+                "product": str(row["Product"]) if pd.notna(row["Product"]) else "",
+                "years": years,
+                "min_contribution": float(row["Min Contribution"])
+                if pd.notna(row["Min Contribution"])
+                else 0,
+                "min_rate": float(row["Min Rate"]) if pd.notna(row["Min Rate"]) else 0,
+                "base_rate": base_rate,
+                "bonus_rate": float(row["Bonus Rate"]) if pd.notna(row["Bonus Rate"]) else 0,
+                "yield_to_surrender": float(row["Yield to Surrender"])
+                if pd.notna(row["Yield to Surrender"])
+                else 0,
+                "surrender_period": int(row["Surrender Period"])
+                if pd.notna(row["Surrender Period"])
+                else None,
+                "future_value": future_value,
+            }
+        )
+    return results
+
+
+def reference_variable_products(variable_data, current_age, withdrawal_age, amount):
+    deferral_period = withdrawal_age - current_age
+
+    results = []
+    for _, row in variable_data.iterrows():
+        deferral_credit_rate = (
+            float(row["Deferral Credit"]) if pd.notna(row["Deferral Credit"]) else 0
+        )
+        withdrawal_rate = (
+            float(row["Withdrawal Rate"]) if pd.notna(row["Withdrawal Rate"]) else 0
+        )
+
+        if deferral_credit_rate > 0:
+            benefit_base = amount + (amount * deferral_credit_rate * deferral_period)
+        else:
+            benefit_base = amount
+
+        annual_lifetime_income = benefit_base * withdrawal_rate
+
+        results.append(
+            {
+                "sort": int(row["Sort"]) if pd.notna(row["Sort"]) else None,
+                "annuity_type": str(row["Annuity Type"])
+                if pd.notna(row["Annuity Type"])
+                else "",
+                "carrier": str(row["Carrier"]) if pd.notna(row["Carrier"]) else "",
+                "rider_name": str(row["Rider Name"]) if pd.notna(row["Rider Name"]) else "",
+                "withdrawal_rate": withdrawal_rate * 100,
+                "benefit_base": round(benefit_base, 2),
+                "annual_lifetime_income": round(annual_lifetime_income, 2),
+                "monthly_income": round(annual_lifetime_income / 12, 2),
+            }
+        )
+    results.sort(key=lambda x: x["sort"] if x["sort"] is not None else float("inf"))
+    return results
+
+
+# ---------------------------------------------------------------------------
+# Fast paths under test
+# ---------------------------------------------------------------------------
+
+
+def fixed_quote(calculator, quote_request):
+    return calculator.quote(quote_request)["results"]
+
+
+def fixed_stream(calculator, quote_request):
+    return list(calculator.iter_quote(quote_request))[1:]
+
+
+def fixed_json(calculator, quote_request):
+    # Pre-encoded templates spliced with the future values
+    return json.loads(calculator.fixed_quote_json(quote_request.amount, quote_request.state)[0])
+
+
+def fixed_schedule(calculator, quote_request):
+    # Year 10 of the yield schedule is the quoted future value
+    products = []
+    for schedule in calculator.get_fixed_schedules(quote_request.amount, state=quote_request.state):
+        product = {k: v for k, v in schedule.items() if not k.endswith("_values")}
+        yield_values = schedule["yield_values"]
+        product["future_value"] = yield_values[9] if len(yield_values) >= 10 else SKIP
+        products.append(product)
+    return products
+
+
+def variable_quote(calculator, quote_request):
+    return calculator.quote(quote_request)["result"]["products"]
+
+
+def variable_stream(calculator, quote_request):
+    return list(calculator.iter_quote(quote_request))[1:]
+
+
+def variable_simulation(calculator, quote_request):
+    # The guarantees in a simulation use the quote formulas, whatever the paths
+    result = run_simulation(
+        calculator.variable_data,
+        quote_request.amount,
+        quote_request.current_age,
+        quote_request.withdrawal_age,
+        paths=MIN_PATHS,
+        seed=0,
+    )
+    return [
+        {
+            "sort": p["sort"],
+            "carrier": p["carrier"],
+            "rider_name": p["rider_name"],
+            "withdrawal_rate": p["withdrawal_rate"],
+            "benefit_base": p["guaranteed_benefit_base"],
+            "annual_lifetime_income": p["guaranteed_annual_income"],
+        }
+        for p in result["products"]
+    ]
+
+
+FIXED_ENGINES = {
+    "quote": fixed_quote,
+    "stream": fixed_stream,
+    "json": fixed_json,
+    "schedule": fixed_schedule,
+}
+
+VARIABLE_ENGINES = {
+    "quote": variable_quote,
+    "stream": variable_stream,
+    "simulation": variable_simulation,
+}
+
+# Engines that return only some of the reference fields; the rest must match exactly
+PARTIAL_ENGINES = {fixed_schedule, variable_simulation}
+
+
+# ---------------------------------------------------------------------------
+# Random inputs
+# ---------------------------------------------------------------------------
+
+EDGE_AMOUNTS = [50000, 50000.01, 99999.995, 100000, 1234567.89, 1e9]
+# Codes the synthetic States columns use, plus well-formed codes no product lists
+FUZZ_STATES = ["TX", "CA", "NY", "FL", "AK"]
+UNKNOWN_STATES = ["ZZ", "QX"]
+
+
+def random_request(rng):
+    """A raw request body that passes validate_input."""
+    if rng.random() < 0.2:
+        amount = EDGE_AMOUNTS[rng.integers(len(EDGE_AMOUNTS))]
+    else:
+        amount = round(float(np.exp(rng.uniform(np.log(50000), np.log(5e7)))), 2)
+    if rng.random() < 0.3:
+        amount = str(amount)
+    elif rng.random() < 0.3:
+        amount = int(amount) if amount >= 50000 else amount
+
+    # Immediate quotes have no row-wise reference; test_immediate_annuity.py checks them
+    annuity_type = ["fixed", "Fixed Indexed", "variable", "VARIABLE"][rng.integers(4)]
+    body = {"amount": amount, "annuity_type": annuity_type}
+    if rng.random() < 0.5:
+        states = FUZZ_STATES + UNKNOWN_STATES
+        state = states[rng.integers(len(states))]
+        body["state"] = state.lower() if rng.random() < 0.2 else state
+    if annuity_type.lower() == "variable":
+        current_age = int(rng.integers(18, 100))
+        withdrawal_age = int(rng.integers(max(59, current_age + 1), 101))
+        body["current_age"] = str(current_age) if rng.random() < 0.2 else current_age
+        body["withdrawal_age"] = withdrawal_age
+    return body
+
+
+def _with_nans(rng, values, rate):
+    values = np.asarray(values, dtype=float)
+    values[rng.random(len(values)) < rate] = np.nan
+    return values
+
+
+def _pick(rng, choices, n):
+    return np.array(choices, dtype=float)[rng.integers(len(choices), size=n)]
+
+
+def synthetic_fixed_data(rng, n):
+    """A fixed sheet in the clean_fixed_annuity_data shape, with awkward values."""
+    # Rates come from a small grid so Base Rate ties (and sort order) are exercised
+    rate_grid = [0, 0.01, 1.0, 2.5, 4.15, 5.3, 5.3, 6.75, 12.5, -0.5, -100, 1e-9]
+    names = ["Alpha Life", "Beta Mutual", "", "Gamma & Sons", "Délta Ins."]
+    company = np.array(names, dtype=object)[rng.integers(len(names), size=n)]
+    company[rng.random(n) < 0.05] = np.nan
+    product = np.array([f"Product {i}" for i in range(n)], dtype=object)
+    product[rng.random(n) < 0.05] = np.nan
+    frame = pd.DataFrame(
+        {
+            "Sort": _with_nans(rng, rng.integers(1, n + 1, size=n), 0.05),
+            "Company": company,
+            "Product": product,
+            "Years": _with_nans(rng, rng.integers(0, 21, size=n), 0.1),
+            "Min Contribution": _with_nans(rng, _pick(rng, [0, 5000, 20000, 1e5, 1e6], n), 0.05),
+            "Min Rate": _with_nans(rng, _pick(rng, rate_grid, n), 0.05),
+            "Base Rate": _with_nans(rng, _pick(rng, rate_grid, n), 0.1),
+            "Bonus Rate": _with_nans(rng, _pick(rng, [0, 0, 1, 3, 10], n), 0.05),
+            "Yield to Surrender": _with_nans(rng, _pick(rng, rate_grid, n), 0.1),
+            "Surrender Period": _with_nans(rng, rng.integers(0, 21, size=n), 0.1),
+            "Future Value": rng.uniform(0, 2e6, size=n),
+        }
+    )
+    if rng.random() < 0.5:
+        # States as parse_states leaves them: sorted codes, None where sold everywhere
+        frame["States"] = [
+            None
+            if rng.random() < 0.4
+            else ",".join(sorted(rng.choice(FUZZ_STATES, rng.integers(1, 4), replace=False)))
+            for _ in range(n)
+        ]
+    return frame
+
+
+def synthetic_variable_data(rng, n):
+    """A variable sheet in the load_variable_annuity_data shape, rows not in Sort order."""
+    carriers = ["Brighthouse", "Corebridge", "Jackson", "Lincoln", "Nationwide"]
+    return pd.DataFrame(
+        {
+            "Sort": rng.permutation(n) + 1 if rng.random() < 0.5 else rng.integers(1, n + 1, size=n),
+            "Annuity Type": "Variable",
+            "Carrier": np.array(carriers, dtype=object)[rng.integers(len(carriers), size=n)],
+            "Rider Name": [f"Rider {i}" if rng.random() > 0.1 else "" for i in range(n)],
+            "Deferral Credit": _with_nans(
+                rng, _pick(rng, [0, 0.05, 0.06, 0.07, 0.1, -0.01, 1e-9], n), 0.1
+            ),
+            "Rider Cost": _with_nans(rng, _pick(rng, [0, 0.0135, 0.015, 0.02], n), 0.1),
+            "Withdrawal Rate": _with_nans(
+                rng, _pick(rng, [0, 0.04, 0.05, 0.0615, 0.064, 0.07, 1.0], n), 0.1
+            ),
+        }
+    )
+
+
+# ---------------------------------------------------------------------------
+# Comparison
+# ---------------------------------------------------------------------------
+
+
+def _normalize(value):
+    if isinstance(value, float):
+        if np.isnan(value):
+            return "nan"
+        return round(value, 2)
+    return value
+
+
+def compare_products(expected, actual, partial=False):
+    """
+    Yield (position, field, expected, actual) for every difference. Unless
+    partial, a reference field the product lacks is a difference too.
+    """
+    if len(expected) != len(actual):
+        yield (None, "count", len(expected), len(actual))
+    for position, (want, got) in enumerate(zip(expected, actual)):
+        if not partial:
+            for field in want.keys() - got.keys():
+                yield (position, field, want[field], "<missing>")
+        for field, value in got.items():
+            if value is SKIP:
+                continue
+            if field not in want:
+                yield (position, field, "<missing>", value)
+            elif _normalize(want[field]) != _normalize(value):
+                yield (position, field, want[field], value)
+
+
+def fuzz_calculator(calculator, sheet_name, requests, engines, mismatches):
+    for body in requests:
+        quote_request, errors = parse_quote_request(body)
+        assert not errors, (body, errors)
+
+        if quote_request.product_line == "fixed":
+            if calculator.fixed_data is None:
+                continue
+            expected = reference_fixed_rates(
+                calculator.fixed_data, quote_request.amount, quote_request.state
+            )
+            candidates = engines["fixed"]
+        else:
+            if calculator.variable_data is None:
+                continue
+            expected = reference_variable_products(
+                calculator.variable_data,
+                quote_request.current_age,
+                quote_request.withdrawal_age,
+                quote_request.amount,
+            )
+            candidates = engines["variable"]
+
+        for name, engine in candidates.items():
+            try:
+                actual = engine(calculator, quote_request)
+            except Exception as e:
+                mismatches.append(
+                    Mismatch(
+                        f"{quote_request.product_line}:{name}",
+                        sheet_name,
+                        body,
+                        None,
+                        "exception",
+                        None,
+                        f"{type(e).__name__}: {e}",
+                    )
+                )
+                continue
+            differences = compare_products(expected, actual, partial=engine in PARTIAL_ENGINES)
+            for position, field, want, got in differences:
+                mismatches.append(
+                    Mismatch(
+                        f"{quote_request.product_line}:{name}",
+                        sheet_name,
+                        body,
+                        position,
+                        field,
+                        want,
+                        got,
+                    )
+                )
+
+
+def run(
+    n_requests=1000,
+    n_sheets=10,
+    seed=0,
+    engines=None,
+    include_workbooks=True,
+    max_products=60,
+):
+    """
+    Fuzz the engines and return the list of Mismatch records. Requests are
+    spread evenly over the real workbooks (when present) and n_sheets
+    synthetic sheets of up to max_products rows.
+    """
+    engines = engines or {"fixed": FIXED_ENGINES, "variable": VARIABLE_ENGINES}
+    rng = np.random.default_rng(seed)
+
+    calculators = []
+    fixed_path = os.path.join(EXCEL_DIR, "Fixed Annuity Rates.xlsx")
+    variable_path = os.path.join(EXCEL_DIR, "Variable Annuity Rates.xlsx")
+    if include_workbooks and os.path.exists(fixed_path) and os.path.exists(variable_path):
+        calculators.append(("workbooks", AnnuityCalculator(fixed_path, variable_path)))
+    for i in range(n_sheets):
+        fixed = synthetic_fixed_data(rng, int(rng.integers(0, max_products + 1)))
+        variable = synthetic_variable_data(rng, int(rng.integers(0, max_products + 1)))
+        calculators.append((f"synthetic-{i}", AnnuityCalculator.from_frames(fixed, variable)))
+
+    mismatches = []
+    per_sheet = max(1, n_requests // max(1, len(calculators)))
+    for sheet_name, calculator in calculators:
+        requests = [random_request(rng) for _ in range(per_sheet)]
+        fuzz_calculator(calculator, sheet_name, requests, engines, mismatches)
+    return mismatches
+
+
+def _select_engines(names):
+    if not names:
+        return None
+    selected = {"fixed": {}, "variable": {}}
+    registry = {"fixed": FIXED_ENGINES, "variable": VARIABLE_ENGINES}
+    for name in names:
+        line, _, engine = name.partition(":")
+        if line not in registry or engine not in registry[line]:
+            available = [f"{l}:{e}" for l, r in registry.items() for e in r]
+            raise SystemExit(f"Unknown engine {name!r}; available: {', '.join(available)}")
+        selected[line][engine] = registry[line][engine]
+    return selected
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--sheets", type=int, default=20, help="Synthetic sheets to generate")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--engines", nargs="*", help="Only these engines, e.g. fixed:quote variable:stream"
+    )
+    parser.add_argument("--show", type=int, default=20, help="Mismatches to print")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    started = time.monotonic()
+    mismatches = run(args.requests, args.sheets, args.seed, _select_engines(args.engines))
+    elapsed = time.monotonic() - started
+
+    for m in mismatches[: args.show]:
+        print(
+            f"{m.engine} on {m.sheet}, product {m.position}, {m.field}: "
+            f"expected {m.expected!r}, got {m.actual!r} for {m.request}"
+        )
+    engines_hit = sorted({m.engine for m in mismatches})
+    print(
+        f"{args.requests:,} requests x {args.sheets} synthetic sheets in {elapsed:.1f}s: "
+        f"{len(mismatches):,} mismatches"
+        + (f" ({', '.join(engines_hit)})" if engines_hit else ""),
+        file=sys.stderr,
+    )
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,288 @@
+import os
+import logging
+import tempfile
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+
+logger = logging.getLogger(__name__)
+
+XLSX_MIMETYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# Exports with more product rows than this are built in the export pool
+EXPORT_POOL_MIN_ROWS = int(os.environ.get("EXPORT_POOL_MIN_ROWS", 100))
+EXPORT_WORKERS = int(os.environ.get("EXPORT_WORKERS", 1))
+# Calculators an export worker keeps, by snapshot version, for as_of exports
+WORKER_SNAPSHOTS = 4
+
+# Number formats copied from the source workbooks
+CURRENCY_FORMAT = '_("$"* #,##0.00_);_("$"* \\(#,##0.00\\);_("$"* "-"??_);_(@_)'
+WHOLE_DOLLAR_FORMAT = '"$"#,##0_);[Red]\\("$"#,##0\\)'
+RATE_FORMAT = '_(* #,##0.00_);_(* \\(#,##0.00\\);_(* "-"??_);_(@_)'
+YIELD_FORMAT = '_(* #,##0.000_);_(* \\(#,##0.000\\);_(* "-"??_);_(@_)'
+DOLLAR_CENTS_FORMAT = '"$"#,##0.00'
+PERCENT_FORMAT = "0.00%"
+
+# "FORMATTED 1" (Fixed Annuity Rates.xlsx): header on row 9, columns A-K
+FIXED_COLUMNS = [
+    ("Sort", "sort", None, 8),
+    ("Company Name", "company", None, 34),
+    ("Product Name", "product", None, 36),
+    ("Years", "years", None, 8),
+    ("Min. Contribution", "min_contribution", WHOLE_DOLLAR_FORMAT, 16),
+    ("Min. Rate", "min_rate", RATE_FORMAT, 10),
+    ("Base Rate", "base_rate", RATE_FORMAT, 10),
+    ("Bonus Rate", "bonus_rate", RATE_FORMAT, 10),
+    ("Yield to Surr", "yield_to_surrender", YIELD_FORMAT, 12),
+    ("Surrender Period", "surrender_period", None, 16),
+    ("Your result", "future_value", RATE_FORMAT, 16),
+]
+
+# "Formatted" (Variable Annuity Rates.xlsx): header on row 11; only the output
+# columns are written, each in the column letter it has in the source sheet
+VARIABLE_COLUMNS = {
+    "A": ("Sort", "sort", None, 8),
+    "B": ("Annuity Type", "annuity_type", None, 14),
+    "C": ("Carrier", "carrier", None, 28),
+    "E": ("Rider Name", "rider_name", None, 42),
+    "P": ("Benefit Base Amount", "benefit_base", DOLLAR_CENTS_FORMAT, 20),
+    "Q": ("Withdrawal Rate", "withdrawal_rate", PERCENT_FORMAT, 16),
+    "S": ("Annual Lifetime Income Amount", "annual_lifetime_income", DOLLAR_CENTS_FORMAT, 20),
+}
+VARIABLE_WIDTH = 19  # A through S
+
+# Immediate annuities have no source sheet; one row per payout option
+IMMEDIATE_COLUMNS = [
+    ("Payout Option", "label", None, 30),
+    ("Years Certain", "years_certain", None, 14),
+    ("Annuity Factor", "annuity_factor", YIELD_FORMAT, 16),
+    ("Monthly Income", "monthly_income", DOLLAR_CENTS_FORMAT, 18),
+    ("Annual Income", "annual_income", DOLLAR_CENTS_FORMAT, 18),
+]
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+_worker_calculators = OrderedDict()
+
+
+def _cell(ws, value, number_format=None, bold=False):
+    cell = WriteOnlyCell(ws, value=value)
+    if number_format:
+        cell.number_format = number_format
+    if bold:
+        cell.font = Font(bold=True)
+    return cell
+
+
+def _write_fixed_sheet(wb, amount, products, current_age=None):
+    ws = wb.create_sheet("FORMATTED 1")
+    for letter, (_, _, _, width) in zip("ABCDEFGHIJK", FIXED_COLUMNS):
+        ws.column_dimensions[letter].width = width
+
+    ws.append([None, _cell(ws, "Inputs from website", bold=True)])
+    ws.append([None, "Current Age", current_age])
+    ws.append([None, "Amount", _cell(ws, amount, CURRENCY_FORMAT)])
+    for _ in range(5):
+        ws.append([])
+    ws.append([_cell(ws, title, bold=True) for title, _, _, _ in FIXED_COLUMNS])
+
+    rows = 0
+    for product in products:
+        ws.append(
+            [
+                _cell(ws, product[key], number_format) if number_format else product[key]
+                for _, key, number_format, _ in FIXED_COLUMNS
+            ]
+        )
+        rows += 1
+    return rows
+
+
+def _write_variable_sheet(wb, amount, current_age, withdrawal_age, products):
+    ws = wb.create_sheet("Formatted")
+    positions = {letter: ord(letter) - ord("A") for letter in VARIABLE_COLUMNS}
+    for letter, (_, _, _, width) in VARIABLE_COLUMNS.items():
+        ws.column_dimensions[letter].width = width
+
+    ws.append([None, _cell(ws, "Inputs from website", bold=True)])
+    ws.append([None, "Current Age", current_age])
+    ws.append([None, "Age at first withdrawal", withdrawal_age])
+    ws.append([None, "Initial Investment Amount", _cell(ws, amount, DOLLAR_CENTS_FORMAT)])
+    ws.append(
+        [None, "Deferral Period (years until first withdrawal)", withdrawal_age - current_age]
+    )
+    for _ in range(4):
+        ws.append([])
+    ws.append([None, _cell(ws, "Variable Annuity Lifetime Withdrawal Benefits", bold=True)])
+
+    header = [None] * VARIABLE_WIDTH
+    for letter, (title, _, _, _) in VARIABLE_COLUMNS.items():
+        header[positions[letter]] = _cell(ws, title, bold=True)
+    ws.append(header)
+
+    rows = 0
+    for product in products:
+        row = [None] * VARIABLE_WIDTH
+        for letter, (_, key, number_format, _) in VARIABLE_COLUMNS.items():
+            value = product[key]
+            if key == "withdrawal_rate":
+                value = value / 100  # API reports percent, the sheet stores a fraction
+            row[positions[letter]] = (
+                _cell(ws, value, number_format) if number_format else value
+            )
+        ws.append(row)
+        rows += 1
+    return rows
+
+
+def _write_immediate_sheet(wb, result):
+    ws = wb.create_sheet("Immediate")
+    for letter, (_, _, _, width) in zip("ABCDE", IMMEDIATE_COLUMNS):
+        ws.column_dimensions[letter].width = width
+
+    ws.append([_cell(ws, "Inputs from website", bold=True)])
+    ws.append(["Current Age", result["current_age"]])
+    ws.append(["Sex", result["sex"].title()])
+    ws.append(["Premium", _cell(ws, result["premium"], CURRENCY_FORMAT)])
+    ws.append(["Interest Rate", _cell(ws, result["interest_rate"] / 100, PERCENT_FORMAT)])
+    ws.append(["Expense Load", _cell(ws, result["expense_load"] / 100, PERCENT_FORMAT)])
+    ws.append(["Mortality Table", result["mortality_table"]])
+    ws.append([])
+    ws.append([_cell(ws, title, bold=True) for title, _, _, _ in IMMEDIATE_COLUMNS])
+
+    for option in result["options"]:
+        ws.append(
+            [
+                _cell(ws, option[key], number_format) if number_format else option[key]
+                for _, key, number_format, _ in IMMEDIATE_COLUMNS
+            ]
+        )
+    return len(result["options"])
+
+
+def write_quote_workbook(calculator, quote_request, path):
+    """
+    Write a quote to an .xlsx at path using openpyxl's write-only mode, so rows
+    are streamed to disk as they are produced instead of held in a workbook.
+    Fixed quotes are laid out like "FORMATTED 1", variable quotes like "Formatted",
+    immediate quotes as one row per payout option.
+    Returns the number of product rows written.
+    """
+    wb = Workbook(write_only=True)
+    if quote_request.product_line == "immediate":
+        result = calculator.quote(quote_request)["result"]
+        if result is None:
+            raise ValueError("Immediate annuity factors not loaded")
+        rows = _write_immediate_sheet(wb, result)
+    elif quote_request.product_line == "fixed":
+        rows = _write_fixed_sheet(
+            wb,
+            quote_request.amount,
+            calculator.iter_fixed_rates(quote_request.amount, quote_request.state),
+            current_age=quote_request.current_age,
+        )
+    else:
+        rows = _write_variable_sheet(
+            wb,
+            quote_request.amount,
+            quote_request.current_age,
+            quote_request.withdrawal_age,
+            calculator.iter_variable_products(
+                quote_request.current_age,
+                quote_request.withdrawal_age,
+                quote_request.amount,
+            ),
+        )
+    wb.save(path)
+    return rows
+
+
+def _export_in_worker(snapshot_version, fixed_data, variable_data, quote_request, path):
+    # The rate sheets travel with every task (a few hundred rows); the
+    # calculator and its caches are built once per snapshot per worker
+    from logic import AnnuityCalculator
+
+    calculator = _worker_calculators.pop(snapshot_version, None)
+    if calculator is None:
+        calculator = AnnuityCalculator.from_frames(fixed_data, variable_data)
+    _worker_calculators[snapshot_version] = calculator
+    while len(_worker_calculators) > WORKER_SNAPSHOTS:
+        _worker_calculators.popitem(last=False)
+    return write_quote_workbook(calculator, quote_request, path)
+
+
+def _get_pool():
+    # One pool per process, whatever snapshot an export is for, so a reload or
+    # an as_of export never shuts down a pool another request is submitting to
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool_pid != os.getpid():
+            context = (
+                multiprocessing.get_context("fork")
+                if "fork" in multiprocessing.get_all_start_methods()
+                else None
+            )
+            _pool = ProcessPoolExecutor(max_workers=EXPORT_WORKERS, mp_context=context)
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def export_quote(calculator, quote_request):
+    """
+    Build the workbook for a quote in a temporary file and return its path;
+    the caller streams it and deletes it. Exports larger than
+    EXPORT_POOL_MIN_ROWS run in the export process pool so they do not
+    compete with interactive quoting for this worker's CPU.
+    """
+    if quote_request.product_line == "fixed":
+        expected_rows = calculator.count_fixed_rates(quote_request.state)
+    elif quote_request.product_line == "immediate":
+        expected_rows = 0
+    else:
+        expected_rows = (
+            0 if calculator.variable_data is None else len(calculator.variable_data)
+        )
+
+    fd, path = tempfile.mkstemp(prefix="annuity-quote-", suffix=".xlsx")
+    os.close(fd)
+    try:
+        if expected_rows > EXPORT_POOL_MIN_ROWS:
+            rows = (
+                _get_pool()
+                .submit(
+                    _export_in_worker,
+                    calculator.snapshot_version,
+                    calculator.fixed_data,
+                    calculator.variable_data,
+                    quote_request,
+                    path,
+                )
+                .result()
+            )
+        else:
+            rows = write_quote_workbook(calculator, quote_request, path)
+    except Exception:
+        os.unlink(path)
+        raise
+
+    logger.info(f"Exported {rows} {quote_request.product_line} products to xlsx")
+    return path
+
+
+def iter_file_and_delete(path, chunk_size=64 * 1024):
+    """Yield a file in chunks, removing it once fully sent or abandoned."""
+    try:
+        with open(path, "rb") as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+    finally:
+        os.unlink(path)
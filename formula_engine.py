@@ -0,0 +1,1117 @@
+import time
+import logging
+
+import numpy as np
+from openpyxl import load_workbook
+from openpyxl.formula import Tokenizer
+from openpyxl.utils.cell import coordinate_to_tuple, get_column_letter, range_boundaries
+
+logger = logging.getLogger(__name__)
+
+
+class FormulaError(Exception):
+    pass
+
+
+class ExcelError:
+    """An Excel error value such as #N/A or #VALUE!. Numeric contexts treat it as NaN."""
+
+    __slots__ = ("code",)
+
+    def __init__(self, code):
+        self.code = code
+
+    def __repr__(self):
+        return self.code
+
+    def __eq__(self, other):
+        return isinstance(other, ExcelError) and other.code == self.code
+
+    def __hash__(self):
+        return hash(self.code)
+
+
+NA = ExcelError("#N/A")
+VALUE = ExcelError("#VALUE!")
+NAME = ExcelError("#NAME?")
+REF = ExcelError("#REF!")
+
+# env key holding the number of quotes being evaluated
+SIZE = "__size__"
+
+
+class _Dynamic:
+    """Placeholder for an input-dependent cell inside a lookup table."""
+
+    __slots__ = ("key",)
+
+    def __init__(self, key):
+        self.key = key
+
+
+def cell_name(key):
+    sheet, row, col = key
+    return f"'{sheet}'!{get_column_letter(col)}{row}"
+
+
+# ---------------------------------------------------------------------------
+# Value semantics
+# Every value is either a Python scalar (float, str, bool, None for a blank
+# cell, ExcelError) or a NumPy array with one element per evaluated quote.
+# ---------------------------------------------------------------------------
+
+
+def _scalar_number(value):
+    if value is None:
+        return 0.0
+    if isinstance(value, (bool, int, float, np.bool_, np.number)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            return np.nan
+    return np.nan
+
+
+def to_number(value):
+    if isinstance(value, np.ndarray):
+        if value.dtype.kind == "f":
+            return value
+        if value.dtype.kind in "biu":
+            return value.astype(float)
+        try:
+            return value.astype(float)
+        except (TypeError, ValueError):
+            return np.array([_scalar_number(v) for v in value], dtype=float)
+    return _scalar_number(value)
+
+
+def _scalar_bool(value):
+    if isinstance(value, (bool, np.bool_)):
+        return bool(value)
+    if value is None:
+        return False
+    if isinstance(value, (int, float, np.number)):
+        return value != 0
+    if isinstance(value, str):
+        return value.upper() == "TRUE"
+    return False
+
+
+def to_bool(value):
+    if isinstance(value, np.ndarray):
+        if value.dtype.kind == "b":
+            return value
+        if value.dtype.kind in "fiu":
+            return value != 0
+        return np.array([_scalar_bool(v) for v in value], dtype=bool)
+    return _scalar_bool(value)
+
+
+def _is_numeric(value):
+    if isinstance(value, np.ndarray):
+        return value.dtype.kind in "fiu"
+    return isinstance(value, (int, float, np.number)) and not isinstance(
+        value, (bool, np.bool_)
+    )
+
+
+def _is_boolean(value):
+    if isinstance(value, np.ndarray):
+        return value.dtype.kind == "b"
+    return isinstance(value, (bool, np.bool_))
+
+
+def _as_object(value):
+    if isinstance(value, np.ndarray) and value.dtype != object:
+        return value.astype(object)
+    return value
+
+
+def _type_rank(value):
+    # Excel orders numbers < text < logicals; blanks compare as the other side's zero value
+    if isinstance(value, (bool, np.bool_)):
+        return 2
+    if isinstance(value, str):
+        return 1
+    return 0
+
+
+_RANKS = {str: 1, bool: 2, np.bool_: 2, type(None): -1, ExcelError: -2}
+_BLANK_AS = {0: 0.0, 1: "", 2: False}
+
+
+def _ranks(values):
+    return np.fromiter((_RANKS.get(type(v), 0) for v in values), dtype=int, count=len(values))
+
+
+def _fill_blanks(values, ranks, other_ranks):
+    # A blank takes the zero value of whatever it is compared with
+    blank = ranks == -1
+    if blank.any():
+        values = values.copy()
+        ranks = ranks.copy()
+        for i in np.flatnonzero(blank):
+            rank = max(other_ranks[i], 0)
+            values[i] = _BLANK_AS[rank]
+            ranks[i] = rank
+    return values, ranks
+
+
+def _object_compare(op, a, b):
+    """Elementwise Excel comparison of mixed-type arrays, grouped by type rank."""
+    a, b = np.broadcast_arrays(np.asarray(a, dtype=object), np.asarray(b, dtype=object))
+    rank_a, rank_b = _ranks(a), _ranks(b)
+    a, rank_a = _fill_blanks(a, rank_a, rank_b)
+    b, rank_b = _fill_blanks(b, rank_b, rank_a)
+    compare_op = _COMPARISONS[op]
+    result = compare_op(rank_a, rank_b)
+    same = rank_a == rank_b
+    numbers = same & (rank_a == 0)
+    if numbers.any():
+        result[numbers] = compare_op(a[numbers].astype(float), b[numbers].astype(float))
+    text = same & (rank_a == 1)
+    if text.any():
+        lower_a = np.array([v.lower() for v in a[text]], dtype=object)
+        lower_b = np.array([v.lower() for v in b[text]], dtype=object)
+        result[text] = compare_op(lower_a, lower_b).astype(bool)
+    logical = same & (rank_a == 2)
+    if logical.any():
+        result[logical] = compare_op(a[logical].astype(bool), b[logical].astype(bool))
+    # A comparison with an error value is an error, which IF treats as not TRUE
+    result[(rank_a == -2) | (rank_b == -2)] = False
+    return result
+
+
+_SWAPPED = {"=": "=", "<>": "<>", "<": ">", ">": "<", "<=": ">=", ">=": "<="}
+
+
+def _compare_text_column(op, values, text):
+    """
+    Compare an object array against one text value. Such arrays are usually
+    lookup results with a handful of distinct strings, so each distinct value
+    is compared once.
+    """
+    try:
+        distinct, inverse = np.unique(values, return_inverse=True)
+    except TypeError:  # mixed types cannot be sorted
+        return _object_compare(op, values, text)
+    if not all(type(v) is str for v in distinct):
+        return _object_compare(op, values, text)
+    outcomes = np.array([_scalar_compare(op, v, text) for v in distinct], dtype=bool)
+    return outcomes[inverse]
+
+
+def _scalar_compare(op, a, b):
+    if isinstance(a, ExcelError):
+        return a
+    if isinstance(b, ExcelError):
+        return b
+    if a is None:
+        a = "" if isinstance(b, str) else (False if isinstance(b, bool) else 0.0)
+    if b is None:
+        b = "" if isinstance(a, str) else (False if isinstance(a, bool) else 0.0)
+    rank_a, rank_b = _type_rank(a), _type_rank(b)
+    if rank_a != rank_b:
+        a, b = rank_a, rank_b
+    elif rank_a == 1:
+        a, b = a.lower(), b.lower()
+    elif rank_a == 0:
+        a, b = float(a), float(b)
+    return _COMPARISONS[op](a, b)
+
+
+_COMPARISONS = {
+    "=": lambda a, b: a == b,
+    "<>": lambda a, b: a != b,
+    "<": lambda a, b: a < b,
+    ">": lambda a, b: a > b,
+    "<=": lambda a, b: a <= b,
+    ">=": lambda a, b: a >= b,
+}
+
+_ARITHMETIC = {
+    "+": np.add,
+    "-": np.subtract,
+    "*": np.multiply,
+    "/": np.true_divide,
+    "^": np.power,
+}
+
+
+def compare(op, a, b):
+    if (_is_numeric(a) and _is_numeric(b)) or (_is_boolean(a) and _is_boolean(b)):
+        if isinstance(a, np.ndarray) or isinstance(b, np.ndarray):
+            return _COMPARISONS[op](a, b)
+        return bool(_COMPARISONS[op](a, b))
+    if isinstance(a, np.ndarray) or isinstance(b, np.ndarray):
+        if b is None and _is_numeric(a):
+            b = 0.0
+        if a is None and _is_numeric(b):
+            a = 0.0
+        if _is_numeric(a) and _is_numeric(b):
+            return _COMPARISONS[op](a, b)
+        if isinstance(b, str) and isinstance(a, np.ndarray) and a.dtype == object:
+            return _compare_text_column(op, a, b)
+        if isinstance(a, str) and isinstance(b, np.ndarray) and b.dtype == object:
+            return _compare_text_column(_SWAPPED[op], b, a)
+        # A numeric array against text or a logical never compares values, only type ranks
+        if _is_numeric(a) and isinstance(b, (str, bool)):
+            return np.full(np.shape(a), _COMPARISONS[op](0, _type_rank(b)))
+        if _is_numeric(b) and isinstance(a, (str, bool)):
+            return np.full(np.shape(b), _COMPARISONS[op](_type_rank(a), 0))
+        return _object_compare(op, a, b)
+    return _scalar_compare(op, a, b)
+
+
+def arithmetic(op, a, b):
+    # Callers run under np.errstate(all="ignore"): x/0 is inf and errors are NaN, never raised
+    a, b = to_number(a), to_number(b)
+    if isinstance(a, np.ndarray) or isinstance(b, np.ndarray):
+        return _ARITHMETIC[op](a, b)
+    return float(_ARITHMETIC[op](np.float64(a), b))
+
+
+def concat(a, b):
+    def text(v):
+        if v is None:
+            return ""
+        if isinstance(v, (bool, np.bool_)):
+            return "TRUE" if v else "FALSE"
+        if isinstance(v, float) and v.is_integer():
+            return str(int(v))
+        return str(v)
+
+    if isinstance(a, np.ndarray) or isinstance(b, np.ndarray):
+        a, b = np.broadcast_arrays(np.asarray(a, dtype=object), np.asarray(b, dtype=object))
+        return np.array([text(x) + text(y) for x, y in zip(a, b)], dtype=object)
+    return text(a) + text(b)
+
+
+def select(condition, if_true, if_false):
+    """Vectorised IF: both branches are already evaluated."""
+    if _is_numeric(if_true) and _is_numeric(if_false):
+        return np.where(condition, if_true, if_false).astype(float)
+    if _is_boolean(if_true) and _is_boolean(if_false):
+        return np.where(condition, if_true, if_false)
+    if_true = np.asarray(_as_object(if_true), dtype=object) if isinstance(if_true, np.ndarray) else if_true
+    if_false = np.asarray(_as_object(if_false), dtype=object) if isinstance(if_false, np.ndarray) else if_false
+    result = np.empty(len(condition), dtype=object)
+    result[:] = if_false if not isinstance(if_false, np.ndarray) else if_false
+    if isinstance(if_true, np.ndarray):
+        result[condition] = if_true[condition]
+    else:
+        result[condition] = [if_true] * int(condition.sum())
+    return result
+
+
+# ---------------------------------------------------------------------------
+# Parsing: openpyxl tokens -> AST tuples
+# ---------------------------------------------------------------------------
+
+_INFIX_PRECEDENCE = {
+    "=": 1, "<>": 1, "<": 1, ">": 1, "<=": 1, ">=": 1,
+    "&": 2,
+    "+": 3, "-": 3,
+    "*": 4, "/": 4,
+    "^": 5,
+}
+_PREFIX_PRECEDENCE = 6
+
+
+def parse_reference(text, sheet):
+    """Return ("ref", key) or ("range", sheet, min_col, min_row, max_col, max_row)."""
+    if "!" in text:
+        sheet_part, text = text.rsplit("!", 1)
+        sheet = sheet_part[1:-1].replace("''", "'") if sheet_part.startswith("'") else sheet_part
+    text = text.replace("$", "")
+    if ":" in text:
+        min_col, min_row, max_col, max_row = range_boundaries(text)
+        if None in (min_col, min_row, max_col, max_row):
+            raise FormulaError(f"Whole row/column references are not supported: {text}")
+        return ("range", sheet, min_col, min_row, max_col, max_row)
+    try:
+        row, col = coordinate_to_tuple(text)
+    except (ValueError, TypeError):
+        raise FormulaError(f"Unsupported reference (named range?): {text}")
+    return ("ref", (sheet, row, col))
+
+
+class _Parser:
+    def __init__(self, formula, sheet):
+        tokens = Tokenizer(formula).items
+        self.tokens = [t for t in tokens if t.type != "WHITE-SPACE"]
+        self.pos = 0
+        self.sheet = sheet
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def take(self):
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def parse(self):
+        node = self.expression(0)
+        if self.peek() is not None:
+            raise FormulaError(f"Unexpected token {self.peek().value!r}")
+        return node
+
+    def expression(self, min_precedence):
+        left = self.unary()
+        while True:
+            token = self.peek()
+            if token is None:
+                return left
+            if token.type == "OPERATOR-POSTFIX" and token.value == "%":
+                self.take()
+                left = ("bin", "/", left, ("num", 100.0))
+                continue
+            if token.type != "OPERATOR-INFIX":
+                return left
+            precedence = _INFIX_PRECEDENCE.get(token.value)
+            if precedence is None:
+                raise FormulaError(f"Unsupported operator {token.value!r}")
+            if precedence < min_precedence:
+                return left
+            self.take()
+            # ^ is left-associative in Excel, like every other operator
+            right = self.expression(precedence + 1)
+            left = ("bin", token.value, left, right)
+
+    def unary(self):
+        token = self.peek()
+        if token is not None and token.type == "OPERATOR-PREFIX":
+            self.take()
+            operand = self.expression(_PREFIX_PRECEDENCE)
+            return ("neg", operand) if token.value == "-" else operand
+        return self.primary()
+
+    def primary(self):
+        token = self.take()
+        if token.type == "OPERAND":
+            if token.subtype == "NUMBER":
+                return ("num", float(token.value))
+            if token.subtype == "TEXT":
+                return ("str", token.value[1:-1].replace('""', '"'))
+            if token.subtype == "LOGICAL":
+                return ("bool", token.value.upper() == "TRUE")
+            if token.subtype == "ERROR":
+                return ("err", token.value)
+            if token.subtype == "RANGE":
+                return parse_reference(token.value, self.sheet)
+        if token.type == "PAREN" and token.subtype == "OPEN":
+            node = self.expression(0)
+            closing = self.take()
+            if closing.type != "PAREN":
+                raise FormulaError("Unbalanced parentheses")
+            return node
+        if token.type == "FUNC" and token.subtype == "OPEN":
+            name = token.value[:-1].upper()
+            args = []
+            if self.peek().type == "FUNC" and self.peek().subtype == "CLOSE":
+                self.take()
+                return ("call", name, args)
+            while True:
+                nxt = self.peek()
+                if nxt.type == "SEP" or (nxt.type == "FUNC" and nxt.subtype == "CLOSE"):
+                    args.append(("empty",))
+                else:
+                    args.append(self.expression(0))
+                sep = self.take()
+                if sep.type == "FUNC" and sep.subtype == "CLOSE":
+                    return ("call", name, args)
+                if sep.type != "SEP":
+                    raise FormulaError(f"Unexpected token {sep.value!r} in {name}()")
+        raise FormulaError(f"Unexpected token {token.value!r}")
+
+
+def parse_formula(formula, sheet):
+    return _Parser(formula, sheet).parse()
+
+
+def _references(node, found):
+    kind = node[0]
+    if kind in ("ref", "range"):
+        found.append(node)
+    elif kind == "bin":
+        _references(node[2], found)
+        _references(node[3], found)
+    elif kind == "neg":
+        _references(node[1], found)
+    elif kind == "call":
+        for arg in node[2]:
+            _references(arg, found)
+    return found
+
+
+# ---------------------------------------------------------------------------
+# Workbook access
+# ---------------------------------------------------------------------------
+
+
+class _SheetCells:
+    """Non-empty cells of a workbook, loaded one sheet at a time in read-only mode."""
+
+    def __init__(self, path):
+        self.workbook = load_workbook(path, read_only=True, data_only=False)
+        self.sheets = {}
+
+    def sheet(self, name):
+        if name not in self.sheets:
+            if name not in self.workbook.sheetnames:
+                raise FormulaError(f"Unknown sheet {name!r}")
+            cells = {}
+            for r, row in enumerate(
+                self.workbook[name].iter_rows(min_row=1, min_col=1, values_only=True), 1
+            ):
+                for c, value in enumerate(row, 1):
+                    if value is not None:
+                        if hasattr(value, "text"):  # ArrayFormula
+                            value = value.text
+                        cells[(r, c)] = value
+            self.sheets[name] = cells
+        return self.sheets[name]
+
+    def get(self, key):
+        sheet, row, col = key
+        return self.sheet(sheet).get((row, col))
+
+    def keys_in(self, sheet, min_col, min_row, max_col, max_row):
+        cells = self.sheet(sheet)
+        return [
+            (sheet, r, c)
+            for (r, c) in cells
+            if min_row <= r <= max_row and min_col <= c <= max_col
+        ]
+
+    def close(self):
+        self.workbook.close()
+
+
+# ---------------------------------------------------------------------------
+# Compilation
+# ---------------------------------------------------------------------------
+
+
+def _is_formula(value):
+    return isinstance(value, str) and value.startswith("=") and len(value) > 1
+
+
+def _constant_value(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    if isinstance(value, str) and value.startswith("#") and value.endswith(("!", "?", "A")):
+        return ExcelError(value)
+    if hasattr(value, "toordinal") and not isinstance(value, str):
+        return value  # dates are kept as-is; no formula in the calculators does date math
+    return value
+
+
+class CompiledWorkbook:
+    """
+    A workbook's formula cells compiled once into a dependency-ordered list of
+    NumPy closures over a set of input cells.
+
+    Cells that do not depend on the inputs are evaluated at compile time and
+    folded into constants; only the input-dependent part of the graph runs per
+    evaluate() call, on arrays with one element per quote.
+    """
+
+    def __init__(self, path, inputs, targets):
+        """
+        path: workbook to compile
+        inputs: {name: (sheet, "E5")} cells replaced by evaluate() arguments
+        targets: iterable of (sheet, "U11") cells whose values evaluate() returns
+        """
+        started = time.monotonic()
+        self.path = path
+        self.inputs = {
+            name: (sheet,) + coordinate_to_tuple(coordinate)
+            for name, (sheet, coordinate) in inputs.items()
+        }
+        self.targets = [
+            (sheet,) + coordinate_to_tuple(coordinate) for sheet, coordinate in targets
+        ]
+        self.errors = {}
+        self.constants = {}
+        self.program = []
+
+        source = _SheetCells(path)
+        try:
+            with np.errstate(all="ignore"):
+                self._compile(source)
+        finally:
+            source.close()
+
+        self.compile_seconds = time.monotonic() - started
+        logger.info(
+            f"Compiled {len(self.program)} input-dependent and {len(self.constants)} constant cells "
+            f"from {path} in {self.compile_seconds:.2f}s ({len(self.errors)} unsupported)"
+        )
+
+    # -- dependency graph ---------------------------------------------------
+
+    def _compile(self, source):
+        input_keys = set(self.inputs.values())
+        parsed = {}
+        order = []
+        state = {}  # key -> 1 visiting, 2 done
+
+        def dependencies(key):
+            if key in input_keys:
+                return []
+            value = source.get(key)
+            if not _is_formula(value):
+                return []
+            try:
+                node = parse_formula(value, key[0])
+            except FormulaError as e:
+                self.errors[key] = str(e)
+                return []
+            except Exception as e:
+                self.errors[key] = f"Could not parse {value!r}: {e}"
+                return []
+            parsed[key] = node
+            deps = []
+            for ref in _references(node, []):
+                if ref[0] == "ref":
+                    deps.append(ref[1])
+                else:
+                    deps.extend(source.keys_in(*ref[1:]))
+            return deps
+
+        # Iterative post-order DFS so long formula chains cannot hit the recursion limit
+        for target in self.targets:
+            if state.get(target) == 2:
+                continue
+            stack = [(target, None)]
+            while stack:
+                key, deps = stack.pop()
+                if deps is None:
+                    if state.get(key) == 2:
+                        continue
+                    if state.get(key) == 1:
+                        self.errors[key] = "Circular reference"
+                        continue
+                    state[key] = 1
+                    deps = iter(dependencies(key))
+                nxt = next(deps, None)
+                if nxt is None:
+                    state[key] = 2
+                    order.append(key)
+                    continue
+                stack.append((key, deps))
+                if state.get(nxt) == 1:
+                    self.errors[nxt] = "Circular reference"
+                elif state.get(nxt) != 2:
+                    stack.append((nxt, None))
+
+        dynamic = set(input_keys)
+        for key in order:
+            if key in input_keys:
+                continue
+            if key in self.errors:
+                self.constants[key] = NAME
+                continue
+            if key not in parsed:
+                self.constants[key] = _constant_value(source.get(key))
+                continue
+            try:
+                fn, is_dynamic = self._compile_node(parsed[key], dynamic, source)
+            except FormulaError as e:
+                self.errors[key] = str(e)
+                self.constants[key] = NAME
+                continue
+            if is_dynamic:
+                dynamic.add(key)
+                self.program.append((key, fn))
+            else:
+                self.constants[key] = fn(self.constants)
+
+    # -- expression compiler ------------------------------------------------
+
+    def _compile_node(self, node, dynamic, source):
+        """Return (closure(env) -> value, depends_on_inputs)."""
+        kind = node[0]
+        if kind == "num" or kind == "str" or kind == "bool":
+            value = node[1]
+            return (lambda env: value), False
+        if kind == "err":
+            value = ExcelError(node[1])
+            return (lambda env: value), False
+        if kind == "empty":
+            return (lambda env: None), False
+        if kind == "ref":
+            key = node[1]
+            if key in dynamic:
+                return (lambda env: env[key]), True
+            value = self.constants.get(key, _constant_value(source.get(key)))
+            return (lambda env: value), False
+        if kind == "range":
+            raise FormulaError("A range can only be used as a function argument")
+        if kind == "neg":
+            operand, is_dynamic = self._compile_node(node[1], dynamic, source)
+            fn = lambda env: arithmetic("-", 0.0, operand(env))
+            return self._fold(fn, is_dynamic)
+        if kind == "bin":
+            op = node[1]
+            left, left_dynamic = self._compile_node(node[2], dynamic, source)
+            right, right_dynamic = self._compile_node(node[3], dynamic, source)
+            if op in _ARITHMETIC:
+                fn = lambda env: arithmetic(op, left(env), right(env))
+            elif op == "&":
+                fn = lambda env: concat(left(env), right(env))
+            else:
+                fn = lambda env: compare(op, left(env), right(env))
+            return self._fold(fn, left_dynamic or right_dynamic)
+        if kind == "call":
+            return self._compile_call(node[1], node[2], dynamic, source)
+        raise FormulaError(f"Unsupported expression {kind}")
+
+    def _fold(self, fn, is_dynamic):
+        if is_dynamic:
+            return fn, True
+        value = fn(self.constants)
+        return (lambda env: value), False
+
+    def _compile_values(self, args, dynamic, source):
+        """Compile arguments where ranges expand to their non-empty cells."""
+        compiled = []
+        any_dynamic = False
+        for arg in args:
+            if arg[0] == "range":
+                for key in source.keys_in(*arg[1:]):
+                    fn, is_dynamic = self._compile_node(("ref", key), dynamic, source)
+                    compiled.append(fn)
+                    any_dynamic |= is_dynamic
+            else:
+                fn, is_dynamic = self._compile_node(arg, dynamic, source)
+                compiled.append(fn)
+                any_dynamic |= is_dynamic
+        return compiled, any_dynamic
+
+    def _grid(self, node, dynamic, source):
+        """
+        Cells of a lookup table as rows of values; a cell that depends on the
+        inputs is a ("dynamic", key) placeholder resolved from env at evaluation.
+        """
+        if node[0] != "range":
+            raise FormulaError("Lookup table must be a cell range")
+        sheet, min_col, min_row, max_col, max_row = node[1:]
+        grid = []
+        for row in range(min_row, max_row + 1):
+            values = []
+            for col in range(min_col, max_col + 1):
+                key = (sheet, row, col)
+                if key in dynamic:
+                    values.append(_Dynamic(key))
+                else:
+                    values.append(self.constants.get(key, _constant_value(source.get(key))))
+            grid.append(values)
+        return grid
+
+    def _compile_call(self, name, args, dynamic, source):
+        if name == "IF":
+            if not 1 <= len(args) <= 3:
+                raise FormulaError("IF takes 1 to 3 arguments")
+            condition, cond_dynamic = self._compile_node(args[0], dynamic, source)
+            if_true, true_dynamic = self._compile_node(
+                args[1] if len(args) > 1 else ("bool", True), dynamic, source
+            )
+            if_false, false_dynamic = self._compile_node(
+                args[2] if len(args) > 2 else ("bool", False), dynamic, source
+            )
+            if not cond_dynamic:
+                # Constant condition: keep only the branch Excel would evaluate
+                return (if_true, true_dynamic) if to_bool(condition(self.constants)) else (if_false, false_dynamic)
+
+            def fn(env):
+                c = to_bool(condition(env))
+                if not isinstance(c, np.ndarray):
+                    return if_true(env) if c else if_false(env)
+                return select(c, if_true(env), if_false(env))
+
+            return fn, True
+
+        if name in ("AND", "OR"):
+            values, is_dynamic = self._compile_values(args, dynamic, source)
+            reduce = np.logical_and if name == "AND" else np.logical_or
+
+            def fn(env):
+                result = None
+                for value in values:
+                    b = to_bool(value(env))
+                    result = b if result is None else reduce(result, b)
+                return bool(result) if not isinstance(result, np.ndarray) else result
+
+            return self._fold(fn, is_dynamic)
+
+        if name == "NOT":
+            value, is_dynamic = self._compile_node(args[0], dynamic, source)
+            fn = lambda env: np.logical_not(to_bool(value(env))) if isinstance(value(env), np.ndarray) else not to_bool(value(env))
+            return self._fold(fn, is_dynamic)
+
+        if name in ("SUM", "MIN", "MAX"):
+            values, is_dynamic = self._compile_values(args, dynamic, source)
+            op = {"SUM": np.add, "MIN": np.minimum, "MAX": np.maximum}[name]
+
+            def fn(env):
+                result = None
+                for value in values:
+                    v = value(env)
+                    if isinstance(v, str) or v is None:
+                        continue  # text and blanks are ignored, as in Excel ranges
+                    v = to_number(v)
+                    result = v if result is None else op(result, v)
+                if result is None:
+                    return 0.0
+                return result if isinstance(result, np.ndarray) else float(result)
+
+            return self._fold(fn, is_dynamic)
+
+        if name in ("ROUND", "ROUNDUP", "ROUNDDOWN"):
+            value, value_dynamic = self._compile_node(args[0], dynamic, source)
+            digits, digits_dynamic = self._compile_node(args[1], dynamic, source)
+
+            def fn(env):
+                x = to_number(value(env))
+                scale = 10.0 ** to_number(digits(env))
+                if name == "ROUND":
+                    # Excel rounds half away from zero
+                    r = np.sign(x) * np.floor(np.abs(x) * scale + 0.5) / scale
+                elif name == "ROUNDUP":
+                    r = np.sign(x) * np.ceil(np.abs(x) * scale) / scale
+                else:
+                    r = np.sign(x) * np.floor(np.abs(x) * scale) / scale
+                return r if isinstance(r, np.ndarray) else float(r)
+
+            return self._fold(fn, value_dynamic or digits_dynamic)
+
+        if name == "ABS":
+            value, is_dynamic = self._compile_node(args[0], dynamic, source)
+            fn = lambda env: np.abs(to_number(value(env)))
+            return self._fold(fn, is_dynamic)
+
+        if name == "IFERROR":
+            value, value_dynamic = self._compile_node(args[0], dynamic, source)
+            fallback, fallback_dynamic = self._compile_node(args[1], dynamic, source)
+
+            def fn(env):
+                v = value(env)
+                if isinstance(v, np.ndarray):
+                    if v.dtype.kind == "f":
+                        bad = np.isnan(v)
+                    elif v.dtype == object:
+                        bad = np.array([isinstance(x, ExcelError) for x in v], dtype=bool)
+                    else:
+                        return v
+                    return select(~bad, v, fallback(env)) if bad.any() else v
+                if isinstance(v, ExcelError) or (isinstance(v, float) and np.isnan(v)):
+                    return fallback(env)
+                return v
+
+            return self._fold(fn, value_dynamic or fallback_dynamic)
+
+        if name in ("HLOOKUP", "VLOOKUP"):
+            return self._compile_lookup(name, args, dynamic, source)
+
+        raise FormulaError(f"Unsupported function {name}()")
+
+    def _compile_lookup(self, name, args, dynamic, source):
+        if not 3 <= len(args) <= 4:
+            raise FormulaError(f"{name} takes 3 or 4 arguments")
+        lookup, lookup_dynamic = self._compile_node(args[0], dynamic, source)
+        grid = self._grid(args[1], dynamic, source)
+        index_fn, index_dynamic = self._compile_node(args[2], dynamic, source)
+        approximate = True
+        if len(args) == 4 and args[3][0] != "empty":
+            approx_fn, approx_dynamic = self._compile_node(args[3], dynamic, source)
+            if approx_dynamic:
+                raise FormulaError(f"{name} with an input-dependent match type is not supported")
+            approximate = to_bool(approx_fn(self.constants))
+
+        # Orient the table so line 0 holds the keys and line i-1 the results for index i
+        lines = grid if name == "HLOOKUP" else [list(column) for column in zip(*grid)]
+        keys = lines[0]
+        dynamic_keys = [(j, k.key) for j, k in enumerate(keys) if isinstance(k, _Dynamic)]
+
+        numeric = [
+            (float(k), i)
+            for i, k in enumerate(keys)
+            if isinstance(k, (int, float)) and not isinstance(k, bool)
+        ]
+        numeric_keys = np.array([k for k, _ in numeric], dtype=float)
+        numeric_positions = np.array([i for _, i in numeric], dtype=int)
+        # Exact match takes the first equal key wherever it sits: search a stable sorted copy
+        exact_order = np.argsort(numeric_keys, kind="stable")
+        exact_keys = numeric_keys[exact_order]
+        exact_positions = numeric_positions[exact_order]
+        text_positions = {}
+        for i, k in enumerate(keys):
+            if isinstance(k, str):
+                text_positions.setdefault(k.lower(), i)
+
+        def positions(x):
+            """Position of the match for each lookup value, -1 when there is none."""
+            if x.dtype.kind not in "fiu":
+                return np.array(
+                    [text_positions.get(v.lower(), -1) if isinstance(v, str) else -1 for v in x],
+                    dtype=int,
+                )
+            if not len(numeric_keys):
+                return np.full(len(x), -1)
+            x = x.astype(float)
+            if approximate:
+                # Excel's approximate match assumes ascending keys: the last key <= x
+                found = np.searchsorted(numeric_keys, x, side="right") - 1
+                return np.where(found >= 0, numeric_positions[np.maximum(found, 0)], -1)
+            found = np.minimum(np.searchsorted(exact_keys, x, side="left"), len(exact_keys) - 1)
+            return np.where(exact_keys[found] == x, exact_positions[found], -1)
+
+        constant_keys = np.array(
+            [float(k) if _is_numeric(k) else np.nan for k in keys], dtype=float
+        )
+
+        def positions_in(env, x):
+            """positions() for keys that depend on the inputs: one key row per quote."""
+            matrix = np.empty((len(keys), len(x)))
+            matrix[:] = constant_keys[:, None]
+            for j, key in dynamic_keys:
+                matrix[j] = to_number(env[key])
+            x = to_number(x)
+            if approximate:
+                found = (matrix <= x[None, :]).sum(axis=0) - 1
+            else:
+                equal = matrix == x[None, :]
+                found = np.where(equal.any(axis=0), equal.argmax(axis=0), -1)
+            return found
+
+        width = len(keys)
+        # Results as a (lines, width + 1) matrix; the extra column is the "no match" value
+        constant_table = not any(isinstance(v, _Dynamic) for line in lines for v in line)
+        all_numeric = all(_is_numeric(v) or isinstance(v, _Dynamic) for line in lines for v in line)
+        dtype = float if all_numeric else object
+        missing = np.nan if all_numeric else NA
+        table = np.array(
+            [
+                [np.nan if isinstance(v, _Dynamic) else v for v in line] + [missing]
+                for line in lines
+            ]
+            if all_numeric
+            else [[v for v in line] + [missing] for line in lines],
+            dtype=dtype,
+        )
+        dynamic_cells = [
+            (i, j, v.key)
+            for i, line in enumerate(lines)
+            for j, v in enumerate(line)
+            if isinstance(v, _Dynamic)
+        ]
+        if not index_dynamic:
+            constant_index = int(to_number(index_fn(self.constants)))
+            if not 1 <= constant_index <= len(lines):
+                value = REF
+                return (lambda env: value), False
+            # Only the result line of this index has to be resolved per evaluation
+            dynamic_cells = [cell for cell in dynamic_cells if cell[0] == constant_index - 1]
+
+        def lookup_values(env, size):
+            x = lookup(env)
+            if not isinstance(x, np.ndarray):
+                x = np.array([x], dtype=object if isinstance(x, str) else float)
+            if x.shape != (size,):
+                x = np.broadcast_to(x, (size,))
+            if x.dtype == object and all(_is_numeric(v) for v in x):
+                x = x.astype(float)
+            return x
+
+        if not (index_dynamic or dynamic_cells or dynamic_keys):
+            # Common case: a constant table and result line, only the lookup value varies
+            result_line = table[constant_index - 1]
+
+            def fn(env):
+                pos = positions(lookup_values(env, env[SIZE]))
+                return result_line[np.where(pos >= 0, pos, width)]
+
+            if lookup_dynamic:
+                return fn, True
+            value = fn({SIZE: 1})[0]
+            value = float(value) if _is_numeric(value) else value
+            return (lambda env: value), False
+
+        def fn(env):
+            size = env[SIZE]
+            x = lookup_values(env, size)
+            pos = positions_in(env, x) if dynamic_keys else positions(x)
+            pos = np.where(pos >= 0, pos, width)
+
+            if index_dynamic:
+                index = np.broadcast_to(to_number(index_fn(env)), (size,))
+                line = np.where(np.isnan(index), -1, np.floor(index)).astype(int) - 1
+            else:
+                line = np.full(size, constant_index - 1)
+            bad_index = (line < 0) | (line >= len(lines))
+            line = np.where(bad_index, 0, line)
+
+            if constant_table:
+                out = table[line, pos]
+            else:
+                out = np.empty(size, dtype=dtype)
+                out[:] = table[line, pos]
+                for i, j, key in dynamic_cells:
+                    hit = (line == i) & (pos == j)
+                    if hit.any():
+                        value = np.broadcast_to(env[key], (size,))
+                        if all_numeric:
+                            value = to_number(value)
+                        out[hit] = value[hit]
+            if bad_index.any():
+                out = _as_object(out)
+                out[bad_index] = REF
+            return out
+
+        return fn, True
+
+    # -- evaluation ---------------------------------------------------------
+
+    def evaluate(self, **inputs):
+        """
+        Evaluate the compiled graph for one or many quotes.
+        Each keyword is an input name with a scalar or a 1-D array (all of one length).
+        Returns {target_key: value} with arrays for input-dependent targets.
+        """
+        missing = set(self.inputs) - set(inputs)
+        if missing:
+            raise ValueError(f"Missing inputs: {', '.join(sorted(missing))}")
+        size = max(np.size(v) for v in inputs.values())
+        env = {SIZE: size}
+        for name, key in self.inputs.items():
+            env[key] = np.broadcast_to(np.asarray(inputs[name], dtype=float), (size,))
+        with np.errstate(all="ignore"):
+            for key, fn in self.program:
+                env[key] = fn(env)
+        return {
+            key: env[key] if key in env else self.constants.get(key)
+            for key in self.targets
+        }
+
+
+class GuaranteedIncomeCalculator:
+    """
+    The "Single Life Calculator" sheet of the guaranteed income master workbook,
+    compiled once. quote() and quote_many() replace Excel for this sheet:
+    inputs are issue age (E5), age at first withdrawal (E6) and investment (E7);
+    every product row reports Benefit Base (R), Withdrawal Rate (S) and
+    Annual Lifetime Income (U).
+    """
+
+    SHEET = "Single Life Calculator"
+    INPUTS = {"current_age": "E5", "withdrawal_age": "E6", "amount": "E7"}
+    OUTPUTS = {"benefit_base": "R", "withdrawal_rate": "S", "annual_lifetime_income": "U"}
+    FIRST_PRODUCT_ROW = 11
+
+    def __init__(self, path):
+        self.path = path
+        self.products = self._find_products(path)
+        self.engine = CompiledWorkbook(
+            path,
+            inputs={name: (self.SHEET, cell) for name, cell in self.INPUTS.items()},
+            targets=[
+                (self.SHEET, f"{column}{product['row']}")
+                for product in self.products
+                for column in self.OUTPUTS.values()
+            ],
+        )
+        if self.engine.errors:
+            logger.warning(
+                f"{len(self.engine.errors)} unsupported cells in {path}: "
+                + ", ".join(cell_name(k) for k in list(self.engine.errors)[:5])
+            )
+
+    def _find_products(self, path):
+        wb = load_workbook(path, read_only=True)
+        try:
+            ws = wb[self.SHEET]
+            products = []
+            section = None
+            for row_number, row in enumerate(
+                ws.iter_rows(min_row=1, max_col=21, values_only=True), 1
+            ):
+                carrier, rider_name, income = row[0], row[4], row[20]
+                if isinstance(carrier, str) and rider_name is None:
+                    if carrier.strip().endswith("Benefits"):
+                        section = carrier.strip()
+                    continue
+                if row_number < self.FIRST_PRODUCT_ROW or rider_name is None or income is None:
+                    continue
+                products.append(
+                    {
+                        "row": row_number,
+                        "section": section,
+                        "carrier": carrier.strip() if isinstance(carrier, str) else carrier,
+                        "rider_name": rider_name.strip() if isinstance(rider_name, str) else rider_name,
+                    }
+                )
+            return products
+        finally:
+            wb.close()
+
+    def quote_many(self, current_age, withdrawal_age, amount):
+        """
+        Evaluate many quotes at once; arguments are scalars or equal-length arrays.
+        Returns {output: 2-D array (products x quotes)}; non-numeric cells such as
+        "N/A" stay in object arrays.
+        """
+        values = self.engine.evaluate(
+            current_age=current_age, withdrawal_age=withdrawal_age, amount=amount
+        )
+        size = max(np.size(current_age), np.size(withdrawal_age), np.size(amount))
+        outputs = {}
+        for name, column in self.OUTPUTS.items():
+            cells = [
+                np.broadcast_to(
+                    np.asarray(values[(self.SHEET, product["row"], column_index(column))], dtype=object),
+                    (size,),
+                )
+                for product in self.products
+            ]
+            outputs[name] = np.array(cells, dtype=object)
+        return outputs
+
+    def quote(self, current_age, withdrawal_age, amount):
+        outputs = self.quote_many(current_age, withdrawal_age, amount)
+        products = []
+        for i, product in enumerate(self.products):
+            result = {k: v for k, v in product.items() if k != "row"}
+            for name in self.OUTPUTS:
+                result[name] = _json_value(outputs[name][i, 0])
+            products.append(result)
+        return {
+            "current_age": current_age,
+            "withdrawal_age": withdrawal_age,
+            "deferral_period": withdrawal_age - current_age,
+            "investment_amount": amount,
+            "products": products,
+            "count": len(products),
+        }
+
+
+def column_index(letter):
+    return coordinate_to_tuple(f"{letter}1")[1]
+
+
+def _json_value(value):
+    """Cell value as something jsonify can emit: NaN as null, errors as their code."""
+    if isinstance(value, (bool, np.bool_)):
+        return bool(value)
+    if isinstance(value, (int, float, np.number)):
+        value = float(value)
+        return None if np.isnan(value) or np.isinf(value) else round(value, 6)
+    if isinstance(value, ExcelError):
+        return value.code
+    if isinstance(value, str):
+        return value.strip()
+    return value
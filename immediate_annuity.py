@@ -0,0 +1,180 @@
+import os
+import hashlib
+import logging
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from quote_request import PAYOUT_OPTIONS, SEXES
+
+logger = logging.getLogger(__name__)
+
+# Bundled annuitant mortality table: Age, Male, Female columns of annual q(x),
+# consecutive ages ending in q = 1. It is a made-up Gompertz-Makeham table, so
+# quotes from it are labelled illustrative
+BUNDLED_MORTALITY_TABLE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "excel files", "Annuitant Mortality.csv"
+)
+MORTALITY_TABLE_PATH = os.environ.get("MORTALITY_TABLE_PATH", BUNDLED_MORTALITY_TABLE)
+# Citation of the published table at MORTALITY_TABLE_PATH (e.g. "2012 IAR Basic, SOA");
+# quotes are labelled illustrative until one is given
+MORTALITY_TABLE_SOURCE = os.environ.get("MORTALITY_TABLE_SOURCE", "").strip() or None
+ILLUSTRATIVE_MORTALITY_TABLE = "Illustrative Gompertz-Makeham table (not a published table)"
+# Pricing assumptions: annual effective interest, and the share of the premium
+# kept for expenses before the rest buys income
+IMMEDIATE_INTEREST_RATE = float(os.environ.get("IMMEDIATE_INTEREST_RATE", 0.045))
+IMMEDIATE_EXPENSE_LOAD = float(os.environ.get("IMMEDIATE_EXPENSE_LOAD", 0.03))
+
+# payout option -> (label, years certain, paid for life)
+PAYOUT_OPTION_TERMS = {
+    "life": ("Life Only", 0, True),
+    "life_10": ("Life with 10 Years Certain", 10, True),
+    "life_20": ("Life with 20 Years Certain", 20, True),
+    "period_10": ("10 Years Certain", 10, False),
+    "period_20": ("20 Years Certain", 20, False),
+}
+
+
+def load_mortality_table(path=MORTALITY_TABLE_PATH):
+    """Annual q(x) indexed by age, one column per sex, checked for gaps and a terminal age."""
+    table = pd.read_csv(path)
+    table.columns = [str(column).strip().lower() for column in table.columns]
+    table = table.set_index("age")[list(SEXES)].astype(float)
+
+    ages = table.index.to_numpy()
+    if (np.diff(ages) != 1).any():
+        raise ValueError(f"Mortality table {path} must list consecutive ages")
+    if ((table < 0) | (table > 1)).any().any():
+        raise ValueError(f"Mortality table {path} has rates outside 0-1")
+    if (table.iloc[-1] != 1).any():
+        raise ValueError(f"Mortality table {path} must end with q = 1 at its last age")
+    return table
+
+
+def annuity_factors(qx, interest_rate):
+    """
+    Present value of 1 a month, paid at the end of each month, for every
+    payout option (rows, PAYOUT_OPTIONS order) and every table age (columns).
+
+    Survivorship is interpolated within each year of age assuming a uniform
+    distribution of deaths. One suffix sum over the monthly discounted
+    survivors gives every life annuity at once:
+        a(x) = sum over months m > 12x of v^m l(m) / (v^(12x) l(12x))
+    """
+    qx = np.asarray(qx, dtype=float)
+    years = len(qx)
+    survivors = np.concatenate(([1.0], np.cumprod(1 - qx)))
+
+    months = np.arange(12 * years + 1)
+    year, fraction = np.divmod(months, 12)
+    q_at = np.append(qx, 1.0)[year]
+    v = (1 + interest_rate) ** (-1 / 12)
+    discounted = v ** months * survivors[year] * (1 - fraction / 12 * q_at)
+    # tail[m] = sum of discounted[m:], padded so lookups past the table are 0
+    tail = np.append(np.cumsum(discounted[::-1])[::-1], np.zeros(12 * 20 + 1))
+
+    start = 12 * np.arange(years)
+    alive = discounted[start]
+    factors = np.empty((len(PAYOUT_OPTIONS), years))
+    for row, option in enumerate(PAYOUT_OPTIONS):
+        _, certain_years, for_life = PAYOUT_OPTION_TERMS[option]
+        certain_months = 12 * certain_years
+        certain = v * (1 - v ** certain_months) / (1 - v)
+        life = 0.0
+        if for_life:
+            with np.errstate(divide="ignore", invalid="ignore"):
+                life = np.where(alive > 0, tail[start + certain_months + 1] / alive, 0.0)
+        factors[row] = certain + life
+    return factors
+
+
+class ImmediateAnnuityTable:
+    """
+    Monthly annuity factors for every sex, payout option and age, computed
+    once from a mortality table and interest rate into one array. Quoting is
+    an index into that array and a multiply; nothing is summed per request.
+    """
+
+    def __init__(self, mortality, interest_rate, expense_load, source=None):
+        self.interest_rate = interest_rate
+        self.expense_load = expense_load
+        # Citation of the mortality table, or None for an illustrative one
+        self.source = source
+        self.min_age = int(mortality.index[0])
+        self.max_age = int(mortality.index[-1])
+        # factors[sex, option, age - min_age]
+        self.factors = np.stack(
+            [annuity_factors(mortality[sex].to_numpy(), interest_rate) for sex in SEXES]
+        )
+        self._sex_index = {sex: i for i, sex in enumerate(SEXES)}
+        # Changes with anything that changes a quote: mortality, interest or expense load
+        digest = hashlib.sha256(self.factors.tobytes())
+        digest.update(repr((self.min_age, expense_load, source)).encode())
+        self.version = digest.hexdigest()[:12]
+
+    def quote(self, premium, age, sex, payout_option="life"):
+        """
+        Guaranteed monthly income the premium buys under every payout option,
+        with payout_option's figures repeated at the top level. illustrative is
+        True unless the mortality table has a cited source.
+        """
+        if not self.min_age <= age <= self.max_age:
+            raise ValueError(f"Age {age} is outside the mortality table ({self.min_age}-{self.max_age})")
+
+        factors = self.factors[self._sex_index[sex], :, age - self.min_age]
+        monthly = premium * (1 - self.expense_load) / factors
+
+        options = []
+        for option, factor, income in zip(PAYOUT_OPTIONS, factors.tolist(), monthly.tolist()):
+            label, certain_years, _ = PAYOUT_OPTION_TERMS[option]
+            options.append(
+                {
+                    "payout_option": option,
+                    "label": label,
+                    "years_certain": certain_years,
+                    "annuity_factor": round(factor, 4),
+                    "monthly_income": round(income, 2),
+                    "annual_income": round(income * 12, 2),
+                }
+            )
+
+        selected = options[PAYOUT_OPTIONS.index(payout_option)]
+        return {
+            "current_age": age,
+            "sex": sex,
+            "premium": premium,
+            "payout_option": payout_option,
+            "interest_rate": round(self.interest_rate * 100, 4),
+            "expense_load": round(self.expense_load * 100, 4),
+            "mortality_table": self.source or ILLUSTRATIVE_MORTALITY_TABLE,
+            "illustrative": self.source is None,
+            "monthly_income": selected["monthly_income"],
+            "annual_income": selected["annual_income"],
+            "options": options,
+            "count": len(options),
+        }
+
+
+@lru_cache(maxsize=4)
+def load_immediate_table(
+    path=MORTALITY_TABLE_PATH,
+    interest_rate=IMMEDIATE_INTEREST_RATE,
+    expense_load=IMMEDIATE_EXPENSE_LOAD,
+    source=MORTALITY_TABLE_SOURCE,
+):
+    """The ImmediateAnnuityTable for a mortality file and assumptions, built once per process."""
+    if source is not None and os.path.abspath(path) == BUNDLED_MORTALITY_TABLE:
+        logger.warning(
+            "MORTALITY_TABLE_SOURCE is ignored for the bundled illustrative table; "
+            "set MORTALITY_TABLE_PATH to the published table it cites"
+        )
+        source = None
+    table = ImmediateAnnuityTable(
+        load_mortality_table(path), interest_rate, expense_load, source
+    )
+    logger.info(
+        f"Immediate annuity factors built for ages {table.min_age}-{table.max_age} "
+        f"at {interest_rate:.2%} interest"
+    )
+    return table
@@ -1,73 +1,418 @@
+import json
+import math
+import hashlib
 import pandas as pd
+import numpy as np
 import logging
 from data_processor import clean_fixed_annuity_data, load_variable_annuity_data
+from immediate_annuity import load_immediate_table
+from quote_request import MIN_AMOUNT, parse_quote_request
+from rate_diff import diff_sheet
+from search_index import DEFAULT_SEARCH_LIMIT, SEARCH_FIELDS, ProductSearchIndex
+from simulation import run_simulation
 
 logger = logging.getLogger(__name__)
 
 
+def compute_snapshot_version(*frames):
+    """
+    Short content hash of the loaded rate sheets.
+    Depends only on column names and cell values, so the same rates give the
+    same version however they were loaded.
+    """
+    digest = hashlib.sha256()
+    for frame in frames:
+        if frame is None:
+            digest.update(b"-")
+            continue
+        digest.update("\x1f".join(map(str, frame.columns)).encode())
+        digest.update(pd.util.hash_pandas_object(frame, index=False).to_numpy().tobytes())
+    return digest.hexdigest()[:12]
+
+
+# Ranking objectives per product line, mapped to the sheet column they read
+FIXED_OBJECTIVES = {
+    "future_value": "Yield to Surrender",
+    "yield_to_surrender": "Yield to Surrender",
+    "bonus_rate": "Bonus Rate",
+    "base_rate": "Base Rate",
+}
+VARIABLE_OBJECTIVES = {
+    "lifetime_income": "Withdrawal Rate",
+    "withdrawal_rate": "Withdrawal Rate",
+}
+DEFAULT_OBJECTIVES = {"fixed": "future_value", "variable": "lifetime_income"}
+DEFAULT_TOP_K = 5
+MAX_TOP_K = 50
+
+# Goal seek answers above this are reported as unreachable: past ~9e13 a float
+# can no longer hold every cent, and no client invests a trillion dollars
+MAX_REQUIRED_AMOUNT = 1e12
+# Most cents the closed-form answer is raised to cover float error
+CENT_ADJUSTMENT_STEPS = 10
+
+
+def parse_ranking_options(data, product_line):
+    """
+    Read objective and k for a top-K request.
+    Returns (options, None) or (None, errors).
+    """
+    if product_line not in DEFAULT_OBJECTIVES:
+        return None, [f"Ranking is not available for {product_line.title()} annuities"]
+
+    errors = []
+    objectives = FIXED_OBJECTIVES if product_line == "fixed" else VARIABLE_OBJECTIVES
+    objective = data.get("objective") or DEFAULT_OBJECTIVES[product_line]
+    if objective not in objectives:
+        errors.append(f"Objective must be one of: {', '.join(objectives)}")
+
+    k = DEFAULT_TOP_K
+    if data.get("k") not in (None, ""):
+        try:
+            k = int(data["k"])
+            if not 1 <= k <= MAX_TOP_K:
+                raise ValueError
+        except (TypeError, ValueError, OverflowError):
+            errors.append(f"K must be a whole number between 1 and {MAX_TOP_K}")
+
+    return (None, errors) if errors else ({"objective": objective, "k": k}, None)
+
+
+def _compact_json(value):
+    # What jsonify writes outside debug mode: sorted keys, no spaces
+    return json.dumps(value, sort_keys=True, separators=(",", ":"))
+
+
+def _json_number(value):
+    # json.dumps writes finite numbers with repr; only NaN and infinity need it
+    return repr(value) if math.isfinite(value) else json.dumps(value)
+
+
+def _sort_key(sort):
+    """Sort column as a tie-break key; products without a Sort number go last."""
+    return np.where(np.isnan(sort), np.inf, sort)
+
+
+def _optional_ints(values):
+    """A float column as Python ints, None where missing."""
+    return [None if math.isnan(value) else int(value) for value in values.tolist()]
+
+
+def _optional_strs(values):
+    """A text column as Python strs, "" where missing."""
+    return [str(value) if pd.notna(value) else "" for value in values.tolist()]
+
+
+def _patched_state_bits(previous, old_positions, dirty, restrictions):
+    """
+    fixed_state_bits() for a new load of the fixed sheet from the previous
+    load's: every bit moves to its product's new position (old_positions,
+    -1 for new products) and only dirty and new products are read from
+    their States again.
+    """
+    def moved(bits):
+        # The appended False is what position -1 picks up
+        return np.append(np.unpackbits(bits), False)[old_positions]
+
+    dirty = np.flatnonzero(dirty | (old_positions < 0))
+    open_products = moved(previous["open"])
+    open_products[dirty] = [restrictions[i] is None for i in dirty]
+    codes = set(previous["states"])
+    for i in dirty:
+        if restrictions[i]:
+            codes.update(restrictions[i].split(","))
+
+    states = {}
+    for code in codes:
+        mask = moved(previous["states"][code]) if code in previous["states"] else open_products.copy()
+        mask[dirty] = [
+            restrictions[i] is None or code in restrictions[i].split(",") for i in dirty
+        ]
+        # A state no product lists any more is just the open products
+        if not np.array_equal(mask, open_products):
+            states[code] = np.packbits(mask)
+    return {
+        "all": np.packbits(np.ones(len(old_positions), dtype=bool)),
+        "open": np.packbits(open_products),
+        "states": states,
+    }
+
+
+def _required_amounts(exact, target, value_at):
+    """
+    Turn exact solutions into whole-cent investments: the smallest cent amount
+    whose displayed (cent-rounded) value_at(amount, i) reaches target, floored at
+    the site minimum. Infinite solutions, and those above MAX_REQUIRED_AMOUNT,
+    are infinite. Returns (amounts, minimum_applied) arrays.
+    """
+    amounts = np.ceil(np.round(exact * 100, 6)) / 100
+    amounts[amounts > MAX_REQUIRED_AMOUNT] = np.inf
+    for i in np.flatnonzero(np.isfinite(amounts)):
+        # In cents. The closed form reaches target but for float error, so a
+        # cent or two above it always does
+        hi = int(round(amounts[i] * 100))
+        for _ in range(CENT_ADJUSTMENT_STEPS):
+            if value_at(hi / 100, i) >= target:
+                break
+            hi += 1
+        else:
+            amounts[i] = np.inf
+            continue
+        # Rounding half a cent up lets amounts down to the one solving
+        # target - 0.005 reach target too; bisect the cents in between, since
+        # with a small rate that can be many cents
+        lo = int(exact[i] * (target - 0.01) / target * 100)
+        if lo <= 0 or value_at(lo / 100, i) >= target:
+            lo = 0
+        while hi - lo > 1:
+            mid = (lo + hi) // 2
+            if value_at(mid / 100, i) >= target:
+                hi = mid
+            else:
+                lo = mid
+        amounts[i] = hi / 100
+    minimum_applied = amounts < MIN_AMOUNT
+    return np.maximum(amounts, MIN_AMOUNT), minimum_applied
+
+
 class AnnuityCalculator:
     def __init__(self, fixed_file_path, variable_file_path):
-        self.fixed_data = None
-        self.variable_data = None
+        fixed_data = None
+        variable_data = None
 
         try:
-            self.fixed_data = clean_fixed_annuity_data(fixed_file_path)
+            fixed_data = clean_fixed_annuity_data(fixed_file_path)
             logger.info("Fixed annuity data loaded successfully")
         except Exception as e:
             logger.error(f"Failed to load fixed annuity data: {str(e)}")
 
         try:
-            self.variable_data = load_variable_annuity_data(variable_file_path)
+            variable_data = load_variable_annuity_data(variable_file_path)
             logger.info("Variable annuity data loaded successfully")
         except Exception as e:
             logger.error(f"Failed to load variable annuity data: {str(e)}")
 
+        self._set_frames(fixed_data, variable_data)
+        self.immediate_table()
+
+    @classmethod
+    def from_frames(cls, fixed_data, variable_data):
+        """
+        Build a calculator around rate sheets that are already loaded, in the
+        shape clean_fixed_annuity_data / load_variable_annuity_data return.
+        Either frame may be None.
+        """
+        calculator = cls.__new__(cls)
+        calculator._set_frames(fixed_data, variable_data)
+        return calculator
+
+    def _set_frames(self, fixed_data, variable_data):
+        self.fixed_data = fixed_data
+        self.variable_data = variable_data
+        self._fixed_columns = None
+        self._fixed_state_bits = None
+        self._fixed_templates = None
+        self._variable_columns = None
+        self._search_indexes = {}
+        self._immediate_table = None
+        self.changes = {}
+        self.snapshot_version = compute_snapshot_version(fixed_data, variable_data)
+        self._sheet_versions = {
+            "fixed": compute_snapshot_version(fixed_data),
+            "variable": compute_snapshot_version(variable_data),
+        }
+
+    def updated(self, fixed_data, variable_data):
+        """
+        A warm calculator for newly loaded rate sheets, built from this one.
+        Each sheet is diffed against the loaded one by product identity
+        (rate_diff.diff_sheet) and the change sets kept in .changes. An
+        unchanged sheet keeps its frame and every cache; a changed one has its
+        state bitsets, search index entries, records and JSON templates
+        patched for the added, changed and removed products only.
+        """
+        calculator = AnnuityCalculator.from_frames(fixed_data, variable_data)
+        calculator._immediate_table = self._immediate_table
+        for line, old, new in (
+            ("fixed", self.fixed_data, fixed_data),
+            ("variable", self.variable_data, variable_data),
+        ):
+            if old is None or new is None:
+                continue
+            changes = calculator.changes[line] = diff_sheet(line, old, new)
+            if changes:
+                calculator._patch_caches(self, changes)
+            else:
+                calculator._share_caches(self, line)
+            logger.info(f"{line.title()} sheet changes: {changes.summary()}")
+        return calculator.warm()
+
+    def _share_caches(self, previous, product_line):
+        if product_line == "fixed":
+            self.fixed_data = previous.fixed_data
+            self._fixed_columns = previous._fixed_columns
+            self._fixed_state_bits = previous._fixed_state_bits
+            self._fixed_templates = previous._fixed_templates
+        else:
+            self.variable_data = previous.variable_data
+            self._variable_columns = previous._variable_columns
+        if product_line in previous._search_indexes:
+            self._search_indexes[product_line] = previous._search_indexes[product_line]
+
+    def _patch_caches(self, previous, changes):
+        """
+        Carry previous's caches for one sheet over to this calculator's load
+        of it. The NumPy columns are re-sorted whole, which is one vectorised
+        sort; the per-product work is only redone for changes.dirty products.
+        """
+        line = changes.product_line
+        if line == "fixed":
+            data, old_data = self.fixed_data, previous.fixed_data
+            columns, old_columns = self.fixed_columns(), previous.fixed_columns()
+        else:
+            data, old_data = self.variable_data, previous.variable_data
+            columns, old_columns = self.variable_columns(), previous.variable_columns()
+
+        # Sheet rows to column positions, in both loads
+        rows = data.index.get_indexer(columns["index"])
+        old_position = np.empty(len(old_data), dtype=np.intp)
+        old_position[old_data.index.get_indexer(old_columns["index"])] = np.arange(len(old_data))
+        old_rows = changes.old_rows[rows]
+        old_positions = np.where(old_rows >= 0, old_position[np.maximum(old_rows, 0)], -1)
+        dirty = changes.dirty[rows]
+
+        if line == "fixed" and previous._fixed_state_bits is not None:
+            self._fixed_state_bits = _patched_state_bits(
+                previous._fixed_state_bits, old_positions, dirty, self._fixed_restrictions()
+            )
+        if line == "fixed" and previous._fixed_templates is not None:
+            fresh = (
+                self._fixed_template(row)
+                for _, row in data.loc[columns["index"][dirty]].iterrows()
+            )
+            self._fixed_templates = [
+                next(fresh) if changed else previous._fixed_templates[old]
+                for old, changed in zip(old_positions.tolist(), dirty.tolist())
+            ]
+
+        if line in previous._search_indexes:
+            old_index, old_records = previous._search_indexes[line]
+            ordered = data.loc[columns["index"]]
+            index = old_index.patched(
+                old_positions, self._search_names(line, ordered), columns["Sort"]
+            )
+            fresh = iter(ordered[dirty].to_dict("records"))
+            records = [
+                next(fresh) if changed else old_records[old]
+                for old, changed in zip(old_positions.tolist(), dirty.tolist())
+            ]
+            self._search_indexes[line] = (index, records)
+
+    def sheet_versions(self):
+        """
+        Version of the rates each product line is quoted from. A quote of one
+        line stays valid while its version does, whatever happens to the others.
+        """
+        table = self.immediate_table()
+        return dict(self._sheet_versions, immediate=table.version if table else None)
+
+    def warm(self):
+        """
+        Build the per-sheet caches (columns, state bitsets, JSON templates,
+        search indexes, immediate annuity factors) up front, so a calculator swapped in for
+        live traffic is fast from its first request.
+        """
+        self.immediate_table()
+        if self.fixed_data is not None:
+            self.fixed_columns()
+            self.fixed_state_bits()
+            self.fixed_json_templates()
+            self.search_index("fixed")
+        if self.variable_data is not None:
+            self.variable_columns()
+            self.search_index("variable")
+        return self
+
     def validate_input(self, data):
-        errors = []
+        _, errors = parse_quote_request(data)
+        return errors
 
-        required_fields = ["amount", "annuity_type"]
-        for field in required_fields:
-            if not data.get(field):
-                errors.append(f"{field.replace('_', ' ').title()} is required")
+    def quote(self, quote_request):
+        """
+        Run a parsed QuoteRequest through the matching engine.
+        Returns the /api/calculate response payload.
+        """
+        if quote_request.product_line == "fixed":
+            results = self.get_fixed_rates(quote_request.amount, quote_request.state)
+            return {
+                "type": "fixed",
+                "results": results,
+                "count": len(results),
+                "state_filtered": self.filters_by_state(quote_request.state),
+            }
 
-        try:
-            amount = float(data.get("amount", 0))
-            if amount < 50000:
-                errors.append("Amount must be at least $50,000")
-        except:
-            errors.append("Amount must be a valid number")
-
-        annuity_type = data.get("annuity_type", "").lower()
-        if annuity_type == "variable":
-            try:
-                current_age = int(data.get("current_age", 0))
-                if current_age < 18 or current_age > 100:
-                    errors.append("Current Age must be between 18 and 100")
-            except:
-                errors.append("Current Age is required for Variable annuities")
+        if quote_request.product_line == "immediate":
+            result = self.get_immediate_income(
+                quote_request.amount,
+                quote_request.current_age,
+                quote_request.sex,
+                quote_request.payout_option,
+            )
+            return {"type": "immediate", "result": result}
 
-            try:
-                withdrawal_age = int(data.get("withdrawal_age", 0))
-                if withdrawal_age < 59:
-                    errors.append("Age of First Withdrawal must be at least 59")
-                if withdrawal_age > 100:
-                    errors.append("Age of First Withdrawal must be 100 or less")
-            except:
-                errors.append(
-                    "Age of First Withdrawal is required for Variable annuities"
-                )
+        result = self.get_variable_income(
+            current_age=quote_request.current_age,
+            withdrawal_age=quote_request.withdrawal_age,
+            amount=quote_request.amount,
+        )
+        return {"type": "variable", "result": result}
 
-            try:
-                current_age = int(data.get("current_age", 0))
-                withdrawal_age = int(data.get("withdrawal_age", 0))
-                if withdrawal_age <= current_age:
-                    errors.append(
-                        "Age of First Withdrawal must be greater than Current Age"
-                    )
-            except:
-                pass
+    def iter_quote(self, quote_request):
+        """
+        Streaming form of quote(): a header record with the product count and
+        snapshot version, then one record per product.
+        """
+        if quote_request.product_line == "fixed":
+            yield {
+                "type": "fixed",
+                "count": self.count_fixed_rates(quote_request.state),
+                "state_filtered": self.filters_by_state(quote_request.state),
+                "snapshot_version": self.snapshot_version,
+            }
+            yield from self.iter_fixed_rates(quote_request.amount, quote_request.state)
+            return
 
-        return errors if errors else None
+        if quote_request.product_line == "immediate":
+            result = self.get_immediate_income(
+                quote_request.amount,
+                quote_request.current_age,
+                quote_request.sex,
+                quote_request.payout_option,
+            )
+            options = result.pop("options") if result else []
+            yield {
+                "type": "immediate",
+                "count": len(options),
+                "snapshot_version": self.snapshot_version,
+                **(result or {}),
+            }
+            yield from options
+            return
+
+        current_age = quote_request.current_age
+        withdrawal_age = quote_request.withdrawal_age
+        yield {
+            "type": "variable",
+            "count": 0 if self.variable_data is None else len(self.variable_data),
+            "snapshot_version": self.snapshot_version,
+            "current_age": current_age,
+            "withdrawal_age": withdrawal_age,
+            "deferral_period": withdrawal_age - current_age,
+            "investment_amount": quote_request.amount,
+        }
+        yield from self.iter_variable_products(
+            current_age, withdrawal_age, quote_request.amount
+        )
 
     def calculate_fixed_future_value(self, amount, yield_to_surrender):
         """
@@ -89,58 +434,271 @@ class AnnuityCalculator:
         """
         Return all fixed annuity products with all columns.
         Show all rows from Excel (no filtering by minimum contribution).
+        When a state is given, only products available in that state are returned.
         Calculate future value based on user's investment amount.
         """
         if self.fixed_data is None:
             logger.error("Fixed annuity data not loaded")
             return []
 
+        results = list(self.iter_fixed_rates(amount, state))
+
+        logger.info(f"Returning {len(results)} fixed annuity products")
+        return results
+
+    def count_fixed_rates(self, state=None):
+        """Number of products iter_fixed_rates will yield, without building them."""
+        if self.fixed_data is None:
+            return 0
+        if state is None:
+            return len(self.fixed_data)
+        return int(np.unpackbits(self.fixed_mask(state)).sum())
+
+    def iter_fixed_rates(self, amount, state=None):
+        """
+        Yield the get_fixed_rates products one at a time, in the same order.
+        Used by streaming responses so memory does not grow with product count.
+        """
+        if self.fixed_data is None:
+            return
+
         # Show all products - no filtering (as per Excel "I would show all columns and all rows for output")
-        filtered = self.fixed_data.copy()
+        # Base Rate descending, in the order cached by fixed_columns()
+        index = self.fixed_columns()["index"]
+        if state is not None:
+            index = index[self.fixed_positions(state)]
 
-        # Sort by Base Rate descending
-        filtered = filtered.sort_values("Base Rate", ascending=False)
+        for _, row in self.fixed_data.loc[index].iterrows():
+            yield self._fixed_product(row, amount)
 
-        # Convert to list of dicts with all columns
-        results = []
-        for _, row in filtered.iterrows():
-            years = int(row["Years"]) if pd.notna(row["Years"]) else None
-            base_rate = float(row["Base Rate"]) if pd.notna(row["Base Rate"]) else 0
-            yield_to_surrender = (
-                float(row["Yield to Surrender"])
-                if pd.notna(row["Yield to Surrender"])
-                else 0
-            )
+    def _fixed_product(self, row, amount):
+        """One fixed sheet row as the get_fixed_rates dict with all columns."""
+        years = int(row["Years"]) if pd.notna(row["Years"]) else None
+        base_rate = float(row["Base Rate"]) if pd.notna(row["Base Rate"]) else 0
+        yield_to_surrender = (
+            float(row["Yield to Surrender"])
+            if pd.notna(row["Yield to Surrender"])
+            else 0
+        )
+
+        # Calculate future value based on user's actual investment amount
+        # Using Yield to Surrender rate and 10 years (as per Excel formula)
+        future_value = self.calculate_fixed_future_value(amount, yield_to_surrender)
+
+        return {
+            "sort": int(row["Sort"]) if pd.notna(row["Sort"]) else None,
+            "company": str(row["Company"]) if pd.notna(row["Company"]) else "",
+            "product": str(row["Product"]) if pd.notna(row["Product"]) else "",
+            "years": years,
+            "min_contribution": float(row["Min Contribution"])
+            if pd.notna(row["Min Contribution"])
+            else 0,
+            "min_rate": float(row["Min Rate"]) if pd.notna(row["Min Rate"]) else 0,
+            "base_rate": base_rate,
+            "bonus_rate": float(row["Bonus Rate"])
+            if pd.notna(row["Bonus Rate"])
+            else 0,
+            "yield_to_surrender": float(row["Yield to Surrender"])
+            if pd.notna(row["Yield to Surrender"])
+            else 0,
+            "surrender_period": int(row["Surrender Period"])
+            if pd.notna(row["Surrender Period"])
+            else None,
+            "future_value": future_value,
+        }
+
+    def fixed_json_templates(self):
+        """
+        Every fixed product pre-encoded as get_fixed_rates returns it, in
+        fixed_columns() order: (JSON before future_value, JSON after it,
+        growth factor). The JSON is what jsonify writes for the product dict
+        (sorted keys, compact separators); the growth factor is
+        (1 + Yield to Surrender/100)^10, or None where the future value is
+        the amount itself. Built once per loaded sheet.
+        """
+        if self._fixed_templates is None:
+            ordered = self.fixed_data.loc[self.fixed_columns()["index"]]
+            self._fixed_templates = [self._fixed_template(row) for _, row in ordered.iterrows()]
+        return self._fixed_templates
+
+    def _fixed_template(self, row):
+        # future_value is the one amount-dependent field; it is left out here
+        product = self._fixed_product(row, 0)
+        yield_to_surrender = product["yield_to_surrender"]
+        # Same operations as calculate_fixed_future_value, so the same float
+        growth = (1 + yield_to_surrender / 100.0) ** 10 if yield_to_surrender > 0 else None
+        head = _compact_json({k: v for k, v in product.items() if k < "future_value"})
+        tail = _compact_json({k: v for k, v in product.items() if k > "future_value"})
+        return head[:-1] + ',"future_value":', "," + tail[1:], growth
 
-            # Calculate future value based on user's actual investment amount
-            # Using Yield to Surrender rate and 10 years (as per Excel formula)
-            future_value = self.calculate_fixed_future_value(amount, yield_to_surrender)
-
-            result = {
-                "sort": int(row["Sort"]) if pd.notna(row["Sort"]) else None,
-                "company": str(row["Company"]) if pd.notna(row["Company"]) else "",
-                "product": str(row["Product"]) if pd.notna(row["Product"]) else "",
-                "years": years,
-                "min_contribution": float(row["Min Contribution"])
-                if pd.notna(row["Min Contribution"])
-                else 0,
-                "min_rate": float(row["Min Rate"]) if pd.notna(row["Min Rate"]) else 0,
-                "base_rate": base_rate,
-                "bonus_rate": float(row["Bonus Rate"])
-                if pd.notna(row["Bonus Rate"])
-                else 0,
-                "yield_to_surrender": float(row["Yield to Surrender"])
-                if pd.notna(row["Yield to Surrender"])
-                else 0,
-                "surrender_period": int(row["Surrender Period"])
-                if pd.notna(row["Surrender Period"])
-                else None,
-                "future_value": future_value,
+    def fixed_quote_json(self, amount, state=None):
+        """
+        get_fixed_rates(amount, state) encoded as jsonify would, spliced from
+        fixed_json_templates(): per request only the future values are
+        computed and encoded. Returns (JSON array text, product count).
+        """
+        if self.fixed_data is None:
+            logger.error("Fixed annuity data not loaded")
+            return "[]", 0
+
+        templates = self.fixed_json_templates()
+        if state is not None:
+            templates = [templates[i] for i in self.fixed_positions(state)]
+        amount_json = _json_number(amount)
+        products = [
+            head + (amount_json if growth is None else _json_number(round(amount * growth, 2))) + tail
+            for head, tail, growth in templates
+        ]
+        logger.info(f"Returning {len(products)} fixed annuity products")
+        return "[" + ",".join(products) + "]", len(products)
+
+    def fixed_columns(self):
+        """
+        Fixed sheet in display order (Base Rate descending, as get_fixed_rates)
+        as a dict of NumPy columns. Built once per loaded sheet.
+        """
+        if self._fixed_columns is None:
+            ordered = self.fixed_data.sort_values("Base Rate", ascending=False)
+            columns = {"index": ordered.index.to_numpy()}
+            for column in (
+                "Sort",
+                "Years",
+                "Min Contribution",
+                "Min Rate",
+                "Base Rate",
+                "Bonus Rate",
+                "Yield to Surrender",
+                "Surrender Period",
+            ):
+                columns[column] = ordered[column].to_numpy(dtype=float, na_value=np.nan)
+            self._fixed_columns = columns
+        return self._fixed_columns
+
+    def fixed_state_bits(self):
+        """
+        Per-state availability of the fixed products as packed bitsets over
+        fixed_columns() order: {"all": every product, "open": products sold in
+        every state, "states": {code: products available in that state}}.
+        Built once per loaded sheet from its optional "States" column.
+        """
+        if self._fixed_state_bits is None:
+            n = len(self.fixed_data)
+            restrictions = self._fixed_restrictions()
+            open_products = np.array([states is None for states in restrictions], dtype=bool)
+            available = {}
+            for i, states in enumerate(restrictions):
+                if not states:
+                    continue
+                for code in states.split(","):
+                    if code not in available:
+                        available[code] = open_products.copy()
+                    available[code][i] = True
+
+            self._fixed_state_bits = {
+                "all": np.packbits(np.ones(n, dtype=bool)),
+                "open": np.packbits(open_products),
+                "states": {code: np.packbits(mask) for code, mask in available.items()},
             }
-            results.append(result)
+        return self._fixed_state_bits
 
-        logger.info(f"Returning {len(results)} fixed annuity products")
-        return results
+    def _fixed_restrictions(self):
+        """States entry of each fixed product in fixed_columns() order; None where sold everywhere."""
+        if "States" not in self.fixed_data.columns:
+            return [None] * len(self.fixed_data)
+        restrictions = self.fixed_data["States"].loc[self.fixed_columns()["index"]]
+        return [states if isinstance(states, str) else None for states in restrictions]
+
+    def fixed_mask(self, state=None):
+        """
+        Packed bitset of the fixed products to show, in fixed_columns() order.
+        Each filter is one AND over the packed bits, never a per-row check.
+        """
+        bits = self.fixed_state_bits()
+        mask = bits["all"]
+        if state is not None:
+            mask = mask & bits["states"].get(state, bits["open"])
+        return mask
+
+    def filters_by_state(self, state):
+        """True when fixed products for state are filtered by a STATE AVAILABILITY sheet."""
+        return (
+            state is not None
+            and self.fixed_data is not None
+            and "States" in self.fixed_data.columns
+        )
+
+    def fixed_positions(self, state=None):
+        """fixed_columns() positions of the products fixed_mask(state) keeps."""
+        return np.flatnonzero(
+            np.unpackbits(self.fixed_mask(state), count=len(self.fixed_data))
+        )
+
+    def get_fixed_schedules(self, amount, default_horizon=10, state=None):
+        """
+        Year-by-year accumulation of every fixed product through
+        max(Years, Surrender Period), computed as one products x years matrix.
+        - yield_values: Investment × (1 + Yield to Surrender/100)^year
+          (the Excel future value formula, evaluated every year)
+        - contract_values: Base Rate + Bonus Rate in year 1, Base Rate through
+          the rate term (Years), then Min Rate through the Surrender Period
+        Returns an iterator of one dict per product in get_fixed_rates order
+        (only those available in state, if given);
+        the matrix is computed before the first item is produced.
+        """
+        if self.fixed_data is None:
+            logger.error("Fixed annuity data not loaded")
+            return iter(())
+
+        columns = self.fixed_columns()
+        if state is not None:
+            positions = self.fixed_positions(state)
+            columns = {name: values[positions] for name, values in columns.items()}
+        rate_term = columns["Years"]
+        surrender_period = columns["Surrender Period"]
+        horizon = np.fmax(rate_term, surrender_period)
+        horizon = np.where(np.isnan(horizon), default_horizon, horizon).astype(int)
+        year = np.arange(1, horizon.max() + 1 if len(horizon) else 1)
+
+        def rate(column):
+            return np.nan_to_num(columns[column])[:, None] / 100.0
+
+        # Same convention as calculate_fixed_future_value: no yield, no growth
+        yield_rate = np.clip(rate("Yield to Surrender"), 0, None)
+        yield_values = amount * (1 + yield_rate) ** year
+
+        term = np.where(np.isnan(rate_term), horizon, rate_term)[:, None]
+        credited = np.where(year <= term, rate("Base Rate"), rate("Min Rate"))
+        if len(year):
+            credited[:, 0] += rate("Bonus Rate")[:, 0]
+        contract_values = amount * np.cumprod(1 + credited, axis=1)
+
+        logger.info(
+            f"Computed {len(horizon)} x {len(year)} fixed annuity schedule for ${amount:,.2f}"
+        )
+
+        # Product fields by position, looked up in one pass instead of per row
+        names = self.fixed_data.loc[columns["index"], ["Company", "Product"]]
+        sorts = _optional_ints(columns["Sort"])
+        companies = _optional_strs(names["Company"])
+        products = _optional_strs(names["Product"])
+        years = _optional_ints(rate_term)
+        surrender_periods = _optional_ints(surrender_period)
+
+        def schedules():
+            for i, n in enumerate(horizon.tolist()):
+                yield {
+                    "sort": sorts[i],
+                    "company": companies[i],
+                    "product": products[i],
+                    "years": years[i],
+                    "surrender_period": surrender_periods[i],
+                    "yield_values": [round(v, 2) for v in yield_values[i, :n].tolist()],
+                    "contract_values": [
+                        round(v, 2) for v in contract_values[i, :n].tolist()
+                    ],
+                }
+
+        return schedules()
 
     def get_variable_income(self, current_age, withdrawal_age, amount):
         """
@@ -164,49 +722,7 @@ class AnnuityCalculator:
         )
 
         # Return all variable annuity products with calculated values
-        results = []
-        for _, row in self.variable_data.iterrows():
-            # Get the deferral credit rate and withdrawal rate
-            deferral_credit_rate = (
-                float(row["Deferral Credit"]) if pd.notna(row["Deferral Credit"]) else 0
-            )
-            withdrawal_rate = (
-                float(row["Withdrawal Rate"]) if pd.notna(row["Withdrawal Rate"]) else 0
-            )
-
-            # Calculate Benefit Base using Excel formula: Investment + (Investment × Deferral Credit Rate × Deferral Period)
-            # This is SIMPLE INTEREST, not compound interest
-            # Formula from Excel: =+$C$4+($C$4*F12*$C$5)
-            if deferral_credit_rate > 0:
-                benefit_base = amount + (
-                    amount * deferral_credit_rate * deferral_period
-                )
-            else:
-                benefit_base = amount
-
-            # Calculate Annual Lifetime Income: Benefit Base × Withdrawal Rate
-            # Note: Withdrawal Rate is stored as decimal (e.g., 0.064 for 6.4%)
-            annual_lifetime_income = benefit_base * withdrawal_rate
-
-            result = {
-                "sort": int(row["Sort"]) if pd.notna(row["Sort"]) else None,
-                "annuity_type": str(row["Annuity Type"])
-                if pd.notna(row["Annuity Type"])
-                else "",
-                "carrier": str(row["Carrier"]) if pd.notna(row["Carrier"]) else "",
-                "rider_name": str(row["Rider Name"])
-                if pd.notna(row["Rider Name"])
-                else "",
-                "withdrawal_rate": withdrawal_rate
-                * 100,  # Convert to percentage for display
-                "benefit_base": round(benefit_base, 2),
-                "annual_lifetime_income": round(annual_lifetime_income, 2),
-                "monthly_income": round(annual_lifetime_income / 12, 2),
-            }
-            results.append(result)
-
-        # Sort by Sort column (ascending) to match Excel order
-        results.sort(key=lambda x: x["sort"] if x["sort"] is not None else float("inf"))
+        results = list(self.iter_variable_products(current_age, withdrawal_age, amount))
 
         logger.info(f"Returning {len(results)} variable annuity products")
         return {
@@ -217,3 +733,395 @@ class AnnuityCalculator:
             "products": results,
             "count": len(results),
         }
+
+    def immediate_table(self):
+        """
+        The ImmediateAnnuityTable of precomputed annuity factors, or None if
+        the mortality table could not be loaded. Calculators built with the
+        same assumptions share one table.
+        """
+        if self._immediate_table is None:
+            try:
+                self._immediate_table = load_immediate_table()
+            except Exception as e:
+                logger.error(f"Failed to load immediate annuity mortality table: {str(e)}")
+        return self._immediate_table
+
+    def get_immediate_income(self, premium, current_age, sex, payout_option="life"):
+        """
+        Guaranteed monthly income a single premium buys at current_age, for
+        every payout option, from the precomputed annuity factors.
+        """
+        table = self.immediate_table()
+        if table is None:
+            logger.error("Immediate annuity factors not loaded")
+            return None
+
+        logger.info(
+            f"Calculating immediate annuity for ${premium:,.2f}, age {current_age} {sex}"
+        )
+        return table.quote(premium, current_age, sex, payout_option)
+
+    def iter_variable_products(self, current_age, withdrawal_age, amount):
+        """
+        Yield the get_variable_income products one at a time, in Sort order
+        (products without a Sort number last).
+        Callers are expected to have checked that the deferral period is positive.
+        """
+        if self.variable_data is None:
+            return
+
+        deferral_period = withdrawal_age - current_age
+
+        ordered = self.variable_data.loc[self.variable_columns()["index"]]
+        for _, row in ordered.iterrows():
+            yield self._variable_product(row, deferral_period, amount)
+
+    def _variable_product(self, row, deferral_period, amount):
+        """One variable sheet row as the get_variable_income dict."""
+        # Get the deferral credit rate and withdrawal rate
+        deferral_credit_rate = (
+            float(row["Deferral Credit"]) if pd.notna(row["Deferral Credit"]) else 0
+        )
+        withdrawal_rate = (
+            float(row["Withdrawal Rate"]) if pd.notna(row["Withdrawal Rate"]) else 0
+        )
+
+        # Calculate Benefit Base using Excel formula: Investment + (Investment × Deferral Credit Rate × Deferral Period)
+        # This is SIMPLE INTEREST, not compound interest
+        # Formula from Excel: =+$C$4+($C$4*F12*$C$5)
+        if deferral_credit_rate > 0:
+            benefit_base = amount + (
+                amount * deferral_credit_rate * deferral_period
+            )
+        else:
+            benefit_base = amount
+
+        # Calculate Annual Lifetime Income: Benefit Base × Withdrawal Rate
+        # Note: Withdrawal Rate is stored as decimal (e.g., 0.064 for 6.4%)
+        annual_lifetime_income = benefit_base * withdrawal_rate
+
+        result = {
+            "sort": int(row["Sort"]) if pd.notna(row["Sort"]) else None,
+            "annuity_type": str(row["Annuity Type"])
+            if pd.notna(row["Annuity Type"])
+            else "",
+            "carrier": str(row["Carrier"]) if pd.notna(row["Carrier"]) else "",
+            "rider_name": str(row["Rider Name"])
+            if pd.notna(row["Rider Name"])
+            else "",
+            "withdrawal_rate": withdrawal_rate
+            * 100,  # Convert to percentage for display
+            "benefit_base": round(benefit_base, 2),
+            "annual_lifetime_income": round(annual_lifetime_income, 2),
+            "monthly_income": round(annual_lifetime_income / 12, 2),
+        }
+        return result
+
+    def variable_columns(self):
+        """
+        Variable sheet in display order (Sort ascending, stable, products
+        without a Sort number last, as get_variable_income) as a dict of
+        NumPy columns. Built once per loaded sheet.
+        """
+        if self._variable_columns is None:
+            ordered = self.variable_data.sort_values("Sort", kind="stable", na_position="last")
+            columns = {"index": ordered.index.to_numpy()}
+            for column in ("Sort", "Deferral Credit", "Withdrawal Rate"):
+                columns[column] = ordered[column].to_numpy(dtype=float, na_value=np.nan)
+            self._variable_columns = columns
+        return self._variable_columns
+
+    def goal_seek(self, goal_request):
+        """
+        Solve every product for the investment that reaches the goal, in one pass.
+        Returns the /api/goal-seek response payload.
+        """
+        if goal_request.product_line == "fixed":
+            results = self.solve_fixed_amounts(goal_request.target, goal_request.state)
+            return {
+                "type": "fixed",
+                "target_future_value": goal_request.target,
+                "results": results,
+                "count": len(results),
+            }
+
+        results = self.solve_variable_amounts(
+            goal_request.current_age, goal_request.withdrawal_age, goal_request.target
+        )
+        return {
+            "type": "variable",
+            "target_monthly_income": goal_request.target,
+            "current_age": goal_request.current_age,
+            "withdrawal_age": goal_request.withdrawal_age,
+            "deferral_period": goal_request.withdrawal_age - goal_request.current_age,
+            "results": results,
+            "count": len(results),
+        }
+
+    def solve_fixed_amounts(self, target_future_value, state=None):
+        """
+        Investment each fixed product (available in state, if given) needs for
+        calculate_fixed_future_value to reach target_future_value. Future value
+        is linear in the amount (Amount × (1 + Yield to Surrender/100)^10), so
+        each product is one division. Ranked by required amount, ties in Sort order.
+        """
+        if self.fixed_data is None:
+            logger.error("Fixed annuity data not loaded")
+            return []
+
+        columns = self.fixed_columns()
+        positions = self.fixed_positions(state)
+        yield_to_surrender = np.nan_to_num(columns["Yield to Surrender"][positions])
+        growth = np.where(
+            yield_to_surrender > 0, (1 + yield_to_surrender / 100.0) ** 10, 1.0
+        )
+
+        def future_value(amount, i):
+            # Python floats: round() on a numpy float64 rounds differently
+            return self.calculate_fixed_future_value(amount, float(yield_to_surrender[i]))
+
+        required, minimum_applied = _required_amounts(
+            target_future_value / growth, target_future_value, future_value
+        )
+        order = np.lexsort((_sort_key(columns["Sort"][positions]), required))
+
+        results = []
+        for i in order:
+            row = self.fixed_data.loc[columns["index"][positions[i]]]
+            amount = float(required[i])
+            results.append(
+                {
+                    "sort": int(row["Sort"]) if pd.notna(row["Sort"]) else None,
+                    "company": str(row["Company"]) if pd.notna(row["Company"]) else "",
+                    "product": str(row["Product"]) if pd.notna(row["Product"]) else "",
+                    "years": int(row["Years"]) if pd.notna(row["Years"]) else None,
+                    "yield_to_surrender": float(yield_to_surrender[i]),
+                    "surrender_period": int(row["Surrender Period"])
+                    if pd.notna(row["Surrender Period"])
+                    else None,
+                    "required_amount": amount,
+                    "minimum_applied": bool(minimum_applied[i]),
+                    "future_value": future_value(amount, i),
+                }
+            )
+
+        logger.info(
+            f"Solved {len(results)} fixed products for a ${target_future_value:,.2f} future value"
+        )
+        return results
+
+    def solve_variable_amounts(self, current_age, withdrawal_age, target_monthly_income):
+        """
+        Investment each variable product needs for its monthly_income to reach
+        target_monthly_income. Income is linear in the amount
+        (Amount × (1 + Deferral Credit × Deferral Period) × Withdrawal Rate / 12),
+        so each product is one division. Products without a withdrawal rate, or
+        that would need more than MAX_REQUIRED_AMOUNT, never reach the target
+        and come last with required_amount None.
+        Ranked by required amount, ties in Sort order.
+        """
+        if self.variable_data is None:
+            logger.error("Variable annuity data not loaded")
+            return []
+
+        deferral_period = withdrawal_age - current_age
+        columns = self.variable_columns()
+        deferral_credit = np.nan_to_num(columns["Deferral Credit"])
+        withdrawal_rate = np.nan_to_num(columns["Withdrawal Rate"])
+        income_per_dollar = (
+            np.where(deferral_credit > 0, 1 + deferral_credit * deferral_period, 1.0)
+            * withdrawal_rate
+            / 12
+        )
+        reachable = income_per_dollar > 0
+
+        def monthly_income(amount, i):
+            # Same operation order and Python float rounding as iter_variable_products
+            credit = float(deferral_credit[i])
+            if credit > 0:
+                benefit_base = amount + (amount * credit * deferral_period)
+            else:
+                benefit_base = amount
+            return round(benefit_base * float(withdrawal_rate[i]) / 12, 2)
+
+        with np.errstate(divide="ignore"):
+            exact = np.where(
+                reachable, target_monthly_income / np.where(reachable, income_per_dollar, 1), np.inf
+            )
+        required, minimum_applied = _required_amounts(
+            exact, target_monthly_income, monthly_income
+        )
+        reachable &= np.isfinite(required)
+        order = np.lexsort((_sort_key(columns["Sort"]), required))
+
+        results = []
+        for i in order:
+            row = self.variable_data.loc[columns["index"][i]]
+            amount = float(required[i]) if reachable[i] else None
+            results.append(
+                {
+                    "sort": int(row["Sort"]) if pd.notna(row["Sort"]) else None,
+                    "annuity_type": str(row["Annuity Type"])
+                    if pd.notna(row["Annuity Type"])
+                    else "",
+                    "carrier": str(row["Carrier"]) if pd.notna(row["Carrier"]) else "",
+                    "rider_name": str(row["Rider Name"])
+                    if pd.notna(row["Rider Name"])
+                    else "",
+                    "withdrawal_rate": float(withdrawal_rate[i]) * 100,
+                    "required_amount": amount,
+                    "minimum_applied": bool(minimum_applied[i]) if reachable[i] else False,
+                    "monthly_income": monthly_income(amount, i) if reachable[i] else None,
+                }
+            )
+
+        logger.info(
+            f"Solved {len(results)} variable products for ${target_monthly_income:,.2f}/month, "
+            f"{deferral_period} year deferral period"
+        )
+        return results
+
+    def rank_scores(self, quote_request, objective):
+        """
+        Score every product for an objective, higher is better, as an array in
+        fixed_columns() / variable_columns() order. Scores are proportional to
+        the quoted value, so the amount itself does not change the ranking.
+        """
+        if quote_request.product_line == "fixed":
+            columns = self.fixed_columns()
+            if objective == "future_value":
+                yield_to_surrender = np.nan_to_num(columns["Yield to Surrender"])
+                return np.where(
+                    yield_to_surrender > 0, (1 + yield_to_surrender / 100.0) ** 10, 1.0
+                )
+            return np.nan_to_num(columns[FIXED_OBJECTIVES[objective]])
+
+        columns = self.variable_columns()
+        withdrawal_rate = np.nan_to_num(columns["Withdrawal Rate"])
+        if objective == "withdrawal_rate":
+            return withdrawal_rate
+        deferral_period = quote_request.withdrawal_age - quote_request.current_age
+        deferral_credit = np.nan_to_num(columns["Deferral Credit"])
+        return (
+            np.where(deferral_credit > 0, 1 + deferral_credit * deferral_period, 1.0)
+            * withdrawal_rate
+        )
+
+    def top_products(self, quote_request, objective=None, k=DEFAULT_TOP_K):
+        """
+        The k best products for an objective, best first, ties in Sort order,
+        as the same dicts get_fixed_rates / get_variable_income return.
+        Uses partial selection (np.partition) so only the candidates at or
+        above the k-th score are sorted, not every row.
+        """
+        line = quote_request.product_line
+        objective = objective or DEFAULT_OBJECTIVES[line]
+        data = self.fixed_data if line == "fixed" else self.variable_data
+        if data is None:
+            logger.error(f"{line.title()} annuity data not loaded")
+            return []
+
+        columns = self.fixed_columns() if line == "fixed" else self.variable_columns()
+        scores = self.rank_scores(quote_request, objective)
+        if line == "fixed" and quote_request.state is not None:
+            pool = self.fixed_positions(quote_request.state)
+        else:
+            pool = np.arange(len(scores))
+        pool_scores = scores[pool]
+        n = len(pool)
+        k = min(k, n)
+        if k <= 0:
+            return []
+
+        if k < n:
+            # Keep every product tied with the k-th best so Sort can break the tie
+            kth_best = np.partition(pool_scores, n - k)[n - k]
+            candidates = pool[pool_scores >= kth_best]
+        else:
+            candidates = pool
+        order = candidates[
+            np.lexsort((_sort_key(columns["Sort"][candidates]), -scores[candidates]))
+        ][:k]
+
+        if line == "fixed":
+            return [
+                self._fixed_product(data.loc[columns["index"][i]], quote_request.amount)
+                for i in order
+            ]
+        deferral_period = quote_request.withdrawal_age - quote_request.current_age
+        return [
+            self._variable_product(
+                data.loc[columns["index"][i]], deferral_period, quote_request.amount
+            )
+            for i in order
+        ]
+
+    def search_index(self, product_line):
+        """
+        (ProductSearchIndex, row records) for a product line, both in
+        fixed_columns() / variable_columns() order. Built once per loaded sheet;
+        the records are plain dicts so quoting a match skips pandas row lookups.
+        """
+        if product_line not in self._search_indexes:
+            if product_line == "fixed":
+                columns = self.fixed_columns()
+                data = self.fixed_data
+            else:
+                columns = self.variable_columns()
+                data = self.variable_data
+            ordered = data.loc[columns["index"]]
+            index = ProductSearchIndex(self._search_names(product_line, ordered), columns["Sort"])
+            self._search_indexes[product_line] = (index, ordered.to_dict("records"))
+        return self._search_indexes[product_line]
+
+    @staticmethod
+    def _search_names(product_line, ordered):
+        return [
+            ["" if pd.isna(value) else value for value in names]
+            for names in zip(*(ordered[field] for field in SEARCH_FIELDS[product_line]))
+        ]
+
+    def search_products(self, quote_request, query, limit=DEFAULT_SEARCH_LIMIT):
+        """
+        Products whose names match a normalized typeahead query, best match
+        first, quoted for the request as the same dicts get_fixed_rates /
+        get_variable_income return. Fixed matches honour the request's state.
+        """
+        line = quote_request.product_line
+        data = self.fixed_data if line == "fixed" else self.variable_data
+        if data is None:
+            logger.error(f"{line.title()} annuity data not loaded")
+            return []
+
+        index, records = self.search_index(line)
+        allowed = None
+        if line == "fixed" and quote_request.state is not None:
+            allowed = self.fixed_positions(quote_request.state)
+        positions = index.search(query, limit, allowed)
+
+        if line == "fixed":
+            return [self._fixed_product(records[i], quote_request.amount) for i in positions]
+        deferral_period = quote_request.withdrawal_age - quote_request.current_age
+        return [
+            self._variable_product(records[i], deferral_period, quote_request.amount)
+            for i in positions
+        ]
+
+    def simulate_variable_income(self, current_age, withdrawal_age, amount, **options):
+        """
+        Monte Carlo projection of account value against guaranteed lifetime income.
+        Options (paths, seed, mean_return, volatility, time_budget) are passed to
+        simulation.run_simulation; raises SimulationTimeout past the time budget.
+        """
+        if self.variable_data is None:
+            logger.error("Variable annuity data not loaded")
+            return []
+
+        return run_simulation(
+            self.variable_data,
+            amount=amount,
+            current_age=current_age,
+            withdrawal_age=withdrawal_age,
+            **options,
+        )
@@ -0,0 +1,216 @@
+import os
+import sys
+import time
+import logging
+import resource
+import threading
+import tracemalloc
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# tracemalloc snapshots kept per worker for diffs; older ones are dropped
+TRACEMALLOC_KEEP = int(os.environ.get("TRACEMALLOC_KEEP", 5))
+# RSS samples kept from hot reloads, to spot growth from one snapshot to the next
+RELOAD_HISTORY = int(os.environ.get("RELOAD_HISTORY", 20))
+
+
+def process_memory():
+    """
+    Resident set size of this process now and at its peak, in bytes.
+    Read from /proc on Linux; elsewhere only the peak is known.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+        return {
+            "pid": os.getpid(),
+            "rss_bytes": int(fields["VmRSS"].split()[0]) * 1024,
+            "peak_rss_bytes": int(fields["VmHWM"].split()[0]) * 1024,
+        }
+    except (OSError, KeyError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        peak = peak if sys.platform == "darwin" else peak * 1024
+        return {"pid": os.getpid(), "rss_bytes": None, "peak_rss_bytes": peak}
+
+
+def deep_sizeof(obj, seen=None):
+    """
+    Approximate bytes held by obj and everything it references: DataFrames
+    by memory_usage(deep=True), arrays by their buffers, containers and plain
+    objects recursively. Objects reached twice are counted once.
+    """
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(deep=True, index=True).sum())
+    if isinstance(obj, (pd.Series, pd.Index)):
+        return int(obj.memory_usage(deep=True))
+    if isinstance(obj, np.ndarray):
+        # getsizeof includes the buffer for arrays that own it, only the header for views
+        size = sys.getsizeof(obj)
+        if obj.dtype == object:
+            size += sum(deep_sizeof(item, seen) for item in obj.ravel())
+        return size
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    elif hasattr(obj, "__dict__") and not isinstance(obj, type):
+        size += deep_sizeof(vars(obj), seen)
+    return size
+
+
+# Calculator attributes reported, in the order they are built
+_CALCULATOR_PARTS = (
+    ("fixed_data", "fixed_data"),
+    ("variable_data", "variable_data"),
+    ("fixed_columns", "_fixed_columns"),
+    ("fixed_state_bits", "_fixed_state_bits"),
+    ("fixed_templates", "_fixed_templates"),
+    ("variable_columns", "_variable_columns"),
+    ("search_indexes", "_search_indexes"),
+    ("immediate_table", "_immediate_table"),
+)
+
+
+def calculator_breakdown(calculator):
+    """Bytes held by each sheet and cache of an AnnuityCalculator; None for caches not built."""
+    seen = set()
+    parts = {}
+    for name, attribute in _CALCULATOR_PARTS:
+        value = getattr(calculator, attribute, None)
+        parts[name] = None if value is None else deep_sizeof(value, seen)
+    return {
+        "snapshot_version": calculator.snapshot_version,
+        "total_bytes": sum(size for size in parts.values() if size),
+        "parts": parts,
+    }
+
+
+def quote_sizes(calculator, requests):
+    """Bytes of the payload calculator.quote() builds for each (name, QuoteRequest)."""
+    return {name: deep_sizeof(calculator.quote(request)) for name, request in requests}
+
+
+def history_breakdown(history):
+    """Row pool and cached calculator sizes of a RateHistory."""
+    calculators = list(history._calculators.items())
+    live = history.live.snapshot_version if history.live else None
+    return {
+        "versions": len(history.versions),
+        "pool_rows": len(history.pool),
+        "pool_bytes": deep_sizeof(history.pool.rows),
+        "cached_calculators": [
+            {
+                "snapshot_version": key,
+                "live": key == live,
+                "total_bytes": calculator_breakdown(calculator)["total_bytes"],
+            }
+            for key, calculator in calculators
+        ],
+    }
+
+
+class ReloadLog:
+    """RSS right after each hot reload, newest last, so growth across reloads shows."""
+
+    def __init__(self, keep=RELOAD_HISTORY):
+        self.keep = keep
+        self.entries = []
+        self._lock = threading.Lock()
+
+    def record(self, snapshot_version):
+        entry = dict(
+            process_memory(),
+            snapshot_version=snapshot_version,
+            at=time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        )
+        with self._lock:
+            self.entries = (self.entries + [entry])[-self.keep:]
+        logger.info(f"RSS after loading {snapshot_version}: {entry['rss_bytes'] or 0:,} bytes")
+        return entry
+
+
+class AllocationTracer:
+    """
+    On-demand tracemalloc for one worker: start and stop tracing, take
+    labelled snapshots, and list the top allocation sites of one snapshot
+    or the growth between two. Tracing slows allocation down, so it is off
+    until started.
+    """
+
+    def __init__(self, keep=TRACEMALLOC_KEEP):
+        self.keep = keep
+        self.snapshots = OrderedDict()
+        self._lock = threading.Lock()
+
+    def status(self):
+        traced, peak = tracemalloc.get_traced_memory()
+        return {
+            "tracing": tracemalloc.is_tracing(),
+            "traced_bytes": traced,
+            "traced_peak_bytes": peak,
+            "snapshots": list(self.snapshots),
+        }
+
+    def start(self, frames=1):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+            logger.info(f"tracemalloc started with {frames} frames")
+        return self.status()
+
+    def stop(self):
+        with self._lock:
+            if tracemalloc.is_tracing():
+                tracemalloc.stop()
+                logger.info("tracemalloc stopped")
+            self.snapshots.clear()
+        return self.status()
+
+    def take(self, label=None):
+        """Snapshot current allocations under label; raises ValueError if not tracing."""
+        if not tracemalloc.is_tracing():
+            raise ValueError("tracemalloc is not running; start it first")
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            (tracemalloc.Filter(False, tracemalloc.__file__),)
+        )
+        with self._lock:
+            label = label or f"s{len(self.snapshots) + 1}-{int(time.time())}"
+            self.snapshots.pop(label, None)
+            self.snapshots[label] = snapshot
+            while len(self.snapshots) > self.keep:
+                self.snapshots.popitem(last=False)
+        return label
+
+    def top(self, label, limit=20, group_by="lineno"):
+        """Largest allocation sites in a snapshot; KeyError for an unknown label."""
+        stats = self.snapshots[label].statistics(group_by)
+        return [_stat(stat) for stat in stats[:limit]]
+
+    def diff(self, before, after, limit=20, group_by="lineno"):
+        """Allocation sites that grew most from snapshot before to snapshot after."""
+        stats = self.snapshots[after].compare_to(self.snapshots[before], group_by)
+        return [
+            dict(_stat(stat), size_diff_bytes=stat.size_diff, count_diff=stat.count_diff)
+            for stat in stats[:limit]
+        ]
+
+
+def _stat(stat):
+    frame = stat.traceback[0]
+    return {
+        "location": f"{frame.filename}:{frame.lineno}",
+        "size_bytes": stat.size,
+        "count": stat.count,
+    }
@@ -0,0 +1,241 @@
+from datetime import date
+from typing import NamedTuple, Optional
+
+MIN_AMOUNT = 50000
+MAX_GOAL_TARGET = 1e10
+REQUIRED_FIELDS = ("amount", "annuity_type")
+
+FIXED_ANNUITY_TYPES = ("fixed", "fixed indexed")
+VARIABLE_ANNUITY_TYPES = ("variable",)
+IMMEDIATE_ANNUITY_TYPES = ("immediate",)
+
+# Immediate annuities: issue ages quoted, and the choices priced for each
+IMMEDIATE_MIN_AGE = 40
+IMMEDIATE_MAX_AGE = 90
+SEXES = ("male", "female")
+PAYOUT_OPTIONS = ("life", "life_10", "life_20", "period_10", "period_20")
+
+_REQUIRED_MESSAGES = tuple(
+    (field, f"{field.replace('_', ' ').title()} is required")
+    for field in REQUIRED_FIELDS
+)
+
+# float()/int() failures for anything json.loads or a query string can produce
+_PARSE_ERRORS = (TypeError, ValueError, OverflowError)
+
+
+class QuoteRequest(NamedTuple):
+    """
+    A validated, immutable quote request.
+    Built once per request by parse_quote_request() and handed straight to
+    AnnuityCalculator.quote(), so nothing downstream re-parses the raw body.
+    """
+
+    annuity_type: str
+    amount: float
+    current_age: Optional[int] = None
+    withdrawal_age: Optional[int] = None
+    state: Optional[str] = None
+    as_of: Optional[date] = None
+    sex: Optional[str] = None
+    payout_option: Optional[str] = None
+
+    @property
+    def product_line(self):
+        """Which engine serves this request: "fixed", "variable", "immediate" or None."""
+        return _product_line(self.annuity_type)
+
+    def to_json(self):
+        """The request fields as a JSON-ready dict (as_of as YYYY-MM-DD)."""
+        fields = self._asdict()
+        if self.as_of is not None:
+            fields["as_of"] = self.as_of.isoformat()
+        return fields
+
+
+def _product_line(annuity_type):
+    if annuity_type in FIXED_ANNUITY_TYPES:
+        return "fixed"
+    if annuity_type in VARIABLE_ANNUITY_TYPES:
+        return "variable"
+    if annuity_type in IMMEDIATE_ANNUITY_TYPES:
+        return "immediate"
+    return None
+
+
+_new_request = tuple.__new__
+
+
+def _parse_int(value):
+    if value.__class__ is int:
+        return value
+    try:
+        return int(value)
+    except _PARSE_ERRORS:
+        return None
+
+
+def parse_quote_request(data):
+    """
+    Parse and validate a quote request body in a single pass.
+    Accepts any mapping with .get() (a JSON body, request.args, a CSV row).
+    Returns (QuoteRequest, None) on success or (None, errors) on failure,
+    with the same error messages AnnuityCalculator.validate_input has always returned.
+    """
+    errors = []
+
+    for field, message in _REQUIRED_MESSAGES:
+        if not data.get(field):
+            errors.append(message)
+
+    try:
+        amount = float(data.get("amount", 0))
+        if amount < MIN_AMOUNT:
+            errors.append("Amount must be at least $50,000")
+    except _PARSE_ERRORS:
+        amount = None
+        errors.append("Amount must be a valid number")
+
+    annuity_type = data.get("annuity_type", "").lower()
+
+    current_age = None
+    withdrawal_age = None
+    if annuity_type == "variable":
+        current_age = _parse_int(data.get("current_age", 0))
+        if current_age is None:
+            errors.append("Current Age is required for Variable annuities")
+        elif current_age < 18 or current_age > 100:
+            errors.append("Current Age must be between 18 and 100")
+
+        withdrawal_age = _parse_int(data.get("withdrawal_age", 0))
+        if withdrawal_age is None:
+            errors.append("Age of First Withdrawal is required for Variable annuities")
+        else:
+            if withdrawal_age < 59:
+                errors.append("Age of First Withdrawal must be at least 59")
+            if withdrawal_age > 100:
+                errors.append("Age of First Withdrawal must be 100 or less")
+
+        if (
+            current_age is not None
+            and withdrawal_age is not None
+            and withdrawal_age <= current_age
+        ):
+            errors.append("Age of First Withdrawal must be greater than Current Age")
+    elif annuity_type in FIXED_ANNUITY_TYPES:
+        # Optional for fixed quotes and never an error, as before; kept only
+        # so exports can show it, and dropped when out of range
+        current_age = _parse_int(data.get("current_age"))
+        if current_age is not None and not 18 <= current_age <= 100:
+            current_age = None
+
+    sex = None
+    payout_option = None
+    if annuity_type in IMMEDIATE_ANNUITY_TYPES:
+        current_age = _parse_int(data.get("current_age", 0))
+        if current_age is None:
+            errors.append("Current Age is required for Immediate annuities")
+        elif current_age < IMMEDIATE_MIN_AGE or current_age > IMMEDIATE_MAX_AGE:
+            errors.append(
+                f"Current Age must be between {IMMEDIATE_MIN_AGE} and {IMMEDIATE_MAX_AGE} "
+                "for Immediate annuities"
+            )
+
+        sex = str(data.get("sex") or "").strip().lower() or None
+        if sex is None:
+            errors.append("Sex is required for Immediate annuities")
+        elif sex not in SEXES:
+            errors.append("Sex must be male or female")
+
+        payout_option = str(data.get("payout_option") or "life").strip().lower()
+        if payout_option not in PAYOUT_OPTIONS:
+            errors.append(f"Payout Option must be one of: {', '.join(PAYOUT_OPTIONS)}")
+
+    state = data.get("state") or None
+    if state is not None:
+        state = str(state).strip().upper()
+        if len(state) != 2 or not state.isalpha():
+            errors.append("State must be a two-letter state code")
+
+    as_of = data.get("as_of") or None
+    if as_of is not None:
+        try:
+            as_of = date.fromisoformat(str(as_of))
+        except ValueError:
+            errors.append("As Of must be a date in YYYY-MM-DD format")
+
+    if errors:
+        return None, errors
+
+    # tuple.__new__ skips the generated Python-level QuoteRequest.__new__;
+    # every field has already been checked above
+    return _new_request(
+        QuoteRequest,
+        (annuity_type, amount, current_age, withdrawal_age, state, as_of, sex, payout_option),
+    ), None
+
+
+class GoalSeekRequest(NamedTuple):
+    """
+    A validated "how much do I need to invest" request. target is a monthly
+    income for variable annuities and a 10-year future value for fixed ones.
+    """
+
+    annuity_type: str
+    target: float
+    current_age: Optional[int] = None
+    withdrawal_age: Optional[int] = None
+    state: Optional[str] = None
+    as_of: Optional[date] = None
+
+    @property
+    def product_line(self):
+        return _product_line(self.annuity_type)
+
+    @property
+    def target_field(self):
+        return _GOAL_TARGET_FIELDS[self.product_line == "variable"]
+
+
+_GOAL_TARGET_FIELDS = ("target_future_value", "target_monthly_income")
+
+
+def parse_goal_seek_request(data):
+    """
+    Parse a goal seek body: annuity_type, target_monthly_income (variable) or
+    target_future_value (fixed), for variable annuities the two ages, and an
+    optional state and as_of. Everything but the target is validated exactly
+    as for a quote; the target replaces the amount.
+    Returns (GoalSeekRequest, None) or (None, errors).
+    """
+    quote_request, errors = parse_quote_request(dict(data, amount=MIN_AMOUNT))
+    errors = list(errors or [])
+
+    annuity_type = data.get("annuity_type", "").lower()
+    if _product_line(annuity_type) == "immediate":
+        return None, ["Goal seek is not available for Immediate annuities"]
+    field = _GOAL_TARGET_FIELDS[_product_line(annuity_type) == "variable"]
+    label = field.replace("_", " ").title()
+
+    target = None
+    if data.get(field) in (None, ""):
+        errors.append(f"{label} is required")
+    else:
+        try:
+            target = float(data[field])
+            if not 0 < target <= MAX_GOAL_TARGET:
+                errors.append(f"{label} must be greater than $0 and at most ${MAX_GOAL_TARGET:,.0f}")
+        except _PARSE_ERRORS:
+            errors.append(f"{label} must be a valid number")
+
+    if errors:
+        return None, errors
+
+    return GoalSeekRequest(
+        annuity_type,
+        target,
+        quote_request.current_age,
+        quote_request.withdrawal_age,
+        quote_request.state,
+        quote_request.as_of,
+    ), None
@@ -0,0 +1,195 @@
+import os
+import json
+import time
+import queue
+import atexit
+import sqlite3
+import secrets
+import logging
+import threading
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+QUOTE_STORE_PATH = os.environ.get(
+    "QUOTE_STORE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "quotes.db"),
+)
+# Quotes written per transaction, and the longest a quote waits for a batch to fill
+QUOTE_BATCH_SIZE = int(os.environ.get("QUOTE_BATCH_SIZE", 200))
+QUOTE_FLUSH_INTERVAL = float(os.environ.get("QUOTE_FLUSH_INTERVAL", 0.5))
+# Beyond this many unwritten quotes new ones are dropped rather than slowing requests
+QUOTE_QUEUE_SIZE = int(os.environ.get("QUOTE_QUEUE_SIZE", 10000))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS quotes (
+    id TEXT PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    snapshot_version TEXT,
+    request TEXT NOT NULL,
+    result TEXT NOT NULL
+)
+"""
+
+_INSERT = (
+    "INSERT OR REPLACE INTO quotes (id, created_at, kind, snapshot_version, request, result) "
+    "VALUES (?, ?, ?, ?, ?, ?)"
+)
+
+
+def _connect(path):
+    connection = sqlite3.connect(path, timeout=30)
+    # WAL lets "view your quote" reads proceed while the writer commits
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.execute(_SCHEMA)
+    return connection
+
+
+class QuoteStore:
+    """
+    Quotes persisted in SQLite by one background writer thread per process.
+    record() only queues the quote and returns its id, so responses never wait
+    on disk; the writer commits queued quotes in batches of up to
+    QUOTE_BATCH_SIZE. Quotes not yet written are served from memory by get().
+    """
+
+    def __init__(self, path=QUOTE_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._pid = None
+        self._local = threading.local()
+
+    def _start(self):
+        # Started lazily and per process: a gunicorn --preload fork gets its
+        # own queue, writer thread and connections instead of the master's
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(maxsize=QUOTE_QUEUE_SIZE)
+            self._pending = {}
+            self._dropping = False
+            self._local = threading.local()
+            self._writer = threading.Thread(
+                target=self._write_batches, name="quote-store-writer", daemon=True
+            )
+            self._pid = os.getpid()
+            self._writer.start()
+            atexit.register(self.flush)
+
+    def record(self, kind, request, result, snapshot_version, encoded=False):
+        """
+        Queue a quote for writing and return its id, or None if the queue is
+        full. request and result must be JSON-serializable; they are encoded
+        on the writer thread. With encoded=True, result is already JSON text
+        and is stored as it is.
+        """
+        self._start()
+        quote_id = secrets.token_urlsafe(12)
+        quote = (
+            quote_id,
+            datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            kind,
+            snapshot_version,
+            request,
+            result,
+            encoded,
+        )
+        with self._lock:
+            self._pending[quote_id] = quote
+        try:
+            self._queue.put_nowait(quote)
+        except queue.Full:
+            with self._lock:
+                del self._pending[quote_id]
+            # Warn once per overload rather than once per dropped quote
+            if not self._dropping:
+                self._dropping = True
+                logger.warning(
+                    f"Quote store queue full ({QUOTE_QUEUE_SIZE} waiting), dropping quotes"
+                )
+            return None
+        self._dropping = False
+        return quote_id
+
+    def get(self, quote_id):
+        """A stored quote as a dict, or None if there is no quote with this id."""
+        self._start()
+        with self._lock:
+            quote = self._pending.get(quote_id)
+        if quote is None:
+            connection = getattr(self._local, "connection", None)
+            if connection is None:
+                connection = self._local.connection = _connect(self.path)
+            row = connection.execute(
+                "SELECT id, created_at, kind, snapshot_version, request, result "
+                "FROM quotes WHERE id = ?",
+                (quote_id,),
+            ).fetchone()
+            if row is None:
+                return None
+            quote = row[:4] + (json.loads(row[4]), json.loads(row[5]))
+        elif quote[6]:
+            quote = quote[:5] + (json.loads(quote[5]),)
+
+        return dict(
+            zip(("quote_id", "created_at", "kind", "snapshot_version", "request", "result"), quote)
+        )
+
+    def pending_count(self):
+        """Quotes queued by this process and not yet written."""
+        if self._pid != os.getpid():
+            return 0
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self, timeout=5.0):
+        """Wait up to timeout seconds for every queued quote to be written. Returns True if all were."""
+        if self._pid != os.getpid():
+            return True
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def _write_batches(self):
+        connection = _connect(self.path)
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + QUOTE_FLUSH_INTERVAL
+            # A flush() marker ends the batch early
+            while len(batch) < QUOTE_BATCH_SIZE and isinstance(batch[-1], tuple):
+                try:
+                    batch.append(
+                        self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                    )
+                except queue.Empty:
+                    break
+
+            quotes = [item for item in batch if isinstance(item, tuple)]
+            if quotes:
+                try:
+                    rows = [
+                        quote[:4]
+                        + (
+                            json.dumps(quote[4], default=str),
+                            quote[5] if quote[6] else json.dumps(quote[5]),
+                        )
+                        for quote in quotes
+                    ]
+                    with connection:
+                        connection.executemany(_INSERT, rows)
+                except Exception as e:
+                    logger.error(f"Failed to write {len(quotes)} quotes: {str(e)}")
+                with self._lock:
+                    for quote in quotes:
+                        self._pending.pop(quote[0], None)
+
+            for item in batch:
+                if isinstance(item, threading.Event):
+                    item.set()
+            # Release the written batch now rather than when the next quote arrives
+            batch = quotes = rows = None
@@ -0,0 +1,88 @@
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Columns that name one product across loads of its sheet; every other column is a rate
+PRODUCT_IDENTITY = {
+    "fixed": ("Company", "Product", "Sort"),
+    "variable": ("Carrier", "Rider Name"),
+}
+
+
+def product_keys(frame, product_line):
+    """
+    Identity of each row of a rate sheet, in row order. Rows sharing an
+    identity are told apart by how many came before them, so every key is unique.
+    """
+    identity = frame[list(PRODUCT_IDENTITY[product_line])]
+    seen = {}
+    keys = []
+    for row in identity.itertuples(index=False, name=None):
+        row = tuple(None if pd.isna(value) else value for value in row)
+        occurrence = seen[row] = seen.get(row, -1) + 1
+        keys.append(row + (occurrence,))
+    return keys
+
+
+def _row_values(frame):
+    # NaN never equals itself, so missing cells compare as None
+    return [
+        tuple(None if isinstance(value, float) and value != value else value for value in row)
+        for row in frame.itertuples(index=False, name=None)
+    ]
+
+
+class SheetChanges:
+    """
+    What changed in one rate sheet between two loads, by product identity.
+    old_rows[i] is the row of the old sheet holding new row i's product, or
+    -1 if the product is new; dirty[i] is True for new and changed products.
+    """
+
+    def __init__(self, product_line, old_rows, dirty, removed):
+        self.product_line = product_line
+        self.old_rows = old_rows
+        self.dirty = dirty
+        self.removed = removed
+
+    @property
+    def added(self):
+        return int((self.old_rows < 0).sum())
+
+    @property
+    def changed(self):
+        return int((self.dirty & (self.old_rows >= 0)).sum())
+
+    @property
+    def reordered(self):
+        return not np.array_equal(self.old_rows, np.arange(len(self.old_rows)))
+
+    def __bool__(self):
+        return bool(self.dirty.any() or self.removed or self.reordered)
+
+    def summary(self):
+        return {"added": self.added, "changed": self.changed, "removed": self.removed}
+
+
+def diff_sheet(product_line, old, new):
+    """
+    SheetChanges from the old sheet to the new one. A change of columns
+    marks every product changed, since no cached row can be trusted then.
+    """
+    old_keys = {key: row for row, key in enumerate(product_keys(old, product_line))}
+    new_keys = product_keys(new, product_line)
+    old_rows = np.array([old_keys.get(key, -1) for key in new_keys], dtype=np.intp)
+
+    if tuple(old.columns) != tuple(new.columns) or not old.dtypes.equals(new.dtypes):
+        dirty = np.ones(len(new), dtype=bool)
+    else:
+        old_values, new_values = _row_values(old), _row_values(new)
+        dirty = np.array(
+            [row < 0 or old_values[row] != values for row, values in zip(old_rows, new_values)],
+            dtype=bool,
+        )
+    removed = len(old_keys) - int((old_rows >= 0).sum())
+    return SheetChanges(product_line, old_rows, dirty, removed)
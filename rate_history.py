@@ -0,0 +1,247 @@
+import os
+import re
+import shutil
+import logging
+import argparse
+import threading
+from bisect import bisect_right
+from collections import OrderedDict
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+from data_processor import clean_fixed_annuity_data, load_variable_annuity_data
+from logic import AnnuityCalculator, compute_snapshot_version
+
+logger = logging.getLogger(__name__)
+
+FIXED_WORKBOOK = "Fixed Annuity Rates.xlsx"
+VARIABLE_WORKBOOK = "Variable Annuity Rates.xlsx"
+
+# Dated archives are directories named "YYYY-MM-DD..." or "YYYYMMDD..."
+# holding both rate workbooks, e.g. "20260210 feedback/"
+_DATED_DIRECTORY = re.compile(r"^(\d{4})-?(\d{2})-?(\d{2})")
+
+# Historical calculators kept built at once; each is rebuilt from the row pool on demand
+HISTORY_CACHE_SIZE = int(os.environ.get("HISTORY_CACHE_SIZE", 2))
+
+# One NaN object for every missing cell, so rows with blanks intern to the same tuple
+_NAN = float("nan")
+
+
+def parse_effective_date(name):
+    """Leading date of an archive directory name, or None if it does not start with one."""
+    match = _DATED_DIRECTORY.match(name)
+    if not match:
+        return None
+    try:
+        return date(*map(int, match.groups()))
+    except ValueError:
+        return None
+
+
+class RowPool:
+    """
+    Interned sheet rows shared by every version. A version stores only the
+    ids of its rows, so a row that did not change between two workbooks is
+    held once however many versions contain it.
+    """
+
+    def __init__(self):
+        self.ids = {}
+        self.rows = []
+
+    def __len__(self):
+        return len(self.rows)
+
+    def intern(self, frame):
+        """(columns, dtypes, attrs, row ids) describing frame, or None for a missing sheet."""
+        if frame is None:
+            return None
+        ids = np.empty(len(frame), dtype=np.int64)
+        columns = tuple(frame.columns)
+        for i, row in enumerate(frame.itertuples(index=False, name=None)):
+            key = (columns,) + tuple(
+                _NAN if isinstance(value, float) and value != value else value
+                for value in row
+            )
+            row_id = self.ids.get(key)
+            if row_id is None:
+                row_id = self.ids[key] = len(self.rows)
+                self.rows.append(key)
+            ids[i] = row_id
+        return columns, frame.dtypes.to_dict(), dict(frame.attrs), ids
+
+    def frame(self, interned):
+        """Rebuild the DataFrame intern() described."""
+        if interned is None:
+            return None
+        columns, dtypes, attrs, ids = interned
+        frame = pd.DataFrame(
+            [self.rows[i][1:] for i in ids], columns=list(columns)
+        ).astype(dtypes)
+        frame.attrs.update(attrs)
+        return frame
+
+
+class RateVersion:
+    """One dated rate snapshot: its effective date, source and interned sheets."""
+
+    def __init__(self, effective_date, source, snapshot_version, fixed, variable):
+        self.effective_date = effective_date
+        self.source = source
+        self.snapshot_version = snapshot_version
+        self.fixed = fixed
+        self.variable = variable
+
+
+class RateHistory:
+    """
+    Every dated rate snapshot, ordered by effective date. The version in force
+    on a date is the newest one effective on or before it, found by binary
+    search. Only the live calculator and the HISTORY_CACHE_SIZE most recently
+    used historical ones are held as DataFrames; the rest live in the row pool.
+    Safe to update from a background thread while requests read it.
+    """
+
+    def __init__(self):
+        self.pool = RowPool()
+        self.live = None
+        # (dates, versions) replaced as a whole, so readers never see them out of step
+        self._timeline = ([], [])
+        self._calculators = OrderedDict()
+        self._lock = threading.RLock()
+
+    @property
+    def dates(self):
+        return self._timeline[0]
+
+    @property
+    def versions(self):
+        return self._timeline[1]
+
+    def add(self, effective_date, fixed_data, variable_data, source=""):
+        """Add a snapshot; a later add on the same date replaces the earlier one."""
+        with self._lock:
+            version = RateVersion(
+                effective_date,
+                source,
+                compute_snapshot_version(fixed_data, variable_data),
+                self.pool.intern(fixed_data),
+                self.pool.intern(variable_data),
+            )
+            dates, versions = list(self.dates), list(self.versions)
+            i = bisect_right(dates, effective_date)
+            if i and dates[i - 1] == effective_date:
+                versions[i - 1] = version
+            else:
+                dates.insert(i, effective_date)
+                versions.insert(i, version)
+            self._timeline = (dates, versions)
+        logger.info(
+            f"Rate version {effective_date.isoformat()} ({version.snapshot_version}) from {source or 'memory'}; "
+            f"{len(self.versions)} versions share {len(self.pool)} unique rows"
+        )
+        return version
+
+    def add_live(self, effective_date, calculator, source=""):
+        """Add the calculator serving current quotes; lookups that land on it return it as is."""
+        with self._lock:
+            self.live = self.add(
+                effective_date, calculator.fixed_data, calculator.variable_data, source
+            )
+            self._calculators[self.live.snapshot_version] = calculator
+            self._evict()
+
+    def version_at(self, as_of):
+        """The RateVersion in force on as_of, or None if as_of predates every version."""
+        dates, versions = self._timeline
+        i = bisect_right(dates, as_of)
+        return versions[i - 1] if i else None
+
+    def calculator_at(self, as_of):
+        """(AnnuityCalculator, RateVersion) in force on as_of, or (None, None)."""
+        version = self.version_at(as_of)
+        if version is None:
+            return None, None
+
+        key = version.snapshot_version
+        with self._lock:
+            calculator = self._calculators.get(key)
+            if calculator is None:
+                calculator = AnnuityCalculator.from_frames(
+                    self.pool.frame(version.fixed), self.pool.frame(version.variable)
+                )
+                self._calculators[key] = calculator
+                self._evict()
+            elif self.live is None or key != self.live.snapshot_version:
+                self._calculators.move_to_end(key)
+        return calculator, version
+
+    def _evict(self):
+        live_key = self.live.snapshot_version if self.live else None
+        historical = [key for key in self._calculators if key != live_key]
+        for key in historical[: max(0, len(historical) - HISTORY_CACHE_SIZE)]:
+            del self._calculators[key]
+
+    def load_archives(self, directory):
+        """Add every dated archive directory under directory. Returns how many loaded."""
+        loaded = 0
+        for name in sorted(os.listdir(directory)):
+            path = os.path.join(directory, name)
+            effective_date = parse_effective_date(name)
+            fixed_path = os.path.join(path, FIXED_WORKBOOK)
+            variable_path = os.path.join(path, VARIABLE_WORKBOOK)
+            if (
+                effective_date is None
+                or not os.path.isfile(fixed_path)
+                or not os.path.isfile(variable_path)
+            ):
+                continue
+            try:
+                self.add(
+                    effective_date,
+                    clean_fixed_annuity_data(fixed_path),
+                    load_variable_annuity_data(variable_path),
+                    source=path,
+                )
+                loaded += 1
+            except Exception as e:
+                logger.error(f"Failed to load rate archive {path}: {str(e)}")
+        return loaded
+
+
+def live_effective_date(*paths):
+    """
+    When the live workbooks took effect: RATES_EFFECTIVE_DATE (YYYY-MM-DD) if
+    set, otherwise the date the newest of them was last modified.
+    """
+    configured = os.environ.get("RATES_EFFECTIVE_DATE")
+    if configured:
+        return date.fromisoformat(configured)
+    return datetime.fromtimestamp(max(os.path.getmtime(path) for path in paths)).date()
+
+
+def archive_workbooks(source_directory, history_directory, effective_date):
+    """Copy the live rate workbooks into a dated archive directory and return its path."""
+    target = os.path.join(history_directory, f"{effective_date.isoformat()} rates")
+    os.makedirs(target, exist_ok=True)
+    for name in (FIXED_WORKBOOK, VARIABLE_WORKBOOK):
+        shutil.copy2(os.path.join(source_directory, name), os.path.join(target, name))
+    return target
+
+
+if __name__ == "__main__":
+    base = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(
+        description="Archive the live rate workbooks as a dated version, before replacing them."
+    )
+    parser.add_argument("--date", type=date.fromisoformat, default=None,
+                        help="effective date of the rates being archived (default: today)")
+    parser.add_argument("--source", default=os.path.join(base, "excel files"))
+    parser.add_argument("--history", default=os.environ.get("RATE_HISTORY_DIR", base))
+    args = parser.parse_args()
+
+    path = archive_workbooks(args.source, args.history, args.date or date.today())
+    print(f"Archived rate workbooks to {path}")
@@ -0,0 +1,193 @@
+import re
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Name columns searched per product line
+SEARCH_FIELDS = {
+    "fixed": ("Company", "Product"),
+    "variable": ("Carrier", "Rider Name"),
+}
+DEFAULT_SEARCH_LIMIT = 10
+MAX_SEARCH_LIMIT = 50
+
+# Share of the query's trigrams a name needs for a fuzzy match ("flexchoise")
+TRIGRAM_THRESHOLD = 0.5
+
+# Match tiers, best first in the ranking
+NAME_PREFIX, WORD_PREFIX, TRIGRAM = 3, 2, 1
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def normalize(text):
+    """Lowercase, with every run of punctuation or whitespace turned into one space."""
+    return _NON_ALNUM.sub(" ", str(text).lower()).strip()
+
+
+def trigrams(text, partial=False):
+    """
+    Trigrams of each word padded as "  word ", pg_trgm style.
+    With partial=True the last word is left open at the end, since a
+    typeahead query is usually cut off mid-word.
+    """
+    words = text.split()
+    grams = set()
+    for n, word in enumerate(words):
+        padded = "  " + word + ("" if partial and n == len(words) - 1 else " ")
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def _tokens(names, positions):
+    """(word, position) pairs and trigram postings of the names at positions."""
+    pairs = set()
+    postings = {}
+    for position in positions:
+        row = names[position]
+        pairs.update((word, position) for name in row for word in name.split())
+        for gram in set().union(*(trigrams(name) for name in row)):
+            postings.setdefault(gram, []).append(position)
+    return pairs, postings
+
+
+def parse_search_options(data):
+    """
+    Read the search query (q) and limit from a request mapping.
+    Returns ({"query", "limit"}, None) or (None, errors).
+    """
+    errors = []
+    query = normalize(data.get("q") or "")
+    if not query:
+        errors.append("Search query (q) is required")
+
+    limit = DEFAULT_SEARCH_LIMIT
+    if data.get("limit") not in (None, ""):
+        try:
+            limit = int(data.get("limit"))
+            if not 1 <= limit <= MAX_SEARCH_LIMIT:
+                errors.append(f"Limit must be between 1 and {MAX_SEARCH_LIMIT}")
+        except (TypeError, ValueError):
+            errors.append("Limit must be a whole number")
+
+    if errors:
+        return None, errors
+    return {"query": query, "limit": limit}, None
+
+
+class ProductSearchIndex:
+    """
+    Typeahead index over the product names of one rate sheet, built once per
+    loaded snapshot. Positions are those of fixed_columns() / variable_columns().
+    - word prefixes: every (word, position) pair in one sorted array, so the
+      products with a word starting with a prefix are one searchsorted slice
+    - trigrams: posting arrays per trigram for misspelled or mid-word queries
+    """
+
+    def __init__(self, names, sort):
+        self.size = len(sort)
+        self.names = [[normalize(name) for name in row] for row in names]
+        self.sort_key = np.where(np.isnan(sort), np.inf, sort)
+
+        pairs, postings = _tokens(self.names, range(self.size))
+        self._set_words(pairs)
+        self.postings = {
+            gram: np.array(positions, dtype=np.intp) for gram, positions in postings.items()
+        }
+        logger.info(
+            f"Built search index: {self.size} products, {len(self.words)} words, "
+            f"{len(self.postings)} trigrams"
+        )
+
+    def _set_words(self, pairs):
+        pairs = sorted(pairs)
+        self.words = np.array([word for word, _ in pairs], dtype=str)
+        self.word_positions = np.array([position for _, position in pairs], dtype=np.intp)
+
+    def patched(self, old_positions, names, sort):
+        """
+        The index for a new load of the sheet, reusing this one's entries.
+        old_positions[i] is the position in this index of the product now at
+        position i, or -1 for a new product. The searched names are part of a
+        product's identity (rate_diff.PRODUCT_IDENTITY), so only new products
+        are tokenized; the entries of the others are moved to their new positions.
+        """
+        index = ProductSearchIndex.__new__(ProductSearchIndex)
+        index.size = len(sort)
+        index.sort_key = np.where(np.isnan(sort), np.inf, sort)
+
+        kept = old_positions >= 0
+        new_position = np.full(self.size, -1, dtype=np.intp)
+        new_position[old_positions[kept]] = np.flatnonzero(kept)
+        index.names = [
+            self.names[old] if old >= 0 else [normalize(name) for name in row]
+            for old, row in zip(old_positions.tolist(), names)
+        ]
+        added = np.flatnonzero(~kept).tolist()
+        pairs, postings = _tokens(index.names, added)
+
+        moved = new_position[self.word_positions]
+        keep = moved >= 0
+        pairs.update(zip(self.words[keep].tolist(), moved[keep].tolist()))
+        index._set_words(pairs)
+        for gram, positions in self.postings.items():
+            positions = new_position[positions]
+            postings.setdefault(gram, []).extend(positions[positions >= 0].tolist())
+        index.postings = {
+            gram: np.array(positions, dtype=np.intp)
+            for gram, positions in postings.items()
+            if positions
+        }
+        logger.info(f"Patched search index: {index.size} products, {len(added)} tokenized")
+        return index
+
+    def _prefix_mask(self, prefix):
+        lo = np.searchsorted(self.words, prefix, side="left")
+        hi = np.searchsorted(self.words, prefix + "\uffff", side="left")
+        mask = np.zeros(self.size, dtype=bool)
+        mask[self.word_positions[lo:hi]] = True
+        return mask
+
+    def search(self, query, limit=DEFAULT_SEARCH_LIMIT, allowed=None):
+        """
+        Positions of the best matches for a normalized query, best first:
+        a name starting with the query, then names where every query word
+        starts a word, then trigram matches; ties by trigram similarity and Sort.
+        allowed optionally restricts the result to these positions.
+        """
+        words = query.split()
+        if not words or not self.size:
+            return []
+
+        tier = np.zeros(self.size, dtype=np.int8)
+        prefix = self._prefix_mask(words[0])
+        for word in words[1:]:
+            prefix &= self._prefix_mask(word)
+        for position in np.flatnonzero(prefix):
+            name_prefix = any(name.startswith(query) for name in self.names[position])
+            tier[position] = NAME_PREFIX if name_prefix else WORD_PREFIX
+
+        grams = trigrams(query, partial=True)
+        hits = [self.postings[gram] for gram in grams if gram in self.postings]
+        if hits:
+            similarity = np.bincount(np.concatenate(hits), minlength=self.size) / len(grams)
+        else:
+            similarity = np.zeros(self.size)
+        tier[(tier == 0) & (similarity >= TRIGRAM_THRESHOLD)] = TRIGRAM
+
+        if allowed is not None:
+            keep = np.zeros(self.size, dtype=bool)
+            keep[allowed] = True
+            tier[~keep] = 0
+
+        candidates = np.flatnonzero(tier)
+        order = np.lexsort(
+            (
+                self.sort_key[candidates],
+                -similarity[candidates],
+                -tier[candidates],
+            )
+        )
+        return candidates[order][:limit].tolist()
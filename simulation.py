@@ -0,0 +1,260 @@
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATHS = 10000
+MIN_PATHS = 100
+MAX_PATHS = 100000
+# Fixed chunk size: the same seed gives the same paths whatever the pool size
+PATHS_PER_TASK = 20000
+DEFAULT_MEAN_RETURN = 0.06
+DEFAULT_VOLATILITY = 0.15
+PERCENTILES = (5, 25, 50, 75, 95)
+
+SIMULATION_WORKERS = int(os.environ.get("SIMULATION_WORKERS", os.cpu_count() or 1))
+SIMULATION_TIME_BUDGET = float(os.environ.get("SIMULATION_TIME_BUDGET", 10))
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+class SimulationTimeout(Exception):
+    pass
+
+
+def _get_executor():
+    # Created lazily and per process so gunicorn --preload forks never share a
+    # pool; the lock stops two request threads each starting one
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor_pid != os.getpid():
+            _executor = ProcessPoolExecutor(max_workers=SIMULATION_WORKERS)
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def parse_simulation_options(data):
+    """
+    Read the optional simulation knobs from a request body.
+    Returns (options, None) or (None, errors).
+    """
+    errors = []
+    options = {
+        "paths": DEFAULT_PATHS,
+        "seed": None,
+        "mean_return": DEFAULT_MEAN_RETURN,
+        "volatility": DEFAULT_VOLATILITY,
+    }
+
+    if data.get("paths") is not None:
+        try:
+            options["paths"] = int(data["paths"])
+            if not MIN_PATHS <= options["paths"] <= MAX_PATHS:
+                raise ValueError
+        except (TypeError, ValueError, OverflowError):
+            errors.append(f"Paths must be between {MIN_PATHS:,} and {MAX_PATHS:,}")
+
+    if data.get("seed") is not None:
+        try:
+            options["seed"] = int(data["seed"])
+            if options["seed"] < 0:
+                raise ValueError
+        except (TypeError, ValueError, OverflowError):
+            errors.append("Seed must be a non-negative whole number")
+
+    if data.get("mean_return") is not None:
+        try:
+            options["mean_return"] = float(data["mean_return"])
+            if not -0.5 <= options["mean_return"] <= 0.5:
+                raise ValueError
+        except (TypeError, ValueError):
+            errors.append("Mean Return must be between -0.5 and 0.5")
+
+    if data.get("volatility") is not None:
+        try:
+            options["volatility"] = float(data["volatility"])
+            if not 0 <= options["volatility"] <= 1:
+                raise ValueError
+        except (TypeError, ValueError):
+            errors.append("Volatility must be between 0 and 1")
+
+    return (None, errors) if errors else (options, None)
+
+
+def _check_deadline(deadline, time_budget):
+    # time.monotonic() is system-wide, so a deadline also holds in pool workers
+    if deadline is not None and time.monotonic() > deadline:
+        raise SimulationTimeout(f"Simulation exceeded its {time_budget:g}s time budget")
+
+
+def simulate_growth_paths(
+    seed_sequence, n_paths, years, mean_return, volatility, deadline=None, time_budget=None
+):
+    """
+    Draw lognormal annual market returns and return cumulative growth factors.
+    Shape is (n_paths, years + 1); column 0 is the starting value 1.0.
+    mean_return and volatility are the arithmetic mean and standard deviation
+    of one year's return. Returns are drawn a year at a time, and past
+    deadline (a time.monotonic() value) SimulationTimeout is raised.
+    """
+    rng = np.random.default_rng(seed_sequence)
+    log_variance = np.log1p(volatility**2 / (1 + mean_return) ** 2)
+    log_mean = np.log1p(mean_return) - log_variance / 2
+
+    log_returns = np.empty((years, n_paths))
+    for year in range(years):
+        _check_deadline(deadline, time_budget)
+        log_returns[year] = rng.standard_normal(n_paths)
+    log_returns *= np.sqrt(log_variance)
+    log_returns += log_mean
+
+    growth = np.empty((n_paths, years + 1))
+    growth[:, 0] = 1.0
+    np.cumsum(log_returns.T, axis=1, out=growth[:, 1:])
+    np.exp(growth[:, 1:], out=growth[:, 1:])
+    return growth
+
+
+def _draw_paths(seed, paths, years, mean_return, volatility, time_budget):
+    chunk_sizes = [PATHS_PER_TASK] * (paths // PATHS_PER_TASK)
+    if paths % PATHS_PER_TASK:
+        chunk_sizes.append(paths % PATHS_PER_TASK)
+    seeds = np.random.SeedSequence(seed).spawn(len(chunk_sizes))
+    deadline = time.monotonic() + time_budget
+
+    if len(chunk_sizes) == 1 or SIMULATION_WORKERS <= 1:
+        chunks = []
+        for seed_sequence, n_paths in zip(seeds, chunk_sizes):
+            _check_deadline(deadline, time_budget)
+            chunks.append(
+                simulate_growth_paths(
+                    seed_sequence, n_paths, years, mean_return, volatility, deadline, time_budget
+                )
+            )
+        return np.concatenate(chunks)
+
+    executor = _get_executor()
+    futures = [
+        executor.submit(
+            simulate_growth_paths,
+            seed_sequence,
+            n_paths,
+            years,
+            mean_return,
+            volatility,
+            deadline,
+            time_budget,
+        )
+        for seed_sequence, n_paths in zip(seeds, chunk_sizes)
+    ]
+    _, not_done = wait(futures, timeout=max(0.0, deadline - time.monotonic()))
+    if not_done:
+        # Queued chunks are dropped; running ones stop at their next year
+        for future in not_done:
+            future.cancel()
+        raise SimulationTimeout(f"Simulation exceeded its {time_budget:g}s time budget")
+    return np.concatenate([future.result() for future in futures])
+
+
+def run_simulation(
+    variable_data,
+    amount,
+    current_age,
+    withdrawal_age,
+    paths=DEFAULT_PATHS,
+    seed=None,
+    mean_return=DEFAULT_MEAN_RETURN,
+    volatility=DEFAULT_VOLATILITY,
+    time_budget=SIMULATION_TIME_BUDGET,
+):
+    """
+    Project account value against the guaranteed income of every variable product.
+    Each path is a sequence of annual market returns over the deferral period;
+    the rider cost (column H) is charged against account value every year.
+    Guaranteed Benefit Base and income use the same Excel formulas as
+    get_variable_income, so they do not depend on the paths.
+    """
+    deferral_period = withdrawal_age - current_age
+    if seed is None:
+        seed = int(np.random.SeedSequence().entropy % (2**63))
+
+    started = time.monotonic()
+    growth = _draw_paths(
+        seed, paths, deferral_period, mean_return, volatility, time_budget
+    )
+
+    # Sort order, like get_variable_income
+    products = variable_data.sort_values("Sort", kind="stable", na_position="last")
+    deferral_credit = products["Deferral Credit"].fillna(0).to_numpy(dtype=float)
+    withdrawal_rate = products["Withdrawal Rate"].fillna(0).to_numpy(dtype=float)
+    rider_cost = products["Rider Cost"].fillna(0).to_numpy(dtype=float)
+
+    benefit_base = np.where(
+        deferral_credit > 0, amount + amount * deferral_credit * deferral_period, amount
+    )
+    guaranteed_income = benefit_base * withdrawal_rate
+
+    # (products, years + 1): cumulative rider charges per product and year
+    cost_drag = (1 - rider_cost)[:, None] ** np.arange(deferral_period + 1)[None, :]
+
+    # Percentiles commute with positive scaling, so the path percentiles are
+    # taken once and scaled per product instead of per (product, path, year)
+    growth_bands = np.percentile(growth, PERCENTILES, axis=0).T
+    account_bands = amount * cost_drag[:, :, None] * growth_bands[None, :, :]
+
+    # (products, paths): account value at first withdrawal on every path
+    account_at_withdrawal = amount * cost_drag[:, -1:] * growth[None, :, -1]
+    above_benefit_base = (account_at_withdrawal >= benefit_base[:, None]).mean(axis=1)
+    income_bands = account_bands[:, -1, :] * withdrawal_rate[:, None]
+
+    labels = [f"p{p}" for p in PERCENTILES]
+    ages = range(current_age, withdrawal_age + 1)
+    results = []
+    for i, (_, row) in enumerate(products.iterrows()):
+        results.append(
+            {
+                "sort": int(row["Sort"]) if pd.notna(row["Sort"]) else None,
+                "carrier": str(row["Carrier"]) if pd.notna(row["Carrier"]) else "",
+                "rider_name": str(row["Rider Name"]) if pd.notna(row["Rider Name"]) else "",
+                "rider_cost": float(rider_cost[i]) * 100,
+                "withdrawal_rate": float(withdrawal_rate[i]) * 100,
+                "guaranteed_benefit_base": round(float(benefit_base[i]), 2),
+                "guaranteed_annual_income": round(float(guaranteed_income[i]), 2),
+                "probability_account_exceeds_benefit_base": round(
+                    float(above_benefit_base[i]), 4
+                ),
+                "account_income_at_withdrawal": dict(
+                    zip(labels, np.round(income_bands[i], 2).tolist())
+                ),
+                "account_value_bands": [
+                    {"age": age, **dict(zip(labels, band))}
+                    for age, band in zip(ages, np.round(account_bands[i], 2).tolist())
+                ],
+            }
+        )
+
+    elapsed = time.monotonic() - started
+    logger.info(
+        f"Simulated {paths:,} paths x {deferral_period} years for {len(results)} variable products in {elapsed:.3f}s"
+    )
+    return {
+        "current_age": current_age,
+        "withdrawal_age": withdrawal_age,
+        "deferral_period": deferral_period,
+        "investment_amount": amount,
+        "paths": paths,
+        "seed": seed,
+        "mean_return": mean_return,
+        "volatility": volatility,
+        "percentiles": list(PERCENTILES),
+        "products": results,
+        "count": len(results),
+    }
@@ -0,0 +1,279 @@
+import os
+import hmac
+import json
+import zlib
+import pickle
+import hashlib
+import logging
+import argparse
+import tempfile
+import threading
+import urllib.error
+import urllib.request
+from datetime import date, datetime, timezone
+
+from data_processor import clean_fixed_annuity_data, load_variable_annuity_data
+from logic import compute_snapshot_version
+
+logger = logging.getLogger(__name__)
+
+# Where compiled snapshots are published: a shared directory or an http(s) base URL
+SNAPSHOT_STORE = os.environ.get("SNAPSHOT_STORE", "")
+SNAPSHOT_SIGNING_KEY = os.environ.get("SNAPSHOT_SIGNING_KEY", "")
+SNAPSHOT_POLL_INTERVAL = float(os.environ.get("SNAPSHOT_POLL_INTERVAL", 30))
+# Artifacts kept in a directory store besides the one LATEST points to
+SNAPSHOT_KEEP = int(os.environ.get("SNAPSHOT_KEEP", 10))
+
+LATEST = "LATEST"
+_MAGIC = b"ANSNAP1\n"
+_DIGEST_SIZE = hashlib.sha256().digest_size
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def _is_url(store):
+    return store.startswith(("http://", "https://"))
+
+
+def _signature(key, body):
+    return hmac.new(key.encode(), _MAGIC + body, hashlib.sha256).digest()
+
+
+def encode_snapshot(fixed_data, variable_data, effective_date, key):
+    """Signed artifact bytes for a pair of rate frames, and its manifest."""
+    if not key:
+        raise SnapshotError("SNAPSHOT_SIGNING_KEY is required to publish snapshots")
+    version = compute_snapshot_version(fixed_data, variable_data)
+    manifest = {
+        "version": version,
+        "file": f"{version}.snapshot",
+        "effective_date": effective_date.isoformat(),
+        "published_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+    body = zlib.compress(
+        pickle.dumps(
+            {"manifest": manifest, "fixed": fixed_data, "variable": variable_data},
+            protocol=pickle.HIGHEST_PROTOCOL,
+        )
+    )
+    manifest["size"] = len(_MAGIC) + _DIGEST_SIZE + len(body)
+    return _MAGIC + _signature(key, body) + body, manifest
+
+
+def decode_snapshot(artifact, key):
+    """
+    (fixed_data, variable_data, manifest) from artifact bytes. The signature is
+    checked before anything is unpickled; a bad one raises SnapshotError.
+    """
+    if not key:
+        raise SnapshotError("SNAPSHOT_SIGNING_KEY is required to load snapshots")
+    if not artifact.startswith(_MAGIC):
+        raise SnapshotError("Not a rate snapshot artifact")
+    signature = artifact[len(_MAGIC):len(_MAGIC) + _DIGEST_SIZE]
+    body = artifact[len(_MAGIC) + _DIGEST_SIZE:]
+    if not hmac.compare_digest(signature, _signature(key, body)):
+        raise SnapshotError("Snapshot signature does not match")
+
+    snapshot = pickle.loads(zlib.decompress(body))
+    fixed_data, variable_data = snapshot["fixed"], snapshot["variable"]
+    manifest = snapshot["manifest"]
+    if compute_snapshot_version(fixed_data, variable_data) != manifest["version"]:
+        raise SnapshotError(f"Snapshot content does not match version {manifest['version']}")
+    return fixed_data, variable_data, manifest
+
+
+def _write_atomic(path, data):
+    # Readers see the old file or the new one, never a partial write
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        # Readable by nodes running as other users on the shared volume
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+def publish(store, fixed_path, variable_path, key, effective_date=None):
+    """
+    Parse the rate workbooks once and publish them to a directory store:
+    the signed artifact first, then LATEST pointing at it. Publishing rates
+    that are already LATEST is a no-op. Returns the manifest.
+    """
+    fixed_data = clean_fixed_annuity_data(fixed_path)
+    variable_data = load_variable_annuity_data(variable_path)
+    artifact, manifest = encode_snapshot(
+        fixed_data, variable_data, effective_date or date.today(), key
+    )
+
+    os.makedirs(store, exist_ok=True)
+    latest_path = os.path.join(store, LATEST)
+    if os.path.exists(latest_path):
+        with open(latest_path) as f:
+            current = json.load(f)
+        if current.get("version") == manifest["version"]:
+            logger.info(f"Snapshot {manifest['version']} is already published")
+            return current
+
+    _write_atomic(os.path.join(store, manifest["file"]), artifact)
+    _write_atomic(latest_path, json.dumps(manifest).encode())
+    logger.info(f"Published snapshot {manifest['version']} ({manifest['size']:,} bytes) to {store}")
+    _prune(store, manifest["file"])
+    return manifest
+
+
+def _prune(store, latest_file):
+    artifacts = sorted(
+        (entry for entry in os.scandir(store) if entry.name.endswith(".snapshot")),
+        key=lambda entry: entry.stat().st_mtime,
+        reverse=True,
+    )
+    for entry in artifacts[SNAPSHOT_KEEP + 1:]:
+        if entry.name != latest_file:
+            os.unlink(entry.path)
+
+
+def iter_published(store, key):
+    """
+    Every snapshot kept in a directory store as verified
+    (fixed_data, variable_data, manifest), oldest effective date first.
+    Artifacts that fail verification are logged and skipped.
+    """
+    if _is_url(store) or not os.path.isdir(store):
+        return
+    snapshots = []
+    for entry in os.scandir(store):
+        if not entry.name.endswith(".snapshot"):
+            continue
+        try:
+            with open(entry.path, "rb") as f:
+                snapshots.append(decode_snapshot(f.read(), key))
+        except Exception as e:
+            logger.error(f"Skipping snapshot {entry.path}: {str(e)}")
+    snapshots.sort(key=lambda snapshot: (snapshot[2]["effective_date"], snapshot[2]["published_at"]))
+    yield from snapshots
+
+
+class SnapshotSubscriber:
+    """
+    Follows the LATEST pointer of a snapshot store. Each poll is one stat()
+    (directory store) or one conditional GET (URL store, If-None-Match /
+    If-Modified-Since); the artifact is only downloaded when the version
+    changes, and on_update(fixed_data, variable_data, manifest) is called
+    with the verified frames.
+    """
+
+    def __init__(self, store, key, on_update, interval=SNAPSHOT_POLL_INTERVAL):
+        self.store = store
+        self.key = key
+        self.on_update = on_update
+        self.interval = interval
+        self.version = None
+        self._validators = None
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def _latest(self):
+        """
+        (LATEST manifest, its cache validators) if it may have changed since the
+        last applied poll, else (None, None).
+        """
+        if not _is_url(self.store):
+            try:
+                stat = os.stat(os.path.join(self.store, LATEST))
+            except FileNotFoundError:
+                return None, None
+            validators = (stat.st_mtime_ns, stat.st_size)
+            if validators == self._validators:
+                return None, None
+            with open(os.path.join(self.store, LATEST), "rb") as f:
+                latest = f.read()
+        else:
+            request = urllib.request.Request(f"{self.store.rstrip('/')}/{LATEST}")
+            if self._validators:
+                etag, modified = self._validators
+                if etag:
+                    request.add_header("If-None-Match", etag)
+                if modified:
+                    request.add_header("If-Modified-Since", modified)
+            try:
+                with urllib.request.urlopen(request, timeout=10) as response:
+                    latest = response.read()
+                    validators = (response.headers.get("ETag"), response.headers.get("Last-Modified"))
+            except urllib.error.HTTPError as e:
+                if e.code == 304:
+                    return None, None
+                raise
+        return json.loads(latest), validators
+
+    def _download(self, name):
+        if not _is_url(self.store):
+            with open(os.path.join(self.store, name), "rb") as f:
+                return f.read()
+        with urllib.request.urlopen(f"{self.store.rstrip('/')}/{name}", timeout=60) as response:
+            return response.read()
+
+    def poll(self):
+        """Check for a new snapshot and apply it. Returns True if one was applied."""
+        with self._lock:
+            manifest, validators = self._latest()
+            if manifest is None:
+                return False
+            if manifest["version"] == self.version:
+                self._validators = validators
+                return False
+            fixed_data, variable_data, verified = decode_snapshot(
+                self._download(manifest["file"]), self.key
+            )
+            if verified["version"] != manifest["version"]:
+                raise SnapshotError(
+                    f"{manifest['file']} holds {verified['version']}, not {manifest['version']}"
+                )
+            self.on_update(fixed_data, variable_data, verified)
+            self.version = verified["version"]
+            self._validators = validators
+            logger.info(f"Applied rate snapshot {self.version} from {self.store}")
+            return True
+
+    def start(self):
+        """Poll in a daemon thread, started once per process (safe after a gunicorn fork)."""
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        threading.Thread(target=self._run, name="snapshot-subscriber", daemon=True).start()
+
+    def _run(self):
+        stop = threading.Event()
+        while not stop.wait(self.interval):
+            try:
+                self.poll()
+            except Exception as e:
+                # Keep serving the current snapshot; the next poll retries
+                logger.error(f"Snapshot poll failed: {str(e)}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    base = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(
+        description="Compile the rate workbooks into a signed snapshot and publish it."
+    )
+    parser.add_argument("--store", default=SNAPSHOT_STORE,
+                        help="snapshot directory (default: $SNAPSHOT_STORE)")
+    parser.add_argument("--fixed", default=os.path.join(base, "excel files", "Fixed Annuity Rates.xlsx"))
+    parser.add_argument("--variable", default=os.path.join(base, "excel files", "Variable Annuity Rates.xlsx"))
+    parser.add_argument("--date", type=date.fromisoformat, default=None,
+                        help="effective date of the rates (default: today)")
+    args = parser.parse_args()
+
+    if not args.store or _is_url(args.store):
+        parser.error("--store must be a directory; upload its files to a URL store separately")
+    manifest = publish(args.store, args.fixed, args.variable, SNAPSHOT_SIGNING_KEY, args.date)
+    print(f"LATEST -> {manifest['version']} ({manifest['file']})")
@@ -6,9 +6,12 @@ document.addEventListener('DOMContentLoaded', function() {
     const container = document.querySelector('.container');
     const withdrawalAgeRow = document.getElementById('withdrawal-age-row');
     const withdrawalAgeInput = document.getElementById('withdrawal_age');
+    const immediateRow = document.getElementById('immediate-row');
+    const sexInput = document.getElementById('sex');
+    const currentAgeInput = document.getElementById('current_age');
     const annuityTypeRadios = document.querySelectorAll('input[name="annuity_type"]');
     
-    // Handle annuity type change to show/hide withdrawal age
+    // Handle annuity type change to show/hide withdrawal age and immediate inputs
     annuityTypeRadios.forEach(radio => {
         radio.addEventListener('change', function() {
             if (this.value === 'variable') {
@@ -19,18 +22,164 @@ document.addEventListener('DOMContentLoaded', function() {
                 withdrawalAgeInput.required = false;
                 withdrawalAgeInput.value = '';
             }
+            
+            if (this.value === 'immediate') {
+                immediateRow.style.display = 'grid';
+                sexInput.required = true;
+                currentAgeInput.required = true;
+            } else {
+                immediateRow.style.display = 'none';
+                sexInput.required = false;
+                currentAgeInput.required = false;
+            }
         });
     });
     
-    form.addEventListener('submit', async function(e) {
-        e.preventDefault();
-        
-        // Clear previous results/errors
-        errorMessage.style.display = 'none';
-        results.style.display = 'none';
-        results.innerHTML = '';
-        
-        // Get form data
+    // Quotes already answered this session, keyed by the inputs that affect the
+    // quote and the version of the rates that priced them
+    const CACHE_STORAGE_KEY = 'annuityQuoteCache';
+    const CACHE_LIMIT = 20;
+    // How long known rate versions are trusted before /health is asked again
+    const VERSION_TTL_MS = 60 * 1000;
+    const PREFETCH_DELAY_MS = 400;
+    
+    let sheetVersions = {};
+    let versionCheckedAt = 0;
+    let quoteCache = loadQuoteCache();
+    const pendingQuotes = new Map();
+    let submitController = null;
+    let prefetchController = null;
+    let prefetchTimer = null;
+    
+    function loadQuoteCache() {
+        try {
+            return new Map(JSON.parse(sessionStorage.getItem(CACHE_STORAGE_KEY) || '[]'));
+        } catch (error) {
+            return new Map();
+        }
+    }
+    
+    function saveQuoteCache() {
+        try {
+            sessionStorage.setItem(CACHE_STORAGE_KEY, JSON.stringify([...quoteCache]));
+        } catch (error) {
+            // Storage full or disabled: the in-memory cache still works for this page
+        }
+    }
+    
+    function quoteInputs(data) {
+        // Only the fields that change the quote; contact details do not
+        const inputs = {
+            annuity_type: data.annuity_type,
+            amount: data.amount,
+            state: data.state || ''
+        };
+        if (data.annuity_type === 'variable') {
+            inputs.current_age = data.current_age;
+            inputs.withdrawal_age = data.withdrawal_age;
+        } else if (data.annuity_type === 'immediate') {
+            inputs.current_age = data.current_age;
+            inputs.sex = data.sex;
+            inputs.payout_option = data.payout_option;
+        }
+        return JSON.stringify(inputs);
+    }
+    
+    // Each product line is quoted from its own rates, so an update to one
+    // line's sheet leaves the cached quotes of the others valid
+    function productLine(data) {
+        return ['variable', 'immediate'].includes(data.annuity_type) ? data.annuity_type : 'fixed';
+    }
+    
+    function cacheKey(data, version) {
+        return `${productLine(data)}:${version}|${quoteInputs(data)}`;
+    }
+    
+    function keepCurrentVersions() {
+        quoteCache = new Map([...quoteCache].filter(([key]) => {
+            const [line, version] = key.split('|')[0].split(':');
+            return sheetVersions[line] === version;
+        }));
+        saveQuoteCache();
+    }
+    
+    function rememberQuote(data, result) {
+        const version = result.sheet_version;
+        if (!version) {
+            return;
+        }
+        const line = productLine(data);
+        if (version !== sheetVersions[line]) {
+            // New rates for this line: its older quotes can not be shown again
+            sheetVersions[line] = version;
+            keepCurrentVersions();
+        }
+        quoteCache.delete(cacheKey(data, version));
+        quoteCache.set(cacheKey(data, version), result);
+        while (quoteCache.size > CACHE_LIMIT) {
+            quoteCache.delete(quoteCache.keys().next().value);
+        }
+        saveQuoteCache();
+    }
+    
+    async function refreshSheetVersions() {
+        try {
+            const response = await fetch('/health');
+            const health = await response.json();
+            if (health.sheet_versions) {
+                sheetVersions = health.sheet_versions;
+                keepCurrentVersions();
+            }
+            versionCheckedAt = Date.now();
+        } catch (error) {
+            // Without confirmed versions the cache is skipped until the next check
+        }
+    }
+    
+    async function cachedQuote(data) {
+        if (Date.now() - versionCheckedAt > VERSION_TTL_MS) {
+            await refreshSheetVersions();
+        }
+        const version = sheetVersions[productLine(data)];
+        return version ? quoteCache.get(cacheKey(data, version)) : undefined;
+    }
+    
+    function requestQuote(data, signal) {
+        // A submit for the inputs a prefetch is already fetching shares its request
+        const inputs = quoteInputs(data);
+        const pending = pendingQuotes.get(inputs);
+        if (pending && !pending.signal.aborted) {
+            if (prefetchController && pending.signal === prefetchController.signal) {
+                // The submit owns it now: later edits must not abort it
+                prefetchController = null;
+            }
+            return pending.request;
+        }
+        const request = fetch('/api/calculate', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify(data),
+            signal: signal
+        }).then(async response => {
+            const result = await response.json();
+            if (!response.ok) {
+                throw new Error(result.error || 'Calculation failed');
+            }
+            rememberQuote(data, result);
+            return result;
+        }).finally(() => {
+            const current = pendingQuotes.get(inputs);
+            if (current && current.request === request) {
+                pendingQuotes.delete(inputs);
+            }
+        });
+        pendingQuotes.set(inputs, { request: request, signal: signal });
+        return request;
+    }
+    
+    function readForm() {
         const formData = new FormData(form);
         const data = {
             name: formData.get('name') || '',
@@ -48,41 +197,106 @@ document.addEventListener('DOMContentLoaded', function() {
             data.withdrawal_age = parseInt(formData.get('withdrawal_age')) || 0;
         }
         
+        // Add sex and payout option if immediate
+        if (data.annuity_type === 'immediate') {
+            data.sex = formData.get('sex');
+            data.payout_option = formData.get('payout_option');
+        }
+        return data;
+    }
+    
+    function displayQuote(result) {
+        if (result.type === 'fixed') {
+            displayFixedResults(result.results, result.state_filtered);
+        } else if (result.type === 'variable') {
+            displayVariableResults(result.result);
+        } else if (result.type === 'immediate') {
+            displayImmediateResults(result.result);
+        }
+    }
+    
+    // Once both ages and the amount are filled in for a variable quote, fetch it
+    // in the background so the submit is answered from the cache
+    function schedulePrefetch() {
+        clearTimeout(prefetchTimer);
+        prefetchTimer = setTimeout(prefetchVariableQuote, PREFETCH_DELAY_MS);
+    }
+    
+    async function prefetchVariableQuote() {
+        const data = readForm();
+        if (
+            data.annuity_type !== 'variable' ||
+            data.amount < 50000 ||
+            data.current_age < 18 || data.current_age > 100 ||
+            data.withdrawal_age < 59 || data.withdrawal_age > 100 ||
+            data.withdrawal_age <= data.current_age ||
+            pendingQuotes.has(quoteInputs(data)) ||
+            await cachedQuote(data)
+        ) {
+            return;
+        }
+        if (prefetchController) {
+            prefetchController.abort();
+        }
+        prefetchController = new AbortController();
+        requestQuote(data, prefetchController.signal).catch(() => {
+            // A failed or superseded prefetch is simply retried by the submit
+        });
+    }
+    
+    [currentAgeInput, withdrawalAgeInput, document.getElementById('amount')].forEach(input => {
+        input.addEventListener('input', schedulePrefetch);
+    });
+    annuityTypeRadios.forEach(radio => radio.addEventListener('change', schedulePrefetch));
+    
+    refreshSheetVersions();
+    
+    form.addEventListener('submit', async function(e) {
+        e.preventDefault();
+        
+        // Clear previous results/errors
+        errorMessage.style.display = 'none';
+        results.style.display = 'none';
+        results.innerHTML = '';
+        
+        const data = readForm();
+        
+        // A newer submit replaces any quote still loading
+        if (submitController) {
+            submitController.abort();
+        }
+        const controller = new AbortController();
+        submitController = controller;
+        
+        const cached = await cachedQuote(data);
+        if (cached) {
+            displayQuote(cached);
+            return;
+        }
+        
         // Show loading
         loading.style.display = 'block';
         form.style.opacity = '0.5';
         
         try {
-            const response = await fetch('/api/calculate', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json'
-                },
-                body: JSON.stringify(data)
-            });
-            
-            const result = await response.json();
-            
-            if (!response.ok) {
-                throw new Error(result.error || 'Calculation failed');
-            }
-            
-            if (result.type === 'fixed') {
-                displayFixedResults(result.results);
-            } else if (result.type === 'variable') {
-                displayVariableResults(result.result);
+            const result = await requestQuote(data, controller.signal);
+            if (controller === submitController) {
+                displayQuote(result);
             }
-            
         } catch (error) {
-            errorMessage.textContent = error.message || 'An error occurred. Please try again.';
-            errorMessage.style.display = 'block';
+            if (error.name !== 'AbortError' && controller === submitController) {
+                errorMessage.textContent = error.message || 'An error occurred. Please try again.';
+                errorMessage.style.display = 'block';
+            }
         } finally {
-            loading.style.display = 'none';
-            form.style.opacity = '1';
+            if (controller === submitController) {
+                loading.style.display = 'none';
+                form.style.opacity = '1';
+            }
         }
     });
     
-    function displayFixedResults(products) {
+    function displayFixedResults(products, stateFiltered) {
         // Expand container for table view
         container.classList.add('has-results');
         
@@ -125,7 +339,11 @@ document.addEventListener('DOMContentLoaded', function() {
         });
         
         html += '</tbody></table>';
-        html += `<p class="disclaimer">Showing all ${products.length} products. Product availability varies by state. Contact us to confirm eligibility and get detailed quotes.</p>`;
+        if (stateFiltered) {
+            html += `<p class="disclaimer">Showing all ${products.length} products available in your state. Contact us to confirm eligibility and get detailed quotes.</p>`;
+        } else {
+            html += `<p class="disclaimer">Showing all ${products.length} products. Product availability varies by state. Contact us to confirm eligibility and get detailed quotes.</p>`;
+        }
         
         results.innerHTML = html;
         results.style.display = 'block';
@@ -167,6 +385,47 @@ document.addEventListener('DOMContentLoaded', function() {
         results.style.display = 'block';
     }
     
+    function displayImmediateResults(result) {
+        // Expand container for table view
+        container.classList.add('has-results');
+        
+        if (!result || !result.options || result.options.length === 0) {
+            results.innerHTML = '<p class="disclaimer">Immediate annuity payouts are not available right now. Please try again later.</p>';
+            results.style.display = 'block';
+            return;
+        }
+        
+        const money = value => value.toLocaleString(undefined, {minimumFractionDigits: 2, maximumFractionDigits: 2});
+        
+        let html = result.illustrative ? '<h2>Immediate Annuity Income (Illustrative)</h2>' : '<h2>Immediate Annuity Income</h2>';
+        html += '<table class="results-table">';
+        html += '<thead><tr>';
+        html += '<th>Payout Option</th>';
+        html += '<th>Monthly Income</th>';
+        html += '<th>Annual Income</th>';
+        html += '</tr></thead><tbody>';
+        
+        result.options.forEach(option => {
+            const selected = option.payout_option === result.payout_option;
+            html += selected ? '<tr class="selected">' : '<tr>';
+            html += `<td>${selected ? '<strong>' : ''}${escapeHtml(option.label)}${selected ? '</strong>' : ''}</td>`;
+            html += `<td>$${money(option.monthly_income)}</td>`;
+            html += `<td>$${money(option.annual_income)}</td>`;
+            html += '</tr>';
+        });
+        
+        html += '</tbody></table>';
+        html += `<p class="disclaimer">Guaranteed monthly income for a $${money(result.premium)} premium at age ${result.current_age}, assuming ${result.interest_rate}% interest and a ${result.expense_load}% expense load. Contact us for carrier quotes.</p>`;
+        if (result.illustrative) {
+            html += '<p class="disclaimer"><strong>Illustration only:</strong> these payouts use a sample mortality table, not a published annuitant table, and are not an offer. Carrier payouts will differ.</p>';
+        } else {
+            html += `<p class="disclaimer">Mortality: ${escapeHtml(result.mortality_table)}.</p>`;
+        }
+        
+        results.innerHTML = html;
+        results.style.display = 'block';
+    }
+    
     function escapeHtml(text) {
         const div = document.createElement('div');
         div.textContent = text;
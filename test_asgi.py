@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""Test that the ASGI server answers like the Flask app."""
+
+import sys
+import os
+import json
+import asyncio
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("QUOTE_STORE_PATH", os.path.join(tempfile.mkdtemp(), "quotes.db"))
+
+import asgi
+import app as web
+
+FIXED = {"amount": 100000, "annuity_type": "fixed", "state": "TX"}
+
+
+async def call(method, path, body=b"", query=b"", headers=(), chunks=1):
+    """Run one request through the ASGI app; returns (status, headers, body)."""
+    scope = {
+        "type": "http",
+        "method": method,
+        "path": path,
+        "query_string": query,
+        "headers": [(k.encode(), v.encode()) for k, v in headers],
+    }
+    size = -(-len(body) // chunks) if body else 0
+    parts = [body[i:i + size] for i in range(0, len(body), size)] if body else [b""]
+    messages = [
+        {"type": "http.request", "body": part, "more_body": i < len(parts) - 1}
+        for i, part in enumerate(parts)
+    ]
+    sent = []
+
+    async def receive():
+        await asyncio.sleep(0)  # a slow client: one chunk per loop iteration
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    await asgi.application(scope, receive, send)
+    start = sent[0]
+    return (
+        start["status"],
+        {k.decode(): v.decode() for k, v in start["headers"]},
+        b"".join(m.get("body", b"") for m in sent[1:]),
+    )
+
+
+def without_quote_id(body):
+    payload = json.loads(body)
+    payload.pop("quote_id", None)
+    return payload
+
+
+def test_matches_flask():
+    client = web.app.test_client()
+    cases = [
+        FIXED,
+        {"amount": 525000, "annuity_type": "variable", "current_age": 60, "withdrawal_age": 65},
+        {"amount": 100000, "annuity_type": "immediate", "current_age": 70, "sex": "male"},
+        {"amount": 10, "annuity_type": "variable"},
+        {"amount": 100000, "annuity_type": "annuity"},
+        {"amount": 100000, "annuity_type": "fixed", "as_of": "1999-01-01"},
+    ]
+    for case in cases:
+        expected = client.post("/api/calculate", json=case)
+        body = json.dumps(case).encode()
+        status, headers, actual = asyncio.run(call("POST", "/api/calculate", body, chunks=7))
+        assert status == expected.status_code, (case, status, actual)
+        assert headers["access-control-allow-origin"] == "*"
+        if status == 200:
+            assert without_quote_id(actual) == without_quote_id(expected.data), case
+        else:
+            assert actual == expected.data, (case, actual, expected.data)
+
+    status, _, actual = asyncio.run(call("GET", "/health"))
+    assert (status, actual) == (200, client.get("/health").data)
+
+    status, _, actual = asyncio.run(
+        call("POST", "/api/calculate", json.dumps(FIXED).encode(), query=b"stream=1")
+    )
+    expected = client.post("/api/calculate?stream=1", json=FIXED).data.splitlines()
+    actual = actual.splitlines()
+    # Each stream's header carries the id its quote was saved under
+    assert without_quote_id(actual[0]) == without_quote_id(expected[0])
+    assert actual[1:] == expected[1:]
+
+    status, headers, page = asyncio.run(call("GET", "/"))
+    assert status == 200 and b"/static/script.js" in page
+    status, headers, script = asyncio.run(call("GET", "/static/script.js"))
+    assert status == 200 and "javascript" in headers["content-type"]
+    assert asyncio.run(call("GET", "/static/../app.py"))[0] == 404
+    assert asyncio.run(call("GET", "/api/calculate"))[0] == 405
+
+    status, headers, _ = asyncio.run(
+        call("OPTIONS", "/api/calculate", headers=[("access-control-request-headers", "content-type")])
+    )
+    assert headers["access-control-allow-headers"] == "content-type"
+
+
+def test_busy_and_concurrency():
+    async def burst(n):
+        body = json.dumps(FIXED).encode()
+        return await asyncio.gather(*(call("POST", "/api/calculate", body, chunks=50) for _ in range(n)))
+
+    limit = asgi.engine.limit
+    responses = asyncio.run(burst(limit + 20))
+    statuses = [status for status, _, _ in responses]
+    # Requests beyond workers + ASGI_MAX_PENDING are refused, never queued without bound
+    assert statuses.count(200) >= limit and statuses.count(503) > 0, statuses
+    assert set(statuses) <= {200, 503}
+    assert asgi.engine.active == 0
+
+
+if __name__ == "__main__":
+    test_matches_flask()
+    print("✓ ASGI responses match the Flask routes, including streams and errors")
+
+    test_busy_and_concurrency()
+    print("✓ Slow bodies are read on the event loop and overload returns 503")
+    web.quote_store.flush()
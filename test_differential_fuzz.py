@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""Test that the fast quote paths agree with the reference calculator on random inputs."""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+from differential_fuzz import (
+    FIXED_ENGINES,
+    VARIABLE_ENGINES,
+    fixed_quote,
+    fuzz_calculator,
+    random_request,
+    run,
+    synthetic_variable_data,
+)
+from logic import AnnuityCalculator
+from quote_request import parse_quote_request
+
+
+def test_engines_match_reference():
+    mismatches = run(n_requests=200, n_sheets=8, seed=7, include_workbooks=False)
+    assert not mismatches, mismatches[:5]
+
+
+def test_detects_penny_drift():
+    def drifting_quote(calculator, quote_request):
+        products = fixed_quote(calculator, quote_request)
+        for product in products:
+            product["future_value"] = round(product["future_value"] + 0.01, 2)
+        return products
+
+    engines = {"fixed": {"drifting": drifting_quote}, "variable": {}}
+    mismatches = run(n_requests=50, n_sheets=2, seed=1, engines=engines, include_workbooks=False)
+    assert mismatches
+    assert {m.field for m in mismatches} == {"future_value"}
+
+
+def test_detects_dropped_field():
+    def dropping_quote(calculator, quote_request):
+        products = fixed_quote(calculator, quote_request)
+        for product in products:
+            del product["min_rate"]
+        return products
+
+    engines = {"fixed": {"dropping": dropping_quote}, "variable": {}}
+    mismatches = run(n_requests=50, n_sheets=2, seed=1, engines=engines, include_workbooks=False)
+    assert mismatches
+    assert {(m.field, m.actual) for m in mismatches} == {("min_rate", "<missing>")}
+
+
+def test_detects_ignored_state():
+    def unfiltered_quote(calculator, quote_request):
+        return calculator.get_fixed_rates(quote_request.amount)
+
+    engines = {"fixed": {"unfiltered": unfiltered_quote}, "variable": {}}
+    mismatches = run(n_requests=200, n_sheets=8, seed=3, engines=engines, include_workbooks=False)
+    assert mismatches
+    assert all(m.request.get("state") for m in mismatches)
+
+
+def test_variable_sort_order():
+    rng = np.random.default_rng(5)
+    variable = synthetic_variable_data(rng, 30)
+    # Rows laid out against Sort, one product without a Sort number or a carrier
+    variable["Sort"] = np.arange(30, 0, -1, dtype=float)
+    variable.loc[variable.index[10], "Sort"] = np.nan
+    variable.loc[variable.index[3], "Carrier"] = np.nan
+    calculator = AnnuityCalculator.from_frames(None, variable)
+
+    requests = [
+        dict(random_request(rng), annuity_type="variable", current_age=50, withdrawal_age=65)
+        for _ in range(20)
+    ]
+    mismatches = []
+    engines = {"fixed": {}, "variable": VARIABLE_ENGINES}
+    fuzz_calculator(calculator, "reversed", requests, engines, mismatches)
+    assert not mismatches, mismatches[:5]
+
+    quote_request, _ = parse_quote_request(requests[0])
+    sorts = [product["sort"] for product in VARIABLE_ENGINES["quote"](calculator, quote_request)]
+    assert sorts == [n for n in range(1, 31) if n != 20] + [None], sorts
+
+
+if __name__ == "__main__":
+    test_engines_match_reference()
+    print("✓ Fast paths match the reference calculator")
+    test_detects_penny_drift()
+    print("✓ One-cent drift is reported")
+    test_detects_dropped_field()
+    print("✓ Fields missing from a full engine are reported")
+    test_detects_ignored_state()
+    print("✓ An engine that ignores the client's state is reported")
+    test_variable_sort_order()
+    print("✓ Variable products come back in Sort order whatever the sheet order")
+    print(f"  engines: {', '.join('fixed:' + e for e in FIXED_ENGINES)}, "
+          f"{', '.join('variable:' + e for e in VARIABLE_ENGINES)}")
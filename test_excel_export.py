@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""Test xlsx quote exports, in process and through the export pool."""
+
+import sys
+import os
+
+from openpyxl import load_workbook
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import excel_export
+from data_processor import clean_fixed_annuity_data, load_variable_annuity_data
+from excel_export import export_quote
+from logic import AnnuityCalculator
+from quote_request import parse_quote_request
+
+BASE = os.path.dirname(os.path.abspath(__file__))
+FIXED = clean_fixed_annuity_data(os.path.join(BASE, "excel files", "Fixed Annuity Rates.xlsx"))
+VARIABLE = load_variable_annuity_data(os.path.join(BASE, "excel files", "Variable Annuity Rates.xlsx"))
+
+FIXED_BODY = {"amount": 250000, "annuity_type": "fixed", "current_age": 62}
+VARIABLE_BODY = {"amount": 250000, "annuity_type": "variable", "current_age": 55, "withdrawal_age": 67}
+
+
+def read_export(calculator, body):
+    quote_request, errors = parse_quote_request(body)
+    assert errors is None, errors
+    path = export_quote(calculator, quote_request)
+    try:
+        wb = load_workbook(path, read_only=True)
+        return [list(row) for row in wb.worksheets[0].iter_rows(values_only=True)]
+    finally:
+        os.unlink(path)
+
+
+def check_fixed(calculator, rows):
+    assert rows[1][1:3] == ["Current Age", 62]
+    products = calculator.get_fixed_rates(250000.0)
+    assert [row[1:3] for row in rows[9:]] == [[p["company"], p["product"]] for p in products]
+    assert [row[10] for row in rows[9:]] == [p["future_value"] for p in products]
+
+
+def check_variable(calculator, rows):
+    quote_request, _ = parse_quote_request(VARIABLE_BODY)
+    products = calculator.quote(quote_request)["result"]["products"]
+    assert [(row[2], row[18]) for row in rows[11:]] == [
+        (p["carrier"], p["annual_lifetime_income"]) for p in products
+    ]
+
+
+def test_in_process():
+    calculator = AnnuityCalculator.from_frames(FIXED, VARIABLE)
+    check_fixed(calculator, read_export(calculator, FIXED_BODY))
+    check_variable(calculator, read_export(calculator, VARIABLE_BODY))
+
+    # Out-of-range or missing ages are left blank rather than rejected
+    rows = read_export(calculator, dict(FIXED_BODY, current_age=0))
+    assert (rows[1] + [None])[1:3] == ["Current Age", None]
+
+
+def test_pool_serves_every_snapshot():
+    live = AnnuityCalculator.from_frames(FIXED, VARIABLE)
+    repriced_fixed = FIXED.copy()
+    repriced_fixed["Yield to Surrender"] += 0.5
+    repriced_variable = VARIABLE.copy()
+    repriced_variable["Withdrawal Rate"] += 0.005
+    repriced = AnnuityCalculator.from_frames(repriced_fixed, repriced_variable)
+    assert live.snapshot_version != repriced.snapshot_version
+
+    min_rows = excel_export.EXPORT_POOL_MIN_ROWS
+    excel_export.EXPORT_POOL_MIN_ROWS = 0
+    try:
+        pool = excel_export._get_pool()
+        # Alternating snapshots, as as_of exports do, reuse one pool
+        for calculator in (live, repriced, live, repriced):
+            check_fixed(calculator, read_export(calculator, FIXED_BODY))
+            check_variable(calculator, read_export(calculator, VARIABLE_BODY))
+            assert excel_export._get_pool() is pool
+    finally:
+        excel_export.EXPORT_POOL_MIN_ROWS = min_rows
+
+
+if __name__ == "__main__":
+    test_in_process()
+    print("✓ Exports match the quote, with the client's current age")
+
+    test_pool_serves_every_snapshot()
+    print("✓ One export pool serves alternating snapshots")
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""Test that pre-encoded fixed quotes are byte-identical to jsonify."""
+
+import sys
+import os
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("QUOTE_STORE_PATH", os.path.join(tempfile.mkdtemp(), "quotes.db"))
+
+import app as web
+import differential_fuzz
+from logic import AnnuityCalculator
+from quote_request import parse_quote_request
+
+AMOUNTS = differential_fuzz.EDGE_AMOUNTS + [250000, 123456.78]
+
+
+def jsonify_bytes(payload):
+    with web.app.app_context():
+        return web.jsonify(payload).get_data()
+
+
+def test_matches_jsonify():
+    rng = np.random.default_rng(7)
+    calculators = [web.calculator] + [
+        AnnuityCalculator.from_frames(differential_fuzz.synthetic_fixed_data(rng, n), None)
+        for n in (0, 1, 25, 60)
+    ]
+    fixed = calculators[0].fixed_data.copy()
+    fixed["States"] = None
+    fixed.loc[fixed.index[::5], "States"] = "TX"
+    calculators.append(AnnuityCalculator.from_frames(fixed, None))
+
+    for calculator in calculators:
+        for amount in AMOUNTS:
+            for state in (None, "TX", "NY"):
+                products, count = calculator.fixed_quote_json(amount, state)
+                expected = calculator.get_fixed_rates(amount, state)
+                assert count == len(expected)
+                assert jsonify_bytes(expected) == (products + "\n").encode(), (amount, state)
+
+
+def test_calculate_route():
+    client = web.app.test_client()
+    for body in (
+        {"amount": 100000, "annuity_type": "fixed"},
+        {"amount": "525000", "annuity_type": "Fixed Indexed", "state": "TX"},
+    ):
+        response = client.post("/api/calculate", json=body)
+        assert response.status_code == 200 and response.mimetype == "application/json"
+        quote_id = response.get_json()["quote_id"]
+
+        quote_request, _ = parse_quote_request(body)
+        expected = dict(
+            web.calculator.quote(quote_request),
+            quote_id=quote_id,
+            snapshot_version=web.calculator.snapshot_version,
+            sheet_version=web.calculator.sheet_versions()["fixed"],
+        )
+        assert response.data == jsonify_bytes(expected)
+
+        # Saved pre-encoded, read back as the same quote
+        stored = client.get(f"/api/quotes/{quote_id}").get_json()
+        assert stored["result"] == web.calculator.quote(quote_request)
+        web.quote_store.flush()
+        stored = client.get(f"/api/quotes/{quote_id}").get_json()
+        assert stored["result"] == web.calculator.quote(quote_request)
+
+
+def test_fuzzed_against_reference():
+    engines = {"fixed": {"json": differential_fuzz.fixed_json}, "variable": {}}
+    mismatches = differential_fuzz.run(n_requests=300, n_sheets=5, seed=3, engines=engines)
+    assert not mismatches, mismatches[:3]
+
+
+if __name__ == "__main__":
+    test_matches_jsonify()
+    print("✓ Spliced fixed products match jsonify byte for byte")
+
+    test_calculate_route()
+    print("✓ /api/calculate sends and saves pre-encoded fixed quotes")
+
+    test_fuzzed_against_reference()
+    print("✓ Pre-encoded quotes agree with the reference calculator")
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""Test the compiled master workbook against the values Excel last calculated and saved."""
+
+import sys
+import os
+import time
+import tempfile
+
+import numpy as np
+from openpyxl import Workbook, load_workbook
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from formula_engine import CompiledWorkbook, GuaranteedIncomeCalculator, column_index, parse_formula
+
+MASTER = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    "excel files",
+    "Guaranteed Income Calculator 1 26 26.xlsx",
+)
+
+
+def saved_inputs_and_outputs(calculator):
+    # data_only returns the cached results of Excel's last recalculation
+    wb = load_workbook(MASTER, read_only=True, data_only=True)
+    ws = wb[calculator.SHEET]
+    rows = {
+        r: row
+        for r, row in enumerate(ws.iter_rows(min_row=1, max_col=22, values_only=True), 1)
+    }
+    wb.close()
+    inputs = {
+        name: rows[int(cell[1:])][column_index(cell[0]) - 1]
+        for name, cell in calculator.INPUTS.items()
+    }
+    return inputs, rows
+
+
+def test_parser_precedence():
+    assert parse_formula("=-2^2", "S") == ("bin", "^", ("neg", ("num", 2.0)), ("num", 2.0))
+    assert parse_formula("=1+2*3", "S") == (
+        "bin", "+", ("num", 1.0), ("bin", "*", ("num", 2.0), ("num", 3.0))
+    )
+    assert parse_formula("=OR(A1=1,)", "S") == (
+        "call", "OR", [("bin", "=", ("ref", ("S", 1, 1)), ("num", 1.0)), ("empty",)]
+    )
+
+
+def test_matches_saved_workbook(calculator):
+    inputs, rows = saved_inputs_and_outputs(calculator)
+    assert not calculator.engine.errors, calculator.engine.errors
+
+    result = calculator.quote(
+        int(inputs["current_age"]), int(inputs["withdrawal_age"]), inputs["amount"]
+    )
+    checked = 0
+    for product, quoted in zip(calculator.products, result["products"]):
+        for name, column in calculator.OUTPUTS.items():
+            expected = rows[product["row"]][column_index(column) - 1]
+            actual = quoted[name]
+            if isinstance(expected, (int, float)) and not isinstance(expected, bool):
+                assert abs(actual - expected) <= 1e-6 * max(1, abs(expected)), (
+                    product, name, expected, actual
+                )
+            else:
+                assert actual == (expected.strip() if isinstance(expected, str) else expected), (
+                    product, name, expected, actual
+                )
+            checked += 1
+    return checked
+
+
+def test_batch_matches_single(calculator):
+    current_ages = np.array([45, 55, 60, 62, 70])
+    withdrawal_ages = np.array([65, 65, 70, 63, 80])
+    amounts = np.array([100000, 1000000, 525000, 250000, 75000])
+    batch = calculator.quote_many(current_ages, withdrawal_ages, amounts)
+    for i in range(len(amounts)):
+        single = calculator.quote_many(current_ages[i], withdrawal_ages[i], amounts[i])
+        for name in calculator.OUTPUTS:
+            for a, b in zip(batch[name][:, i], single[name][:, 0]):
+                assert a == b or (
+                    isinstance(a, float) and isinstance(b, float) and np.isnan(a) and np.isnan(b)
+                ), (name, i, a, b)
+
+
+def test_exact_lookup_unsorted_keys():
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "S"
+    for row, (key, value) in enumerate([(30, "thirty"), (10, "ten"), (20, "twenty"), (10, "again")], 3):
+        ws.cell(row, 1, key)
+        ws.cell(row, 2, value)
+    ws["C1"] = "=VLOOKUP(A1,A3:B6,2,FALSE)"
+    path = os.path.join(tempfile.mkdtemp(), "lookup.xlsx")
+    wb.save(path)
+
+    engine = CompiledWorkbook(path, {"x": ("S", "A1")}, [("S", "C1")])
+    values = engine.evaluate(x=np.array([10, 20, 30, 40]))[("S", 1, 3)]
+    # Duplicate keys return the first match, as Excel does
+    assert [str(v) for v in values] == ["ten", "twenty", "thirty", "#N/A"], values
+
+
+if __name__ == "__main__":
+    test_parser_precedence()
+    test_exact_lookup_unsorted_keys()
+    print("✓ Exact lookups match unsorted keys")
+
+    started = time.monotonic()
+    calculator = GuaranteedIncomeCalculator(MASTER)
+    print(f"Compiled {len(calculator.products)} products in {time.monotonic() - started:.2f}s")
+
+    checked = test_matches_saved_workbook(calculator)
+    print(f"✓ {checked} output cells match the values saved by Excel")
+    test_batch_matches_single(calculator)
+    print("✓ Batch evaluation matches one-at-a-time evaluation")
+
+    n = 10000
+    rng = np.random.default_rng(0)
+    current_ages = rng.integers(45, 80, n)
+    withdrawal_ages = current_ages + rng.integers(1, 20, n)
+    started = time.monotonic()
+    calculator.quote_many(current_ages, withdrawal_ages, np.full(n, 500000.0))
+    elapsed = time.monotonic() - started
+    print(f"{n:,} quotes x {len(calculator.products)} products in {elapsed:.2f}s "
+          f"({elapsed / n * 1e6:.0f} µs/quote)")
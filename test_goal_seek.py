@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""Test that goal seek amounts reach the target by exactly the smallest whole cent."""
+
+import sys
+import os
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from differential_fuzz import (
+    reference_future_value,
+    reference_variable_products,
+    synthetic_fixed_data,
+    synthetic_variable_data,
+)
+from logic import AnnuityCalculator
+from quote_request import MIN_AMOUNT, parse_goal_seek_request
+
+
+def check_fixed(calculator, target):
+    results = calculator.solve_fixed_amounts(target)
+    assert len(results) == len(calculator.fixed_data)
+    amounts = [r["required_amount"] for r in results]
+    assert amounts == sorted(amounts)
+    for r in results:
+        amount = r["required_amount"]
+        assert reference_future_value(amount, r["yield_to_surrender"]) >= target or r["minimum_applied"], r
+        assert r["future_value"] == reference_future_value(amount, r["yield_to_surrender"])
+        if r["minimum_applied"]:
+            assert amount == MIN_AMOUNT
+        else:
+            assert reference_future_value(round(amount - 0.01, 2), r["yield_to_surrender"]) < target, r
+
+
+def check_variable(calculator, current_age, withdrawal_age, target):
+    results = calculator.solve_variable_amounts(current_age, withdrawal_age, target)
+    assert len(results) == len(calculator.variable_data)
+    reachable = [r for r in results if r["required_amount"] is not None]
+    assert [r["required_amount"] for r in reachable] == sorted(r["required_amount"] for r in reachable)
+    assert all(r["required_amount"] is None for r in results[len(reachable):])
+
+    for r in reachable:
+        amount = r["required_amount"]
+        quoted = reference_variable_products(calculator.variable_data, current_age, withdrawal_age, amount)
+        below = reference_variable_products(
+            calculator.variable_data, current_age, withdrawal_age, round(amount - 0.01, 2)
+        )
+        matches = [
+            (q, b)
+            for q, b in zip(quoted, below)
+            if (q["sort"], q["carrier"], q["rider_name"], q["withdrawal_rate"])
+            == (r["sort"], r["carrier"], r["rider_name"], r["withdrawal_rate"])
+        ]
+        assert matches, r
+        # Duplicated products solve to the same amount; any of them must agree
+        assert any(q["monthly_income"] == r["monthly_income"] >= target for q, _ in matches) or r["minimum_applied"], r
+        if not r["minimum_applied"]:
+            assert any(b["monthly_income"] < target for _, b in matches), r
+
+
+def test_workbooks():
+    excel_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "excel files")
+    calculator = AnnuityCalculator(
+        os.path.join(excel_dir, "Fixed Annuity Rates.xlsx"),
+        os.path.join(excel_dir, "Variable Annuity Rates.xlsx"),
+    )
+    for target in (60000, 1000000, 1234567.89):
+        check_fixed(calculator, target)
+    for target in (100, 3333.33, 5000):
+        check_variable(calculator, 60, 65, target)
+        check_variable(calculator, 45, 90, target)
+
+
+def test_synthetic_sheets():
+    rng = np.random.default_rng(11)
+    for _ in range(10):
+        calculator = AnnuityCalculator.from_frames(
+            synthetic_fixed_data(rng, 40), synthetic_variable_data(rng, 40)
+        )
+        check_fixed(calculator, float(rng.uniform(1e4, 5e6)))
+        check_variable(calculator, 55, 70, round(float(rng.uniform(50, 20000)), 2))
+
+
+def test_request_validation():
+    _, errors = parse_goal_seek_request({"annuity_type": "variable", "current_age": 60})
+    assert "Target Monthly Income is required" in errors
+    assert "Age of First Withdrawal must be at least 59" in errors
+    goal, errors = parse_goal_seek_request({"annuity_type": "Fixed", "target_future_value": "250000"})
+    assert errors is None and goal.target == 250000.0 and goal.product_line == "fixed"
+
+
+def test_unreachable_target():
+    # 0.01% of 1.2e15 dollars: past the cents a float can hold, so it must not hang
+    variable = synthetic_variable_data(np.random.default_rng(0), 3)
+    variable["Withdrawal Rate"] = [0.0001, 0.05, np.nan]
+    variable["Deferral Credit"] = 0.0
+    calculator = AnnuityCalculator.from_frames(None, variable)
+    results = calculator.solve_variable_amounts(60, 61, 1e10)
+    assert all(r["required_amount"] is None and r["monthly_income"] is None for r in results)
+
+    results = calculator.solve_variable_amounts(60, 61, 1e9)
+    reachable = [r for r in results if r["required_amount"] is not None]
+    assert [r["withdrawal_rate"] for r in reachable] == [5.0]
+    check_variable(calculator, 60, 61, 1e9)
+
+
+if __name__ == "__main__":
+    test_request_validation()
+    test_workbooks()
+    print("✓ Goal seek amounts reach the target on the workbooks")
+    test_synthetic_sheets()
+    print("✓ Goal seek amounts reach the target on synthetic sheets")
+    test_unreachable_target()
+    print("✓ Targets needing over MAX_REQUIRED_AMOUNT are unreachable, not a hang")
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""Test memory accounting and the tracemalloc admin surface."""
+
+import sys
+import os
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("QUOTE_STORE_PATH", os.path.join(tempfile.mkdtemp(), "quotes.db"))
+
+from memory_report import AllocationTracer, ReloadLog, calculator_breakdown, deep_sizeof
+from logic import AnnuityCalculator
+from data_processor import clean_fixed_annuity_data, load_variable_annuity_data
+
+BASE = os.path.dirname(os.path.abspath(__file__))
+FIXED = os.path.join(BASE, "excel files", "Fixed Annuity Rates.xlsx")
+VARIABLE = os.path.join(BASE, "excel files", "Variable Annuity Rates.xlsx")
+
+
+def test_deep_sizeof():
+    array = np.zeros(100000)
+    assert deep_sizeof(array) >= array.nbytes
+    # Views and repeated references add nothing for the shared buffer
+    assert deep_sizeof([array, array, array[:10]]) < 2 * array.nbytes
+    assert deep_sizeof({"a": ["x" * 1000]}) > 1000
+
+
+def test_calculator_breakdown():
+    calculator = AnnuityCalculator.from_frames(
+        clean_fixed_annuity_data(FIXED), load_variable_annuity_data(VARIABLE)
+    )
+    cold = calculator_breakdown(calculator)
+    assert cold["parts"]["fixed_columns"] is None and cold["parts"]["fixed_data"] > 0
+    warm = calculator_breakdown(calculator.warm())
+    assert all(size is not None for size in warm["parts"].values()), warm
+    assert warm["total_bytes"] > cold["total_bytes"]
+
+
+def test_reload_log():
+    log = ReloadLog(keep=3)
+    for version in "abcde":
+        log.record(version)
+    assert [entry["snapshot_version"] for entry in log.entries] == ["c", "d", "e"]
+    assert log.entries[-1]["pid"] == os.getpid()
+
+
+def test_tracer_diff():
+    tracer = AllocationTracer(keep=2)
+    tracer.start()
+    try:
+        tracer.take("before")
+        retained = [bytearray(1024) for _ in range(2000)]
+        tracer.take("after")
+        grown = tracer.diff("before", "after", limit=1)[0]
+        assert os.path.basename(__file__) in grown["location"], grown
+        assert grown["size_diff_bytes"] >= 2000 * 1024
+        tracer.take("third")
+        assert tracer.status()["snapshots"] == ["after", "third"]
+    finally:
+        tracer.stop()
+    assert not tracer.status()["tracing"]
+    del retained
+
+
+def test_admin_routes():
+    import app as web
+
+    client = web.app.test_client()
+    token, web.ADMIN_TOKEN = web.ADMIN_TOKEN, ""
+    try:
+        assert client.get("/admin/memory").status_code == 404  # disabled without a token
+        web.ADMIN_TOKEN = "test-token"
+        assert client.get("/admin/memory").status_code == 401
+        headers = {"Authorization": "Bearer test-token"}
+        report = client.get("/admin/memory?quotes=1", headers=headers).get_json()
+        assert report["process"]["pid"] == os.getpid()
+        assert report["snapshot"]["snapshot_version"] == web.calculator.snapshot_version
+        assert report["quote_payload_bytes"]["fixed"] > 0
+        assert report["reloads"]
+
+        response = client.post(
+            "/admin/memory/tracemalloc", json={"action": "snapshot"}, headers=headers
+        )
+        assert response.status_code == 400  # not tracing yet
+        for body in (
+            {"action": "start"},
+            {"action": "snapshot", "label": "a"},
+            {"action": "snapshot", "label": "b"},
+        ):
+            client.post("/admin/memory/tracemalloc", json=body, headers=headers)
+        diff = client.get(
+            "/admin/memory/tracemalloc?from=a&to=b&limit=5", headers=headers
+        ).get_json()
+        assert len(diff["diff"]) <= 5
+        assert client.get("/admin/memory/tracemalloc?snapshot=zz", headers=headers).status_code == 404
+        client.post("/admin/memory/tracemalloc", json={"action": "stop"}, headers=headers)
+    finally:
+        web.ADMIN_TOKEN = token
+
+
+if __name__ == "__main__":
+    test_deep_sizeof()
+    print("✓ deep_sizeof counts buffers once")
+
+    test_calculator_breakdown()
+    print("✓ Snapshot breakdown reports each sheet and cache")
+
+    test_reload_log()
+    print("✓ RSS is kept for the most recent reloads")
+
+    test_tracer_diff()
+    print("✓ tracemalloc diffs point at the line that allocated")
+
+    test_admin_routes()
+    print("✓ Admin memory routes require ADMIN_TOKEN")
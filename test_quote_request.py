@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""Test that single-pass request parsing returns the same errors as the old validate_input."""
+
+import sys
+import os
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from quote_request import QuoteRequest, parse_quote_request
+
+
+def legacy_validate_input(data):
+    # Verbatim copy of AnnuityCalculator.validate_input before the request model
+    errors = []
+
+    required_fields = ["amount", "annuity_type"]
+    for field in required_fields:
+        if not data.get(field):
+            errors.append(f"{field.replace('_', ' ').title()} is required")
+
+    try:
+        amount = float(data.get("amount", 0))
+        if amount < 50000:
+            errors.append("Amount must be at least $50,000")
+    except:
+        errors.append("Amount must be a valid number")
+
+    annuity_type = data.get("annuity_type", "").lower()
+    if annuity_type == "variable":
+        try:
+            current_age = int(data.get("current_age", 0))
+            if current_age < 18 or current_age > 100:
+                errors.append("Current Age must be between 18 and 100")
+        except:
+            errors.append("Current Age is required for Variable annuities")
+
+        try:
+            withdrawal_age = int(data.get("withdrawal_age", 0))
+            if withdrawal_age < 59:
+                errors.append("Age of First Withdrawal must be at least 59")
+            if withdrawal_age > 100:
+                errors.append("Age of First Withdrawal must be 100 or less")
+        except:
+            errors.append("Age of First Withdrawal is required for Variable annuities")
+
+        try:
+            current_age = int(data.get("current_age", 0))
+            withdrawal_age = int(data.get("withdrawal_age", 0))
+            if withdrawal_age <= current_age:
+                errors.append("Age of First Withdrawal must be greater than Current Age")
+        except:
+            pass
+
+    return errors if errors else None
+
+
+CASES = [
+    {},
+    {"amount": 100000, "annuity_type": "fixed"},
+    {"amount": "100000", "annuity_type": "Fixed Indexed"},
+    {"amount": 49999.99, "annuity_type": "fixed"},
+    {"amount": "abc", "annuity_type": "fixed"},
+    {"amount": None, "annuity_type": "variable"},
+    {"amount": [1], "annuity_type": "variable", "current_age": 60},
+    {"amount": 1e400, "annuity_type": "variable", "current_age": 60, "withdrawal_age": 65},
+    {"amount": 0, "annuity_type": ""},
+    {"amount": 525000, "annuity_type": "variable", "current_age": 60, "withdrawal_age": 65},
+    {"amount": 525000, "annuity_type": "VARIABLE", "current_age": "60", "withdrawal_age": "65"},
+    {"amount": 525000, "annuity_type": "variable", "current_age": 17, "withdrawal_age": 101},
+    {"amount": 525000, "annuity_type": "variable", "current_age": 70, "withdrawal_age": 65},
+    {"amount": 525000, "annuity_type": "variable", "current_age": 65, "withdrawal_age": 65},
+    {"amount": 525000, "annuity_type": "variable", "current_age": "x", "withdrawal_age": 65},
+    {"amount": 525000, "annuity_type": "variable", "current_age": 60, "withdrawal_age": None},
+    {"amount": 525000, "annuity_type": "variable", "current_age": 60.9, "withdrawal_age": 64.5},
+    {"amount": 525000, "annuity_type": "variable", "current_age": 1e400},
+    {"amount": 525000, "annuity_type": "variable"},
+    {"amount": 525000, "annuity_type": "annuity"},
+]
+
+
+def test_errors_match_legacy():
+    for case in CASES:
+        _, errors = parse_quote_request(case)
+        assert errors == legacy_validate_input(case), case
+
+
+def test_immediate_errors():
+    # Immediate annuities were quoted as fixed before and never checked these fields
+    _, errors = parse_quote_request(
+        {"amount": 525000, "annuity_type": "immediate", "current_age": "bad"}
+    )
+    assert errors == [
+        "Current Age is required for Immediate annuities",
+        "Sex is required for Immediate annuities",
+    ], errors
+
+    _, errors = parse_quote_request(
+        {
+            "amount": 525000,
+            "annuity_type": "immediate",
+            "current_age": 95,
+            "sex": "x",
+            "payout_option": "joint",
+        }
+    )
+    assert errors == [
+        "Current Age must be between 40 and 90 for Immediate annuities",
+        "Sex must be male or female",
+        "Payout Option must be one of: life, life_10, life_20, period_10, period_20",
+    ], errors
+
+
+def test_parsed_values():
+    quote_request, errors = parse_quote_request(
+        {"amount": "525000", "annuity_type": "Variable", "current_age": "60", "withdrawal_age": 65}
+    )
+    assert errors is None
+    assert quote_request == QuoteRequest("variable", 525000.0, 60, 65)
+    assert quote_request.product_line == "variable"
+
+    quote_request, _ = parse_quote_request(
+        {"amount": 100000, "annuity_type": "Immediate", "current_age": "65", "sex": "Female"}
+    )
+    assert quote_request.product_line == "immediate"
+    assert (quote_request.current_age, quote_request.sex, quote_request.payout_option) == (
+        65, "female", "life"
+    )
+
+    quote_request, _ = parse_quote_request({"amount": 100000, "annuity_type": "annuity"})
+    assert quote_request.product_line is None
+
+
+if __name__ == "__main__":
+    test_errors_match_legacy()
+    test_immediate_errors()
+    test_parsed_values()
+    print("✓ Request parsing matches legacy validation")
+
+    body = {"amount": 525000, "annuity_type": "variable", "current_age": 60, "withdrawal_age": 65}
+    n = 100000
+
+    def legacy_request(data):
+        # validate_input followed by the re-parse calculate() used to do
+        legacy_validate_input(data)
+        data.get("annuity_type", "").lower()
+        float(data.get("amount", 0))
+        int(data.get("current_age", 0))
+        int(data.get("withdrawal_age", 0))
+
+    legacy = timeit.timeit(lambda: legacy_request(body), number=n)
+    single = timeit.timeit(lambda: parse_quote_request(body), number=n)
+    print(f"legacy validate + re-parse: {legacy / n * 1e6:.2f} µs/request")
+    print(f"parse_quote_request:        {single / n * 1e6:.2f} µs/request")
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""Test the SQLite quote store and its background batch writer."""
+
+import sys
+import os
+import time
+import sqlite3
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import quote_store
+from quote_store import QuoteStore
+
+
+def test_round_trip(path):
+    store = QuoteStore(path)
+    result = {"type": "fixed", "results": [{"sort": 1, "future_value": 155229.03}], "count": 1}
+    request = {"annuity_type": "fixed", "amount": 100000.0, "as_of": "2026-02-10"}
+
+    quote_id = store.record("calculate", request, result, "22fec8ebfd8b")
+    # Readable straight away, before the writer has committed it
+    in_memory = store.get(quote_id)
+    assert in_memory["result"] == result and in_memory["request"] == request
+
+    assert store.flush()
+    on_disk = QuoteStore(path).get(quote_id)
+    assert on_disk == in_memory, (on_disk, in_memory)
+    assert on_disk["snapshot_version"] == "22fec8ebfd8b"
+    assert store.get("missing") is None
+
+
+def test_batched_writes(path):
+    store = QuoteStore(path)
+    started = time.monotonic()
+    ids = [
+        store.record("calculate", {"amount": 50000.0 + i}, {"count": i}, "v1")
+        for i in range(2000)
+    ]
+    queued = time.monotonic() - started
+    assert store.flush(timeout=30)
+
+    connection = sqlite3.connect(path)
+    assert connection.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    stored = dict(connection.execute("SELECT id, result FROM quotes").fetchall())
+    assert all(quote_id in stored for quote_id in ids)
+    return queued
+
+
+def test_full_queue_drops(path):
+    size = quote_store.QUOTE_QUEUE_SIZE
+    quote_store.QUOTE_QUEUE_SIZE = 1
+    try:
+        store = QuoteStore(path)
+        ids = [store.record("calculate", {}, {"count": i}, "v1") for i in range(500)]
+    finally:
+        quote_store.QUOTE_QUEUE_SIZE = size
+    # Requests are never blocked; quotes past the limit get no id
+    assert None in ids
+    assert store.flush()
+    for quote_id in filter(None, ids):
+        assert store.get(quote_id) is not None
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "quotes.db")
+
+        test_round_trip(path)
+        print("✓ Quotes are served from memory until written, then from SQLite")
+
+        queued = test_batched_writes(path)
+        print(f"✓ 2,000 quotes queued in {queued * 1000:.1f} ms and written in batches")
+
+        test_full_queue_drops(path)
+        print("✓ A full write queue drops quotes instead of blocking")
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""Test that reloads patched from a rate-sheet diff match a calculator built from scratch."""
+
+import sys
+import os
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from logic import AnnuityCalculator
+from quote_request import parse_quote_request
+from rate_diff import diff_sheet
+from data_processor import clean_fixed_annuity_data, load_variable_annuity_data
+
+BASE = os.path.dirname(os.path.abspath(__file__))
+FIXED = clean_fixed_annuity_data(os.path.join(BASE, "excel files", "Fixed Annuity Rates.xlsx"))
+VARIABLE = load_variable_annuity_data(os.path.join(BASE, "excel files", "Variable Annuity Rates.xlsx"))
+
+QUERIES = ["athene", "flexchoise", "performance spda", "lincoln"]
+
+
+def with_states(fixed):
+    fixed = fixed.copy()
+    fixed["States"] = None
+    fixed.loc[fixed.index[::7], "States"] = "TX,FL"
+    fixed.loc[fixed.index[3::11], "States"] = "NY"
+    return fixed
+
+
+def edited_fixed(fixed):
+    """One rate raised past the top of the table, one product dropped, one added, one state changed."""
+    fixed = fixed.copy()
+    fixed.loc[fixed.index[40], "Base Rate"] = 9.5
+    fixed.loc[fixed.index[14], "States"] = "CA"
+    new = fixed.iloc[[5]].copy()
+    new["Product"] = "Brand New Flexible Premium"
+    new["Sort"] = 999
+    return pd.concat([fixed.drop(fixed.index[10]), new], ignore_index=True)
+
+
+def assert_same_caches(patched, fresh):
+    for line in ("fixed", "variable"):
+        quote_request, _ = parse_quote_request(
+            {"amount": 150000, "annuity_type": line, "current_age": 55, "withdrawal_age": 67, "state": "TX"}
+        )
+        assert patched.quote(quote_request) == fresh.quote(quote_request), line
+        for query in QUERIES:
+            assert patched.search_products(quote_request, query) == fresh.search_products(
+                quote_request, query
+            ), (line, query)
+        index, records = patched.search_index(line)
+        fresh_index, fresh_records = fresh.search_index(line)
+        assert records == fresh_records
+        assert index.words.tolist() == fresh_index.words.tolist()
+        assert sorted(index.postings) == sorted(fresh_index.postings)
+        for gram, positions in fresh_index.postings.items():
+            assert sorted(index.postings[gram].tolist()) == positions.tolist(), gram
+
+    assert patched.fixed_json_templates() == fresh.fixed_json_templates()
+    bits, fresh_bits = patched.fixed_state_bits(), fresh.fixed_state_bits()
+    assert np.array_equal(bits["all"], fresh_bits["all"])
+    assert np.array_equal(bits["open"], fresh_bits["open"])
+    assert sorted(bits["states"]) == sorted(fresh_bits["states"])
+    for code, mask in fresh_bits["states"].items():
+        assert np.array_equal(bits["states"][code], mask), code
+
+
+def test_diff_sheet():
+    variable = VARIABLE.copy()
+    variable.loc[variable.index[3], "Withdrawal Rate"] += 0.001
+    changes = diff_sheet("variable", VARIABLE, variable)
+    assert changes.summary() == {"added": 0, "changed": 1, "removed": 0}
+    assert np.flatnonzero(changes.dirty).tolist() == [3]
+    assert not diff_sheet("variable", VARIABLE, VARIABLE.copy())
+
+    reversed_sheet = diff_sheet("variable", VARIABLE, VARIABLE.iloc[::-1])
+    assert reversed_sheet and reversed_sheet.reordered
+    assert reversed_sheet.summary() == {"added": 0, "changed": 0, "removed": 0}
+
+    fixed = with_states(FIXED)
+    changes = diff_sheet("fixed", fixed, edited_fixed(fixed))
+    assert changes.summary() == {"added": 1, "changed": 2, "removed": 1}
+
+
+def test_patched_matches_rebuild():
+    fixed = with_states(FIXED)
+    live = AnnuityCalculator.from_frames(fixed, VARIABLE).warm()
+    variable = VARIABLE.copy()
+    variable.loc[variable.index[0], "Deferral Credit"] = 0.09
+    new_fixed = edited_fixed(fixed)
+
+    patched = live.updated(new_fixed, variable)
+    fresh = AnnuityCalculator.from_frames(new_fixed, variable).warm()
+    assert patched.snapshot_version == fresh.snapshot_version
+    assert patched.changes["fixed"].summary() == {"added": 1, "changed": 2, "removed": 1}
+    assert_same_caches(patched, fresh)
+
+
+def test_unchanged_sheet_keeps_caches():
+    live = AnnuityCalculator.from_frames(FIXED, VARIABLE).warm()
+    variable = VARIABLE.copy()
+    variable.loc[variable.index[5], "Withdrawal Rate"] = 0.07
+
+    patched = live.updated(FIXED.copy(), variable)
+    assert not patched.changes["fixed"]
+    assert patched.fixed_columns() is live.fixed_columns()
+    assert patched.search_index("fixed") is live.search_index("fixed")
+    assert patched.variable_columns() is not live.variable_columns()
+
+    # Cached fixed quotes survive a variable-only update; variable ones do not
+    before, after = live.sheet_versions(), patched.sheet_versions()
+    assert before["fixed"] == after["fixed"] and before["immediate"] == after["immediate"]
+    assert before["variable"] != after["variable"]
+    assert_same_caches(patched, AnnuityCalculator.from_frames(FIXED, variable).warm())
+
+
+def test_reordered_sheet_is_adopted():
+    fixed = with_states(FIXED)
+    live = AnnuityCalculator.from_frames(fixed, VARIABLE).warm()
+    for new_fixed, new_variable in (
+        (fixed.copy(), VARIABLE.iloc[::-1].reset_index(drop=True)),
+        (fixed.iloc[::-1].reset_index(drop=True), VARIABLE.copy()),
+    ):
+        patched = live.updated(new_fixed, new_variable)
+        fresh = AnnuityCalculator.from_frames(new_fixed, new_variable).warm()
+        assert patched.snapshot_version == fresh.snapshot_version
+        assert patched.sheet_versions() == fresh.sheet_versions()
+        assert patched.fixed_data.equals(new_fixed) and patched.variable_data.equals(new_variable)
+        assert_same_caches(patched, fresh)
+
+
+if __name__ == "__main__":
+    test_diff_sheet()
+    print("✓ Sheets are diffed by product identity")
+
+    test_patched_matches_rebuild()
+    print("✓ Patched caches match a calculator built from scratch")
+
+    test_unchanged_sheet_keeps_caches()
+    print("✓ An unchanged sheet keeps its caches and sheet version")
+
+    test_reordered_sheet_is_adopted()
+    print("✓ A sheet whose rows only moved is adopted in its new order")
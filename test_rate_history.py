@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""Test dated rate versions, as_of lookup and row sharing between versions."""
+
+import sys
+import os
+import tempfile
+from datetime import date
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("QUOTE_STORE_PATH", os.path.join(tempfile.mkdtemp(), "quotes.db"))
+
+import app as web
+from data_processor import clean_fixed_annuity_data, load_variable_annuity_data
+from logic import AnnuityCalculator
+from quote_request import QuoteRequest, parse_goal_seek_request, parse_quote_request
+from rate_history import RateHistory, RowPool, parse_effective_date
+
+BASE = os.path.dirname(os.path.abspath(__file__))
+FIXED = os.path.join(BASE, "excel files", "Fixed Annuity Rates.xlsx")
+VARIABLE = os.path.join(BASE, "excel files", "Variable Annuity Rates.xlsx")
+
+
+def test_round_trip(fixed, variable):
+    pool = RowPool()
+    for frame in (fixed, variable):
+        rebuilt = pool.frame(pool.intern(frame))
+        pd.testing.assert_frame_equal(rebuilt, frame)
+        assert rebuilt.attrs == frame.attrs
+    assert pool.frame(pool.intern(None)) is None
+
+
+def test_versions_share_rows(fixed, variable):
+    history = RateHistory()
+    history.add(date(2026, 1, 5), fixed, variable)
+    unique_rows = len(history.pool)
+
+    # A month later one fixed product changed its base rate
+    repriced = fixed.copy()
+    repriced.loc[3, "Base Rate"] += 0.25
+    history.add(date(2026, 2, 5), repriced, variable)
+    assert len(history.pool) == unique_rows + 1
+
+    # Identical rates on a new date cost no rows at all
+    history.add(date(2026, 3, 5), repriced, variable)
+    assert len(history.pool) == unique_rows + 1
+    return history, repriced
+
+
+def test_as_of_lookup(history, fixed, repriced):
+    assert history.version_at(date(2026, 1, 4)) is None
+    assert history.calculator_at(date(2025, 12, 31)) == (None, None)
+    assert history.version_at(date(2026, 1, 5)).effective_date == date(2026, 1, 5)
+    assert history.version_at(date(2026, 2, 4)).effective_date == date(2026, 1, 5)
+    assert history.version_at(date(2026, 2, 5)).effective_date == date(2026, 2, 5)
+    assert history.version_at(date(2030, 1, 1)).effective_date == date(2026, 3, 5)
+
+    request = QuoteRequest("fixed", 250000.0)
+    january, _ = history.calculator_at(date(2026, 1, 20))
+    february, _ = history.calculator_at(date(2026, 2, 20))
+    assert january.quote(request) == AnnuityCalculator.from_frames(fixed, None).quote(request)
+    assert february.quote(request) == AnnuityCalculator.from_frames(repriced, None).quote(request)
+    assert january.quote(request) != february.quote(request)
+
+
+def test_goal_seek_as_of(fixed, variable):
+    # Goal seek solves on Yield to Surrender, so reprice that
+    history = RateHistory()
+    history.add(date(2026, 1, 5), fixed, variable)
+    repriced = fixed.copy()
+    repriced["Yield to Surrender"] += 0.25
+    history.add(date(2026, 2, 5), repriced, variable)
+
+    client = web.app.test_client()
+    live_history, web.rate_history = web.rate_history, history
+    try:
+        for as_of in ("2026-01-20", "2026-02-20"):
+            body = {"annuity_type": "fixed", "target_future_value": 400000, "as_of": as_of}
+            response = client.post("/api/goal-seek", json=body)
+            assert response.status_code == 200, response.get_json()
+
+            goal_request, _ = parse_goal_seek_request(body)
+            rates, _ = history.calculator_at(goal_request.as_of)
+            assert response.get_json() == rates.goal_seek(goal_request)
+        # Higher yields need less in February than in January
+        january, february = (
+            client.post("/api/goal-seek", json=dict(body, as_of=as_of)).get_json()
+            for as_of in ("2026-01-20", "2026-02-20")
+        )
+        assert january != february
+
+        response = client.post("/api/goal-seek", json=dict(body, as_of="2025-12-31"))
+        assert response.status_code == 404
+    finally:
+        web.rate_history = live_history
+
+
+def test_live_calculator_is_reused(fixed, variable):
+    live = AnnuityCalculator.from_frames(fixed, variable)
+    history = RateHistory()
+    history.add(date(2026, 1, 5), fixed.iloc[:10].copy(), variable)
+    history.add_live(date(2026, 2, 10), live)
+    assert history.calculator_at(date(2026, 3, 1))[0] is live
+    assert history.calculator_at(date(2026, 1, 31))[0] is not live
+
+
+def test_parsing():
+    assert parse_effective_date("20260210 feedback") == date(2026, 2, 10)
+    assert parse_effective_date("2026-03-01 rates") == date(2026, 3, 1)
+    assert parse_effective_date("excel files") is None
+
+    quote_request, _ = parse_quote_request(
+        {"annuity_type": "fixed", "amount": 100000, "as_of": "2026-02-10"}
+    )
+    assert quote_request.as_of == date(2026, 2, 10)
+    _, errors = parse_quote_request({"annuity_type": "fixed", "amount": 100000, "as_of": "Feb 10"})
+    assert errors == ["As Of must be a date in YYYY-MM-DD format"]
+
+
+if __name__ == "__main__":
+    fixed = clean_fixed_annuity_data(FIXED)
+    variable = load_variable_annuity_data(VARIABLE)
+
+    test_round_trip(fixed, variable)
+    print("✓ Interned sheets rebuild to identical DataFrames")
+
+    history, repriced = test_versions_share_rows(fixed, variable)
+    print("✓ Versions store only rows that changed")
+
+    test_as_of_lookup(history, fixed, repriced)
+    print("✓ as_of resolves to the newest version effective on or before it")
+
+    test_goal_seek_as_of(fixed, variable)
+    print("✓ Goal seek solves with the rates in force on as_of")
+
+    test_live_calculator_is_reused(fixed, variable)
+    print("✓ Lookups landing on the live version reuse the live calculator")
+
+    test_parsing()
+    print("✓ Archive names and as_of are parsed")
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""Test the typeahead product search index."""
+
+import sys
+import os
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from logic import AnnuityCalculator
+from quote_request import QuoteRequest
+from search_index import ProductSearchIndex, normalize, parse_search_options
+
+BASE = os.path.dirname(os.path.abspath(__file__))
+FIXED = os.path.join(BASE, "excel files", "Fixed Annuity Rates.xlsx")
+VARIABLE = os.path.join(BASE, "excel files", "Variable Annuity Rates.xlsx")
+
+
+def test_ranking():
+    index = ProductSearchIndex(
+        [
+            ["Brighthouse", "FlexChoice Access - Level"],
+            ["Corebridge", "Lifetime Income Max"],
+            ["Brighthouse", "Shield Level Select"],
+            ["Lincoln", "ProtectedPay Secure Core"],
+        ],
+        [4.0, 3.0, 2.0, 1.0],
+    )
+    # Name prefix beats word prefix; ties in Sort order
+    assert index.search(normalize("core")) == [1, 3]
+    assert index.search(normalize("Level")) == [2, 0]
+    assert index.search(normalize("shield level")) == [2]
+    assert index.search(normalize("brighthouse")) == [2, 0]
+    # Misspelled and mid-word queries fall back to trigrams
+    assert index.search(normalize("flexchoise")) == [0]
+    assert index.search(normalize("choice")) == [0]
+    assert index.search(normalize("zzz")) == []
+    assert index.search(normalize("brighthouse"), allowed=[0, 1]) == [0]
+    assert index.search(normalize("brighthouse"), limit=1) == [2]
+
+
+def test_quotes_match_full_results(calculator):
+    request = QuoteRequest("variable", 250000.0, 55, 67)
+    quoted = calculator.get_variable_income(55, 67, 250000.0)["products"]
+    for product in quoted:
+        matches = calculator.search_products(
+            request, normalize(f"{product['carrier']} {product['rider_name']}"), 50
+        )
+        assert product in matches, product
+
+    request = QuoteRequest("fixed", 250000.0)
+    quoted = calculator.get_fixed_rates(250000.0)
+    for product in quoted:
+        matches = calculator.search_products(request, normalize(product["product"]), 50)
+        assert product in matches, product
+
+
+def test_options():
+    assert parse_search_options({"q": "  Flex-Choice "}) == (
+        {"query": "flex choice", "limit": 10}, None
+    )
+    assert parse_search_options({"q": "", "limit": "x"})[1] == [
+        "Search query (q) is required",
+        "Limit must be a whole number",
+    ]
+
+
+if __name__ == "__main__":
+    test_ranking()
+    print("✓ Matches are ranked name prefix, word prefix, then trigram")
+    test_options()
+    print("✓ Query and limit are validated")
+
+    calculator = AnnuityCalculator(FIXED, VARIABLE)
+    test_quotes_match_full_results(calculator)
+    print("✓ Every product is found by name with the same quote as the full results")
+
+    request = QuoteRequest("fixed", 250000.0)
+    calculator.search_index("fixed")
+    started = time.monotonic()
+    for _ in range(1000):
+        calculator.search_products(request, "athene myg", 10)
+    print(f"Fixed search: {(time.monotonic() - started) * 1000:.0f} µs/query")
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""Test the Monte Carlo account value projection for variable annuities."""
+
+import sys
+import os
+import time
+import threading
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import simulation
+from data_processor import load_variable_annuity_data
+from logic import AnnuityCalculator
+from quote_request import parse_quote_request
+from simulation import PATHS_PER_TASK, SimulationTimeout, run_simulation
+
+BASE = os.path.dirname(os.path.abspath(__file__))
+VARIABLE = load_variable_annuity_data(os.path.join(BASE, "excel files", "Variable Annuity Rates.xlsx"))
+SEED = 20260126
+
+
+def simulate(variable, **options):
+    return run_simulation(variable, 250000.0, 55, 67, seed=SEED, **options)
+
+
+def test_fixed_seed():
+    first = simulate(VARIABLE, paths=2000)
+    assert first == simulate(VARIABLE, paths=2000)
+    assert first["seed"] == SEED and first["count"] == len(VARIABLE)
+
+    # Guarantees are the quote's, in the quote's order
+    quote_request, _ = parse_quote_request(
+        {"annuity_type": "variable", "amount": 250000, "current_age": 55, "withdrawal_age": 67}
+    )
+    quoted = AnnuityCalculator.from_frames(None, VARIABLE).quote(quote_request)["result"]["products"]
+    for product, quote in zip(first["products"], quoted):
+        assert (product["sort"], product["carrier"]) == (quote["sort"], quote["carrier"])
+        assert product["guaranteed_benefit_base"] == quote["benefit_base"]
+        assert product["guaranteed_annual_income"] == quote["annual_lifetime_income"]
+
+        bands = product["account_value_bands"]
+        assert [band["age"] for band in bands] == list(range(55, 68))
+        assert bands[0]["p50"] == 250000.0
+        for band in bands:
+            assert band["p5"] <= band["p25"] <= band["p50"] <= band["p75"] <= band["p95"]
+        assert 0 <= product["probability_account_exceeds_benefit_base"] <= 1
+
+
+def test_pool_matches_serial():
+    paths = PATHS_PER_TASK * 2 + 500
+    workers = simulation.SIMULATION_WORKERS
+    try:
+        simulation.SIMULATION_WORKERS = 1
+        serial = simulate(VARIABLE, paths=paths)
+        simulation.SIMULATION_WORKERS = 2
+        pooled = simulate(VARIABLE, paths=paths)
+    finally:
+        simulation.SIMULATION_WORKERS = workers
+    assert serial == pooled
+
+
+def test_missing_sort_and_carrier():
+    variable = VARIABLE.copy()
+    variable.loc[variable.index[0], "Sort"] = np.nan
+    variable.loc[variable.index[1], "Carrier"] = np.nan
+    products = simulate(variable, paths=500)["products"]
+    assert products[-1]["sort"] is None
+    assert "" in [product["carrier"] for product in products]
+
+
+def test_time_budget():
+    # Checked every simulated year, not just between chunks
+    try:
+        simulation.simulate_growth_paths(
+            np.random.SeedSequence(SEED), 10, 5, 0.06, 0.15, time.monotonic() - 1, 1
+        )
+    except SimulationTimeout:
+        pass
+    else:
+        raise AssertionError("no timeout inside a chunk")
+
+    saved = simulation.SIMULATION_WORKERS
+    for workers in (1, 2):
+        simulation.SIMULATION_WORKERS = workers
+        try:
+            simulate(VARIABLE, paths=PATHS_PER_TASK * 3, time_budget=0)
+        except SimulationTimeout:
+            pass
+        else:
+            raise AssertionError(f"no timeout with {workers} worker(s)")
+        finally:
+            simulation.SIMULATION_WORKERS = saved
+
+
+def test_one_executor_per_process():
+    simulation._executor = simulation._executor_pid = None
+    executors = []
+    threads = [
+        threading.Thread(target=lambda: executors.append(simulation._get_executor()))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len({id(executor) for executor in executors}) == 1
+    assert simulation._executor_pid == os.getpid()
+
+
+if __name__ == "__main__":
+    test_fixed_seed()
+    print("✓ A fixed seed gives the same projection, with the quote's guarantees")
+
+    test_pool_matches_serial()
+    print("✓ The process pool draws the same paths as a single process")
+
+    test_missing_sort_and_carrier()
+    print("✓ Products without a Sort number or carrier are simulated")
+
+    test_time_budget()
+    print("✓ Simulations past their time budget raise SimulationTimeout")
+
+    test_one_executor_per_process()
+    print("✓ Concurrent requests share one executor per process")
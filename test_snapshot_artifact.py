@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""Test signed rate snapshot publishing and polling."""
+
+import sys
+import os
+import json
+import tempfile
+from datetime import date
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from data_processor import clean_fixed_annuity_data, load_variable_annuity_data
+from snapshot_artifact import (
+    LATEST,
+    SnapshotError,
+    SnapshotSubscriber,
+    _write_atomic,
+    decode_snapshot,
+    encode_snapshot,
+    iter_published,
+    publish,
+)
+
+BASE = os.path.dirname(os.path.abspath(__file__))
+FIXED = os.path.join(BASE, "excel files", "Fixed Annuity Rates.xlsx")
+VARIABLE = os.path.join(BASE, "excel files", "Variable Annuity Rates.xlsx")
+KEY = "test-signing-key"
+
+
+def test_round_trip_and_signature(fixed, variable):
+    artifact, manifest = encode_snapshot(fixed, variable, date(2026, 2, 10), KEY)
+    decoded_fixed, decoded_variable, decoded = decode_snapshot(artifact, KEY)
+    pd.testing.assert_frame_equal(decoded_fixed, fixed)
+    pd.testing.assert_frame_equal(decoded_variable, variable)
+    assert decoded_variable.attrs == variable.attrs
+    assert decoded["version"] == manifest["version"]
+
+    tampered = artifact[:-1] + bytes([artifact[-1] ^ 1])
+    for bad, key in ((tampered, KEY), (artifact, "other-key"), (b"not a snapshot", KEY)):
+        try:
+            decode_snapshot(bad, key)
+        except SnapshotError:
+            continue
+        raise AssertionError("unsigned or tampered snapshot was accepted")
+
+
+def test_publish_and_poll(store, fixed, variable):
+    applied = []
+    subscriber = SnapshotSubscriber(
+        store, KEY, lambda f, v, manifest: applied.append(manifest["version"])
+    )
+    assert not subscriber.poll()  # nothing published yet
+
+    first = publish(store, FIXED, VARIABLE, KEY, date(2026, 2, 10))
+    assert publish(store, FIXED, VARIABLE, KEY) == first  # same rates: no new version
+    assert subscriber.poll() and not subscriber.poll()
+    assert applied == [first["version"]]
+
+    # A publish that fails verification is retried on every poll until fixed
+    repriced = fixed.copy()
+    repriced["Base Rate"] += 0.1
+    artifact, manifest = encode_snapshot(repriced, variable, date(2026, 3, 1), KEY)
+    _write_atomic(os.path.join(store, manifest["file"]), artifact[:-1])
+    _write_atomic(os.path.join(store, LATEST), json.dumps(manifest).encode())
+    for _ in range(2):
+        try:
+            subscriber.poll()
+            raise AssertionError("corrupt snapshot was applied")
+        except SnapshotError:
+            pass
+    _write_atomic(os.path.join(store, manifest["file"]), artifact)
+    assert subscriber.poll()
+    assert applied == [first["version"], manifest["version"]]
+
+    history = [m["effective_date"] for _, _, m in iter_published(store, KEY)]
+    assert history == ["2026-02-10", "2026-03-01"], history
+
+
+if __name__ == "__main__":
+    fixed = clean_fixed_annuity_data(FIXED)
+    variable = load_variable_annuity_data(VARIABLE)
+
+    test_round_trip_and_signature(fixed, variable)
+    print("✓ Snapshots round-trip and unsigned or tampered ones are rejected")
+
+    with tempfile.TemporaryDirectory() as store:
+        test_publish_and_poll(store, fixed, variable)
+    print("✓ Subscribers apply each published version once and retry failed downloads")
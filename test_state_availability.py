@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""Test state availability filtering of fixed annuity products."""
+
+import sys
+import os
+import shutil
+import tempfile
+
+from openpyxl import load_workbook
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from data_processor import STATE_AVAILABILITY_SHEET, clean_fixed_annuity_data, parse_states
+from logic import AnnuityCalculator
+from quote_request import QuoteRequest, parse_goal_seek_request, parse_quote_request
+
+FIXED = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "excel files", "Fixed Annuity Rates.xlsx"
+)
+
+
+def workbook_with_availability(directory):
+    """Copy of the fixed rates workbook with a STATE AVAILABILITY sheet added."""
+    path = os.path.join(directory, "Fixed Annuity Rates.xlsx")
+    shutil.copy(FIXED, path)
+    products = clean_fixed_annuity_data(FIXED)
+
+    wb = load_workbook(path)
+    ws = wb.create_sheet(STATE_AVAILABILITY_SHEET)
+    ws.append(["Company", "Product", "States"])
+    for i, (company, product) in enumerate(zip(products["Company"], products["Product"])):
+        # Every third product is restricted, cycling through a few state lists
+        states = ["All", "TX, ca", "NY", "tx;FL;CA", ""][i % 5] if i % 3 == 0 else None
+        ws.append([company, product, states])
+    wb.save(path)
+    return path
+
+
+def expected_products(calculator, amount, state):
+    """Per-row reference: every product whose States list is empty or contains state."""
+    return [
+        product
+        for product, states in zip(
+            calculator.get_fixed_rates(amount),
+            calculator.fixed_data["States"].loc[calculator.fixed_columns()["index"]],
+        )
+        if not isinstance(states, str) or state in states.split(",")
+    ]
+
+
+def test_parse_states():
+    assert parse_states("tx, CA;ny") == "CA,NY,TX"
+    assert parse_states("All") is None
+    assert parse_states(float("nan")) is None
+    for blank in ("", "  ", "N/A", "n/a", "None", "All states"):
+        assert parse_states(blank) is None, blank
+    # Whole words only: no "AS" out of "Texas", no "NEW" or "YORK"
+    assert parse_states("Texas") is None
+    assert parse_states("TX, New York, NY") == "NY,TX"
+    assert parse_states("DC/VA/MD") == "DC,MD,VA"
+
+
+def test_state_filter(calculator):
+    assert calculator.fixed_data["States"].notna().any()
+    for state in ("TX", "CA", "NY", "FL", "WY"):
+        expected = expected_products(calculator, 250000, state)
+        assert calculator.get_fixed_rates(250000, state) == expected, state
+        assert calculator.count_fixed_rates(state) == len(expected), state
+        assert len(expected) < calculator.count_fixed_rates()
+
+        quote_request, _ = parse_quote_request(
+            {"annuity_type": "fixed", "amount": 250000, "state": state.lower()}
+        )
+        records = list(calculator.iter_quote(quote_request))
+        assert records[0]["count"] == len(expected) and records[0]["state_filtered"]
+        assert calculator.quote(quote_request)["state_filtered"]
+        assert records[1:] == expected
+
+        schedules = list(calculator.get_fixed_schedules(250000, state=state))
+        assert [s["product"] for s in schedules] == [p["product"] for p in expected]
+
+        goal, _ = parse_goal_seek_request(
+            {"annuity_type": "fixed", "target_future_value": 500000, "state": state}
+        )
+        solved = calculator.goal_seek(goal)["results"]
+        key = lambda p: (p["sort"] or 0, p["company"], p["product"])
+        assert sorted(map(key, solved)) == sorted(map(key, expected)), state
+        amounts = [p["required_amount"] for p in solved]
+        assert amounts == sorted(amounts)
+
+        top = calculator.top_products(QuoteRequest("fixed", 250000.0, state=state), k=3)
+        best = sorted(
+            expected, key=lambda p: (-p["future_value"], p["sort"] if p["sort"] is not None else float("inf"))
+        )[:3]
+        assert top == best, state
+
+
+def test_no_sheet_means_no_filter():
+    calculator = AnnuityCalculator.from_frames(clean_fixed_annuity_data(FIXED), None)
+    assert "States" not in calculator.fixed_data.columns
+    assert calculator.get_fixed_rates(100000, "TX") == calculator.get_fixed_rates(100000)
+    # No sheet, so the form must not claim the products are available in the client's state
+    quote_request, _ = parse_quote_request({"annuity_type": "fixed", "amount": 100000, "state": "TX"})
+    assert calculator.quote(quote_request)["state_filtered"] is False
+
+    # A fixed sheet that failed to load quotes nothing rather than erroring
+    empty = AnnuityCalculator.from_frames(None, None)
+    assert empty.quote(quote_request) == {
+        "type": "fixed", "results": [], "count": 0, "state_filtered": False
+    }
+    assert list(empty.iter_quote(quote_request))[0]["count"] == 0
+
+
+def test_invalid_state():
+    _, errors = parse_quote_request({"annuity_type": "fixed", "amount": 100000, "state": "Texas"})
+    assert errors == ["State must be a two-letter state code"]
+
+
+if __name__ == "__main__":
+    test_parse_states()
+    print("✓ State lists are parsed and normalized")
+
+    with tempfile.TemporaryDirectory() as directory:
+        calculator = AnnuityCalculator.from_frames(
+            clean_fixed_annuity_data(workbook_with_availability(directory)), None
+        )
+    test_state_filter(calculator)
+    print("✓ State bitset filter matches a per-row availability check")
+
+    test_no_sheet_means_no_filter()
+    print("✓ Workbooks without a STATE AVAILABILITY sheet show every product")
+
+    test_invalid_state()
+    print("✓ Invalid state codes are rejected")
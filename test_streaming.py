@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""Test that NDJSON streamed quotes match the JSON response and the original row-wise calculator."""
+
+import sys
+import os
+import json
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("QUOTE_STORE_PATH", os.path.join(tempfile.mkdtemp(), "quotes.db"))
+
+import app as web
+import differential_fuzz
+from quote_request import parse_quote_request
+
+REQUESTS = [
+    {"amount": 50000, "annuity_type": "fixed"},
+    {"amount": "123456.78", "annuity_type": "Fixed Indexed"},
+    {"amount": 250000, "annuity_type": "fixed", "state": "TX"},
+    {"amount": 100000, "annuity_type": "variable", "current_age": 50, "withdrawal_age": 65},
+    {"amount": 525000, "annuity_type": "Variable", "current_age": "60", "withdrawal_age": 61},
+    {"amount": 100000, "annuity_type": "immediate", "current_age": 65, "sex": "female"},
+]
+
+# Header fields every stream repeats from the JSON response, by product line
+HEADER_FIELDS = {
+    "fixed": ("type", "count", "state_filtered", "snapshot_version", "sheet_version"),
+    "variable": ("current_age", "withdrawal_age", "deferral_period", "investment_amount", "count"),
+    "immediate": ("current_age", "sex", "payout_option", "count"),
+}
+
+
+def streamed(client, body, **kwargs):
+    response = client.post("/api/calculate", json=body, **kwargs)
+    assert response.status_code == 200 and response.mimetype == "application/x-ndjson"
+    lines = response.get_data(as_text=True).splitlines()
+    records = [json.loads(line) for line in lines]
+    return records[0], records[1:]
+
+
+def baseline_products(body):
+    """The original row-wise get_fixed_rates / get_variable_income output."""
+    quote_request, _ = parse_quote_request(body)
+    if quote_request.product_line == "fixed" and quote_request.state is None:
+        return differential_fuzz.reference_fixed_rates(
+            web.calculator.fixed_data, quote_request.amount
+        )
+    if quote_request.product_line == "variable":
+        return differential_fuzz.reference_variable_products(
+            web.calculator.variable_data,
+            quote_request.current_age,
+            quote_request.withdrawal_age,
+            quote_request.amount,
+        )
+    return None
+
+
+def test_stream_matches_json():
+    client = web.app.test_client()
+    for body in REQUESTS:
+        header, products = streamed(client, body, query_string={"stream": "1"})
+        # The Accept header opts in the same way; every stream saves its own quote
+        accept_header, accept_products = streamed(
+            client, body, headers={"Accept": "application/x-ndjson"}
+        )
+        assert accept_header["quote_id"] != header["quote_id"]
+        assert dict(accept_header, quote_id=None) == dict(header, quote_id=None)
+        assert accept_products == products
+
+        payload = client.post("/api/calculate", json=body).get_json()
+        line = payload["type"]
+        assert header["type"] == line
+        assert header["snapshot_version"] == payload["snapshot_version"]
+        assert header["sheet_version"] == payload["sheet_version"]
+        # The streamed quote is saved just as the JSON one is
+        saved = client.get(f"/api/quotes/{header['quote_id']}").get_json()
+        assert saved["snapshot_version"] == payload["snapshot_version"]
+        assert saved["result"] == {
+            k: v
+            for k, v in payload.items()
+            if k not in ("quote_id", "sheet_version", "snapshot_version")
+        }, body
+        if line == "fixed":
+            expected, source = payload["results"], payload
+        elif line == "immediate":
+            expected, source = payload["result"]["options"], payload["result"]
+        else:
+            expected, source = payload["result"]["products"], payload["result"]
+        source = dict(source, count=len(expected))
+        for field in HEADER_FIELDS[line]:
+            assert header[field] == source[field], (body, field)
+        assert products == expected, body
+
+
+def test_stream_matches_baseline():
+    client = web.app.test_client()
+    for body in REQUESTS:
+        expected = baseline_products(body)
+        if expected is None:
+            continue
+        _, products = streamed(client, body, query_string={"stream": "1"})
+        mismatches = list(differential_fuzz.compare_products(expected, products))
+        assert not mismatches, (body, mismatches[:3])
+
+
+if __name__ == "__main__":
+    test_stream_matches_json()
+    print("✓ Streamed quotes match the JSON response, header and products")
+
+    test_stream_matches_baseline()
+    print("✓ Streamed quotes match the original row-wise calculator")
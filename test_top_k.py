@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""Test that partial-selection top-K ranking matches a full sort of the reference products."""
+
+import sys
+import os
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from differential_fuzz import (
+    reference_fixed_rates,
+    reference_variable_products,
+    synthetic_fixed_data,
+    synthetic_variable_data,
+)
+from logic import FIXED_OBJECTIVES, VARIABLE_OBJECTIVES, AnnuityCalculator
+from quote_request import QuoteRequest
+
+
+def fixed_score(product, objective):
+    if objective == "future_value":
+        y = product["yield_to_surrender"]
+        return (1 + y / 100.0) ** 10 if y > 0 else 1.0
+    return product[objective]
+
+
+def full_sort(products, scores):
+    # Best score first, then Sort ascending with missing Sort numbers last
+    keyed = sorted(
+        zip(products, scores),
+        key=lambda ps: (-ps[1], ps[0]["sort"] is None, ps[0]["sort"] or 0),
+    )
+    return [p for p, _ in keyed]
+
+
+def test_fixed_matches_full_sort():
+    rng = np.random.default_rng(5)
+    for _ in range(15):
+        fixed = synthetic_fixed_data(rng, int(rng.integers(0, 80)))
+        calculator = AnnuityCalculator.from_frames(fixed, None)
+        request = QuoteRequest("fixed", 250000.0)
+        reference = reference_fixed_rates(fixed, request.amount)
+        for objective in FIXED_OBJECTIVES:
+            expected = full_sort(reference, [fixed_score(p, objective) for p in reference])
+            for k in (1, 3, 10, 100):
+                assert calculator.top_products(request, objective, k) == expected[:k], (objective, k)
+
+
+def test_variable_matches_full_sort():
+    rng = np.random.default_rng(6)
+    for _ in range(15):
+        variable = synthetic_variable_data(rng, int(rng.integers(0, 80)))
+        calculator = AnnuityCalculator.from_frames(None, variable)
+        request = QuoteRequest("variable", 250000.0, 55, 67)
+        reference = reference_variable_products(variable, 55, 67, request.amount)
+        # Scores in the reference's (Sort) order
+        ordered = variable.sort_values("Sort", kind="stable", na_position="last")
+        credit = ordered["Deferral Credit"].fillna(0).to_numpy()
+        rate = ordered["Withdrawal Rate"].fillna(0).to_numpy()
+        scores = {
+            "lifetime_income": np.where(credit > 0, 1 + credit * 12, 1.0) * rate,
+            "withdrawal_rate": rate,
+        }
+        for objective in VARIABLE_OBJECTIVES:
+            expected = full_sort(reference, scores[objective].tolist())
+            for k in (1, 3, 10, 100):
+                assert calculator.top_products(request, objective, k) == expected[:k], (objective, k)
+
+
+if __name__ == "__main__":
+    test_fixed_matches_full_sort()
+    print("✓ Fixed top-K matches a full sort for every objective")
+    test_variable_matches_full_sort()
+    print("✓ Variable top-K matches a full sort for every objective")